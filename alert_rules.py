@@ -0,0 +1,81 @@
+import json
+import os
+import numpy as np
+
+RULES_FILE = os.environ.get(
+    "ALERT_RULES_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "alert_rules.json")
+)
+
+# Threshold rules for machine readings.
+# A reading is an alert when any metric is below its "min" or above its
+# "max". Rules come from a "default" section with optional per-machine
+# overrides, e.g.
+#   {"default": {"temperature": {"max": 80}},
+#    "machines": {"M105": {"temperature": {"min": 70, "max": 90}}}}
+# and are compiled into per-metric bound tables so a whole micro-batch is
+# evaluated with a handful of NumPy comparisons.
+class RuleEngine:
+    def __init__(self, default, machines=None):
+        machines = machines or {}
+        self.metrics = sorted(set(default) | {m for rules in machines.values() for m in rules})
+        self._default = {}
+        self._overrides = {}
+        for metric in self.metrics:
+            base = default.get(metric, {})
+            self._default[metric] = _bounds(base)
+            self._overrides[metric] = {
+                machine_id: _bounds({**base, **rules[metric]})
+                for machine_id, rules in machines.items() if metric in rules
+            }
+
+    # Boolean alert mask for columnar readings
+    def evaluate(self, machine_ids, columns):
+        machine_ids = np.asarray(machine_ids)
+        mask = np.zeros(len(machine_ids), dtype=bool)
+        uniq = inverse = None
+
+        for metric in self.metrics:
+            values = columns.get(metric)
+            if values is None:
+                continue
+            values = np.asarray(values, dtype=float)
+            lo, hi = self._default[metric]
+            overrides = self._overrides[metric]
+
+            if overrides:
+                if uniq is None:
+                    uniq, inverse = np.unique(machine_ids, return_inverse=True)
+                table = [overrides.get(m, (lo, hi)) for m in uniq]
+                lo = np.array([b[0] for b in table])[inverse]
+                hi = np.array([b[1] for b in table])[inverse]
+
+            mask |= (values < lo) | (values > hi)
+        return mask
+
+    # Boolean alert mask for a list of reading dicts
+    def evaluate_records(self, records):
+        n = len(records)
+        machine_ids = np.array([r["machine_id"] for r in records], dtype=object)
+        columns = {
+            metric: np.fromiter((_number(r.get(metric)) for r in records), dtype=float, count=n)
+            for metric in self.metrics
+        }
+        return self.evaluate(machine_ids, columns)
+
+    def is_alert(self, record):
+        return bool(self.evaluate_records([record])[0])
+
+def _bounds(rule):
+    lo = rule.get("min")
+    hi = rule.get("max")
+    return (-np.inf if lo is None else float(lo), np.inf if hi is None else float(hi))
+
+def _number(value):
+    return np.nan if value is None else value
+
+# Load rules from a JSON config file
+def load_rules(path=RULES_FILE):
+    with open(path) as f:
+        config = json.load(f)
+    return RuleEngine(config.get("default", {}), config.get("machines", {}))
@@ -0,0 +1,217 @@
+import queue
+import threading
+import time
+from datetime import datetime
+from spill_buffer import SpillBuffer, read_rows
+import instrumentation
+
+INSERT_QUERY = """
+    INSERT INTO machine_alerts (machine_id, timestamp, temperature, vibration, rpm)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+LOAD_QUERY = """
+    LOAD DATA LOCAL INFILE %s INTO TABLE machine_alerts
+    FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+    LINES TERMINATED BY '\\n'
+    (machine_id, timestamp, temperature, vibration, rpm)
+"""
+
+REPLAY_CHUNK = 5000
+
+INSERT_SECONDS = instrumentation.STAGE_SECONDS.labels("mysql_insert")
+INSERTED = instrumentation.READINGS.labels("mysql_insert")
+INSERT_ERRORS = instrumentation.ERRORS.labels("mysql_insert")
+SPILLED = instrumentation.DROPPED.labels("mysql_insert")
+STORED_LAG = instrumentation.LAG_SECONDS.labels("mysql")
+
+# Insert metrics for rows committed in `elapsed` seconds. Called outside the
+# write path and never raises, so a metrics failure cannot get committed
+# rows spilled and inserted again.
+def record_insert(rows, elapsed):
+    try:
+        INSERT_SECONDS.observe(elapsed)
+        INSERTED.inc(len(rows))
+        instrumentation.observe_datetime_lag(STORED_LAG, [row[1] for row in rows])
+    except Exception as e:
+        print(f"Error recording MySQL insert metrics: {e}")
+
+# Convert an alert reading into a machine_alerts row
+def alert_row(data):
+    return (
+        data["machine_id"],
+        datetime.fromisoformat(data["timestamp"]),
+        data["temperature"],
+        data["vibration"],
+        data["rpm"]
+    )
+
+# Background writer that batches alert rows into MySQL.
+# submit() is called from the MQTT network thread and never touches the
+# connection; only the writer thread executes and commits.
+# When MySQL is down or the queue overflows, rows go to a SpillBuffer on
+# disk and are bulk-replayed once the database is reachable again.
+class AlertWriter:
+    def __init__(self, connect, batch_size=500, max_latency=0.5, max_queue=50000,
+                 spill_dir="spill", retry_interval=5.0):
+        self.connect = connect
+        self.conn = None
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.retry_interval = retry_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.spill = SpillBuffer(spill_dir)
+        self.spilled = 0
+        self.written = 0
+        self._use_load_data = True
+        self._last_attempt = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="alert-writer", daemon=True)
+        instrumentation.QUEUE_DEPTH.labels("alert_writer").set_function(self.queue.qsize)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    # Queue an alert without blocking; overflow is spilled to disk
+    def submit(self, data):
+        row = alert_row(data)
+        try:
+            self.queue.put_nowait(row)
+            return True
+        except queue.Full:
+            self._spill([row])
+            return False
+
+    # Stop the writer thread after draining everything already queued
+    def close(self, timeout=10):
+        self._stop.set()
+        self._thread.join(timeout)
+        self.spill.close()
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+
+    def _spill(self, rows):
+        self.spill.append(rows)
+        self.spilled += len(rows)
+        SPILLED.inc(len(rows))
+        if self.spilled % 1000 < len(rows):
+            print(f"MySQL unavailable or behind, spilled {self.spilled} alerts to disk so far.")
+
+    def _next_batch(self):
+        batch = []
+        try:
+            batch.append(self.queue.get(timeout=self.max_latency))
+        except queue.Empty:
+            return batch
+
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    # (Re)connect to MySQL, at most once per retry_interval
+    def _ensure_connection(self):
+        if self.conn is not None:
+            return True
+        now = time.monotonic()
+        if now - self._last_attempt < self.retry_interval:
+            return False
+        self._last_attempt = now
+        try:
+            self.conn = self.connect()
+            print("Alert writer connected to MySQL.")
+            return True
+        except Exception as e:
+            print(f"Error connecting to MySQL: {e}")
+            return False
+
+    def _disconnect(self):
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+        self.conn = None
+
+    # Insert and commit rows; returns the seconds it took
+    def _flush(self, rows):
+        started = time.perf_counter()
+        cursor = self.conn.cursor()
+        try:
+            cursor.executemany(INSERT_QUERY, rows)
+            self.conn.commit()
+        finally:
+            cursor.close()
+        self.written += len(rows)
+        print(f"Inserted {len(rows)} alerts into MySQL.")
+        return time.perf_counter() - started
+
+    # Load one spill segment in a single statement, falling back to large
+    # multi-row inserts if LOAD DATA LOCAL INFILE is disabled on either side
+    def _replay_segment(self, path):
+        cursor = self.conn.cursor()
+        try:
+            if self._use_load_data:
+                try:
+                    cursor.execute(LOAD_QUERY, (path,))
+                    self.conn.commit()
+                    return cursor.rowcount
+                except Exception as e:
+                    print(f"LOAD DATA LOCAL INFILE failed ({e}), replaying with bulk inserts.")
+                    self.conn.rollback()
+                    self._use_load_data = False
+
+            count = 0
+            chunk = []
+            for row in read_rows(path):
+                chunk.append(row)
+                if len(chunk) >= REPLAY_CHUNK:
+                    cursor.executemany(INSERT_QUERY, chunk)
+                    count += len(chunk)
+                    chunk = []
+            if chunk:
+                cursor.executemany(INSERT_QUERY, chunk)
+                count += len(chunk)
+            self.conn.commit()
+            return count
+        finally:
+            cursor.close()
+
+    def _replay(self):
+        self.spill.seal()
+        for path in self.spill.segments():
+            started = time.monotonic()
+            count = self._replay_segment(path)
+            self.spill.remove(path)
+            self.written += max(count, 0)
+            print(f"Replayed {count} spilled alerts in {time.monotonic() - started:.2f}s.")
+
+    def _run(self):
+        while not (self._stop.is_set() and self.queue.empty()):
+            rows = self._next_batch()
+            if not self._ensure_connection():
+                if rows:
+                    self._spill(rows)
+                continue
+            try:
+                if self.spill.pending():
+                    self._replay()
+                elapsed = self._flush(rows) if rows else None
+            except Exception as e:
+                print(f"Error inserting alerts into MySQL: {e}")
+                INSERT_ERRORS.inc()
+                if rows:
+                    self._spill(rows)
+                self._disconnect()
+                continue
+            if rows:
+                record_insert(rows, elapsed)
@@ -0,0 +1,546 @@
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+import numpy as np
+import codec
+import standins
+from mqtt_broker import MqttBroker
+
+# End-to-end benchmarks of web_sub, web_pub, web_server, web_api and the
+# Dash callbacks against local stand-ins: the in-process MQTT broker from
+# mqtt_broker.py, mongomock (or a local mongod with --mongo-uri) and SQLite
+# in place of MySQL. Each scenario runs in its own process and reports, per
+# path, throughput, p50/p99 latency and memory (RSS at the end, peak RSS).
+#
+#   python bench.py                          # all scenarios
+#   python bench.py sub api --save-baseline bench_baseline.json
+#   python bench.py --baseline bench_baseline.json --tolerance 0.2
+#
+# With --baseline, paths whose throughput dropped, or whose p99 latency or
+# peak memory grew, by more than the tolerance are reported as regressions
+# and the exit status is 1. The sub scenario publishes at --rate, so raise
+# it above the subscriber's capacity to measure the ceiling; the server
+# scenario's clients share the relay's event loop, so keep their offered
+# load (--publishers x --frame-rate, fanned out to --subscribers) modest.
+# With --mongo-uri, use a scratch server: the
+# scenarios write to its "demo" database like the services do.
+RESULT_PREFIX = "BENCH_RESULT "
+
+def memory_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        rss = 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak = peak / 1024.0 if sys.platform != "darwin" else peak / (1024.0 * 1024.0)
+    rss /= 1024.0 * 1024.0
+    return rss, max(peak, rss)
+
+def result(path, unit, count, elapsed, latencies, **extra):
+    latencies = np.asarray(latencies, dtype=float)
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000.0 if len(latencies) else (0.0, 0.0)
+    return {
+        "path": path,
+        "unit": unit,
+        "count": int(count),
+        "throughput": count / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": float(p50),
+        "p99_ms": float(p99),
+        **extra,
+    }
+
+# Run `calls` invocations of an async request function with `concurrency`
+# workers; returns (elapsed, latencies)
+async def drive(request, calls, concurrency):
+    latencies = []
+    remaining = iter(range(calls))
+
+    async def worker():
+        for i in remaining:
+            started = time.perf_counter()
+            await request(i)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started, latencies
+
+def simulated_readings(n, machines=50, seed=1, now=None):
+    from fleet_sim import FleetSimulator
+    records = FleetSimulator(machines=machines, fault_rate=0.01, seed=seed).generate(n, now)
+    machine_ids = np.char.decode(records["machine_id"])
+    columns = {name: records[name] for name in ("timestamp",) + codec.METRICS}
+    return codec.to_records(machine_ids, columns)
+
+def _sent_at(topic, payload):
+    if codec.is_packed(topic, payload):
+        return float(codec.unpack(payload)["timestamp"][0])
+    data = json.loads(payload)
+    reading = data[0] if isinstance(data, list) else data
+    return datetime.fromisoformat(reading["timestamp"]).timestamp()
+
+# --- web_sub.py: MQTT -> rule engine -> AlertWriter (SQLite) ---
+def bench_sub(args):
+    import paho.mqtt.client as mqtt
+    from fleet_sim import FleetSimulator
+    import web_sub
+
+    broker = MqttBroker(port=0).start_background()
+    workdir = tempfile.mkdtemp(prefix="bench-sub-")
+    db_path = os.path.join(workdir, "alerts.db")
+    web_sub.connect_mysql = lambda: standins.connect_sqlite(db_path)
+
+    latencies = []
+    handle = web_sub.on_message
+
+    def on_message(client, userdata, msg):
+        handle(client, userdata, msg)
+        latencies.append(time.time() - _sent_at(msg.topic, msg.payload))
+
+    web_sub.on_message = on_message
+    progress = {"received": 0, "alerts": 0}
+    stop = threading.Event()
+    subscriber = threading.Thread(target=web_sub.run_subscriber, kwargs=dict(
+        spill_dir=os.path.join(workdir, "spill"), stop_event=stop, report_interval=0.05,
+        report=lambda received, alerts: progress.update(received=received, alerts=alerts),
+        host="127.0.0.1", port=broker.port))
+    subscriber.start()
+    deadline = time.monotonic() + 5
+    while not any(session.filters for session in list(broker.sessions)) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    publisher = mqtt.Client()
+    publisher.connect("127.0.0.1", broker.port)
+    publisher.loop_start()
+    packed = args.format == "packed"
+    topic = codec.topic_for(web_sub.data_topic, args.format)
+    batch = args.batch if packed else 1
+    sim = FleetSimulator(machines=100, fault_rate=0.01, seed=1)
+
+    started = time.monotonic()
+    sent = 0
+    while sent < args.readings:
+        ahead = started + sent / args.rate - time.monotonic()
+        if ahead > 0:
+            time.sleep(ahead)
+        records = sim.generate(min(batch, args.readings - sent))
+        if packed:
+            payload = codec.pack_records(records)
+        else:
+            machine_ids = np.char.decode(records["machine_id"])
+            columns = {name: records[name] for name in ("timestamp",) + codec.METRICS}
+            payload = codec.encode(codec.to_records(machine_ids, columns), "json")
+        publisher.publish(topic, payload)
+        sent += len(records)
+
+    deadline = time.monotonic() + 30
+    while progress["received"] < sent and time.monotonic() < deadline:
+        time.sleep(0.01)
+    elapsed = time.monotonic() - started
+    stop.set()
+    subscriber.join()
+    publisher.loop_stop()
+    publisher.disconnect()
+    broker.stop_background()
+
+    return [result("web_sub.ingest", "readings/s", progress["received"], elapsed, latencies,
+                   published=sent, alerts=progress["alerts"], alerts_stored=standins.count_alerts(db_path))]
+
+# Let consumers catch up with frames still in flight, then stop them
+async def _finish(consumers, grace=0.3):
+    await asyncio.sleep(grace)
+    for task in consumers:
+        task.cancel()
+    await asyncio.gather(*consumers, return_exceptions=True)
+
+async def _start_relay():
+    import websockets
+    import web_server
+    ws_server = await websockets.serve(web_server.websocket_handler, "127.0.0.1", 0, max_size=None)
+    http_server = await asyncio.start_server(web_server.http_handler, "127.0.0.1", 0)
+    return ws_server, http_server, ws_server.sockets[0].getsockname()[1], http_server.sockets[0].getsockname()[1]
+
+# --- web_server.py: frame relay and snapshot HTTP endpoint ---
+async def bench_server(args):
+    import websockets
+    from ws_channel import decode_header, encode_frame
+
+    ws_server, http_server, ws_port, http_port = await _start_relay()
+    uri = f"ws://127.0.0.1:{ws_port}"
+    machine_ids = [f"M{100 + i}" for i in range(args.machines)]
+    payload = os.urandom(args.frame_bytes)
+    stop = asyncio.Event()
+    published = []
+    delivered = []
+
+    async def subscriber():
+        latencies = []
+        delivered.append(latencies)
+        async with websockets.connect(f"{uri}/subscribe", max_size=None) as websocket:
+            async for frame in websocket:
+                latencies.append(time.time() - decode_header(frame)[1])
+
+    async def publisher(index):
+        async with websockets.connect(uri, max_size=None) as websocket:
+            started = time.monotonic()
+            i = 0
+            while not stop.is_set():
+                ahead = started + i / args.frame_rate - time.monotonic()
+                if ahead > 0:
+                    await asyncio.sleep(ahead)
+                machine_id = machine_ids[(index + i) % len(machine_ids)]
+                send_started = time.perf_counter()
+                await websocket.send(encode_frame(machine_id, time.time(), "image/png", payload))
+                published.append(time.perf_counter() - send_started)
+                i += 1
+
+    subscribers = [asyncio.create_task(subscriber()) for _ in range(args.subscribers)]
+    await asyncio.sleep(0.2)
+    publishers = [asyncio.create_task(publisher(i)) for i in range(args.publishers)]
+    started = time.perf_counter()
+    await asyncio.sleep(args.duration)
+    stop.set()
+    await asyncio.gather(*publishers, return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    await _finish(subscribers)
+    latencies = [x for samples in delivered for x in samples]
+    results = [
+        result("web_server.publish", "frames/s", len(published), elapsed, published),
+        result("web_server.relay", "frames/s", len(latencies), elapsed, latencies,
+               subscribers=args.subscribers),
+    ]
+
+    # Snapshot polling with conditional GETs on one keep-alive connection per client
+    async def poll(calls):
+        reader, writer = await asyncio.open_connection("127.0.0.1", http_port)
+        etags = {}
+        statuses = {}
+        latencies = []
+        for i in range(calls):
+            machine_id = machine_ids[i % len(machine_ids)]
+            request = f"GET /frames/{machine_id} HTTP/1.1\r\nHost: bench\r\n"
+            if machine_id in etags:
+                request += f"If-None-Match: {etags[machine_id]}\r\n"
+            started = time.perf_counter()
+            writer.write((request + "\r\n").encode("latin-1"))
+            status = (await reader.readline()).split()[1].decode()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            await reader.readexactly(int(headers.get("content-length", 0)))
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+            if "etag" in headers:
+                etags[machine_id] = headers["etag"]
+        writer.close()
+        return latencies, statuses
+
+    started = time.perf_counter()
+    polled = await asyncio.gather(*(poll(args.requests // args.concurrency) for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies = [x for samples, _ in polled for x in samples]
+    not_modified = sum(statuses.get("304", 0) for _, statuses in polled)
+    results.append(result("web_server.http_frames", "requests/s", len(latencies), elapsed, latencies,
+                          not_modified=not_modified))
+
+    ws_server.close()
+    http_server.close()
+    return results
+
+# --- web_pub.py: publish / store / render / send pipeline ---
+async def bench_pub(args):
+    import websockets
+    import web_pub
+    from ws_channel import decode_header
+
+    broker = MqttBroker(port=0).start_background()
+    ws_server, http_server, ws_port, _ = await _start_relay()
+    web_pub.WS_SERVER = f"ws://127.0.0.1:{ws_port}"
+    if args.mongo_uri:
+        web_pub.MONGO_URI = args.mongo_uri
+    else:
+        mongo = standins.AsyncMockClient()
+        web_pub.get_mongo_collection = lambda: mongo["demo"]["machine_metrics"]
+    web_pub.client.connect("127.0.0.1", broker.port)
+    web_pub.client.loop_start()
+
+    readings = []
+    snapshots = []
+
+    async def live():
+        async with websockets.connect(f"ws://127.0.0.1:{ws_port}/live", max_size=None) as websocket:
+            async for message in websocket:
+                now = time.time()
+                readings.extend(now - datetime.fromisoformat(r["timestamp"]).timestamp()
+                                for r in json.loads(message))
+
+    async def frames():
+        async with websockets.connect(f"ws://127.0.0.1:{ws_port}/subscribe", max_size=None) as websocket:
+            async for frame in websocket:
+                snapshots.append(time.time() - decode_header(frame)[1])
+
+    consumers = [asyncio.create_task(live()), asyncio.create_task(frames())]
+    await asyncio.sleep(0.2)
+    started = time.perf_counter()
+    pipeline = asyncio.create_task(web_pub.send_images_continuously(interval=0, report_interval=3600))
+    await asyncio.sleep(args.duration)
+    pipeline.cancel()
+    await asyncio.gather(pipeline, return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    await _finish(consumers)
+
+    web_pub.client.loop_stop()
+    web_pub.client.disconnect()
+    ws_server.close()
+    http_server.close()
+    broker.stop_background()
+    return [
+        result("web_pub.readings", "readings/s", len(readings), elapsed, readings,
+               mqtt_messages=broker.messages_in),
+        result("web_pub.snapshots", "frames/s", len(snapshots), elapsed, snapshots),
+    ]
+
+# --- web_api.py: ingest and query endpoints over ASGI, in-process ---
+async def bench_api(args):
+    import httpx
+    from mqtt_pool import MqttPublisherPool
+    import web_api
+
+    broker = MqttBroker(port=0).start_background()
+    web_api.mqtt_publisher = MqttPublisherPool("127.0.0.1", broker.port, size=2, client_id_prefix="bench-api")
+    if args.mongo_uri:
+        web_api.MONGO_URI = args.mongo_uri
+    else:
+        mongo = standins.AsyncMockClient()
+        web_api.AsyncIOMotorClient = lambda *a, **kw: mongo
+
+    results = []
+    async with web_api.lifespan(web_api.app):
+        transport = httpx.ASGITransport(app=web_api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            response = await client.post("/token", data={"username": "testuser",
+                                                         "password": web_api.DEMO_PASSWORDS["testuser"]})
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+            readings = simulated_readings(args.requests * 100)
+
+            async def send_data(i):
+                (await client.post("/send_data/", json=readings[i], headers=headers)).raise_for_status()
+            elapsed, latencies = await drive(send_data, args.requests, args.concurrency)
+            results.append(result("web_api.send_data", "requests/s", args.requests, elapsed, latencies))
+
+            async def send_batch(i):
+                batch = readings[i * 100:(i + 1) * 100]
+                (await client.post("/send_data_batch/", json=batch, headers=headers)).raise_for_status()
+            calls = max(args.requests // 10, 1)
+            elapsed, latencies = await drive(send_batch, calls, args.concurrency)
+            results.append(result("web_api.send_data_batch", "readings/s", calls * 100, elapsed, latencies))
+
+            bulk = [("\n".join(json.dumps(r) for r in readings[i:i + args.bulk_rows])).encode()
+                    for i in range(0, len(readings), args.bulk_rows)][:5]
+
+            async def ingest(i):
+                response = await client.post("/ingest/bulk/", content=bulk[i],
+                                             headers={**headers, "Content-Type": "application/x-ndjson"})
+                response.raise_for_status()
+            elapsed, latencies = await drive(ingest, len(bulk), 1)
+            results.append(result("web_api.ingest_bulk", "readings/s",
+                                  sum(body.count(b"\n") + 1 for body in bulk), elapsed, latencies))
+
+            await web_api.metrics_writer.flush()
+            machine_ids = sorted({r["machine_id"] for r in readings})
+            etags = {}
+
+            async def latest(i):
+                machine_id = machine_ids[i % len(machine_ids)]
+                conditional = {"If-None-Match": etags[machine_id]} if machine_id in etags else {}
+                response = await client.get("/metrics/latest/", params={"machine_id": machine_id, "limit": 10},
+                                            headers={**headers, **conditional})
+                if response.status_code == 200 and "etag" in response.headers:
+                    etags[machine_id] = response.headers["etag"]
+            elapsed, latencies = await drive(latest, args.requests, args.concurrency)
+            results.append(result("web_api.metrics_latest", "requests/s", args.requests, elapsed, latencies))
+
+            async def history(i):
+                response = await client.get("/metrics/history/", headers=headers, params={
+                    "machine_id": machine_ids[i % len(machine_ids)], "limit": 1000, "format": "ndjson"})
+                response.raise_for_status()
+            calls = max(args.requests // 10, 1)
+            elapsed, latencies = await drive(history, calls, args.concurrency)
+            results.append(result("web_api.metrics_history", "requests/s", calls, elapsed, latencies))
+
+    broker.stop_background()
+    return results
+
+# --- web_dash.py: cache refresh and figure callbacks ---
+def bench_dash(args):
+    import mongomock
+    from pymongo import MongoClient
+    import metrics_store
+    from metrics_cache import MetricsCache
+    import web_dash
+
+    client = MongoClient(args.mongo_uri) if args.mongo_uri else mongomock.MongoClient()
+    collection = client["demo"]["machine_metrics"]
+    metrics_store.ensure_indexes(collection)
+    now = time.time()
+    readings = simulated_readings(args.readings, now=now)
+    spacing = 7200.0 / max(len(readings), 1)
+    for i, reading in enumerate(readings):
+        reading["timestamp"] = datetime.fromtimestamp(now - 7200.0 + i * spacing)
+    for i in range(0, len(readings), 10000):
+        collection.insert_many([dict(r) for r in readings[i:i + 10000]])
+
+    web_dash.mongo_client = client
+    web_dash.mongo_db = client["demo"]
+    web_dash.mongo_collection = collection
+    # min_interval=0 so every callback exercises the incremental refresh
+    web_dash.metrics_cache = MetricsCache(collection, min_interval=0)
+    machine_id = sorted({r["machine_id"] for r in readings})[0]
+    window = {"machine": machine_id,
+              "start": (datetime.now() - timedelta(minutes=30)).isoformat(),
+              "end": (datetime.now() - timedelta(minutes=20)).isoformat()}
+
+    results = []
+    started = time.perf_counter()
+    web_dash.update_machine_buttons(0, None)
+    elapsed = time.perf_counter() - started
+    results.append(result("web_dash.initial_load", "readings/s", len(readings), elapsed, [elapsed]))
+
+    calls = [
+        ("web_dash.update_machine_buttons", lambda: web_dash.update_machine_buttons(1, machine_id)),
+        ("web_dash.update_graphs_all", lambda: web_dash.update_graphs(1, "all", None)),
+        ("web_dash.update_graphs_machine", lambda: web_dash.update_graphs(1, machine_id, None)),
+        ("web_dash.update_graphs_zoom", lambda: web_dash.update_graphs(1, machine_id, window)),
+    ]
+    fresh = simulated_readings(args.callbacks * 20 * len(calls), seed=2)
+    offset = 0
+    for path, call in calls:
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(args.callbacks):
+            # A few new readings arrive between refreshes
+            batch = [dict(r, timestamp=datetime.now()) for r in fresh[offset:offset + 20]]
+            offset += 20
+            collection.insert_many(batch)
+            call_started = time.perf_counter()
+            call()
+            latencies.append(time.perf_counter() - call_started)
+        results.append(result(path, "calls/s", args.callbacks, time.perf_counter() - started, latencies))
+    return results
+
+SCENARIOS = {
+    "sub": bench_sub,
+    "pub": bench_pub,
+    "server": bench_server,
+    "api": bench_api,
+    "dash": bench_dash,
+}
+
+def run_scenario(name, args):
+    scenario = SCENARIOS[name]
+    results = asyncio.run(scenario(args)) if asyncio.iscoroutinefunction(scenario) else scenario(args)
+    rss, peak = memory_mb()
+    for entry in results:
+        entry["rss_mb"] = round(rss, 1)
+        entry["peak_rss_mb"] = round(peak, 1)
+    return results
+
+# Run each scenario in a fresh interpreter so memory figures and module
+# state do not leak between them
+def run_isolated(name, argv):
+    process = subprocess.run([sys.executable, os.path.abspath(__file__), name, "--child"] + argv,
+                             capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+    for line in process.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    print(f"Scenario {name} failed (exit {process.returncode}):")
+    print(process.stderr[-4000:] or process.stdout[-4000:])
+    return []
+
+def compare(results, baseline, tolerance):
+    previous = {entry["path"]: entry for entry in baseline}
+    regressions = []
+    for entry in results:
+        before = previous.get(entry["path"])
+        if before is None:
+            continue
+        if entry["throughput"] < before["throughput"] * (1 - tolerance):
+            regressions.append((entry["path"], "throughput", before["throughput"], entry["throughput"]))
+        if before["p99_ms"] and entry["p99_ms"] > before["p99_ms"] * (1 + tolerance):
+            regressions.append((entry["path"], "p99_ms", before["p99_ms"], entry["p99_ms"]))
+        if entry["peak_rss_mb"] > before["peak_rss_mb"] * (1 + tolerance):
+            regressions.append((entry["path"], "peak_rss_mb", before["peak_rss_mb"], entry["peak_rss_mb"]))
+    return regressions
+
+def print_table(results):
+    print(f"{'path':<34}{'throughput':>16} {'unit':<12}{'p50 ms':>10}{'p99 ms':>10}{'rss MB':>9}{'peak MB':>9}")
+    for entry in results:
+        print(f"{entry['path']:<34}{entry['throughput']:>16.1f} {entry['unit']:<12}"
+              f"{entry['p50_ms']:>10.2f}{entry['p99_ms']:>10.2f}{entry['rss_mb']:>9.1f}{entry['peak_rss_mb']:>9.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmarks against local stand-ins")
+    parser.add_argument("scenarios", nargs="*", choices=[[]] + list(SCENARIOS), default=[],
+                        help=f"scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds for time-bound scenarios")
+    parser.add_argument("--readings", type=int, default=50000, help="readings for sub and dash")
+    parser.add_argument("--rate", type=float, default=20000.0, help="readings per second published in sub")
+    parser.add_argument("--batch", type=int, default=100, help="readings per packed message in sub")
+    parser.add_argument("--format", choices=["json", "packed"], default="packed", help="wire format in sub")
+    parser.add_argument("--requests", type=int, default=2000, help="HTTP requests per api/server path")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--bulk-rows", type=int, default=50000, help="readings per /ingest/bulk/ request")
+    parser.add_argument("--callbacks", type=int, default=20, help="calls per Dash callback")
+    parser.add_argument("--machines", type=int, default=50, help="machines in server")
+    parser.add_argument("--publishers", type=int, default=2, help="frame publishers in server")
+    parser.add_argument("--subscribers", type=int, default=4, help="frame subscribers in server")
+    parser.add_argument("--frame-rate", type=float, default=50.0, help="frames per second per publisher in server")
+    parser.add_argument("--frame-bytes", type=int, default=20000, help="snapshot size in server")
+    parser.add_argument("--mongo-uri", default=None, help="use this MongoDB instead of mongomock")
+    parser.add_argument("--json", default=None, help="write results to this file")
+    parser.add_argument("--save-baseline", default=None, help="write results as a baseline file")
+    parser.add_argument("--baseline", default=None, help="compare against this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args, _ = parser.parse_known_args()
+
+    if args.child:
+        print(RESULT_PREFIX + json.dumps(run_scenario(args.scenarios[0], args)), flush=True)
+        return
+
+    passthrough = [arg for arg in sys.argv[1:] if arg not in SCENARIOS]
+    results = []
+    for name in args.scenarios or list(SCENARIOS):
+        print(f"Running {name}...", flush=True)
+        results.extend(run_isolated(name, passthrough))
+    print_table(results)
+
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for path, metric, before, after in regressions:
+            print(f"REGRESSION {path} {metric}: {before:.2f} -> {after:.2f}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import asyncio
+import io
+import numpy as np
+import codec
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    import pyarrow.json as pa_json
+except ImportError:  # bulk ingest is unavailable without pyarrow
+    pa = None
+
+# Columnar parsing and validation of bulk reading uploads.
+# Bodies arrive as NDJSON, CSV (with a header row) or an Arrow IPC stream
+# and are parsed chunk by chunk into Arrow tables, so no per-reading Python
+# object is built before the alert rules have picked the rows to store.
+FIELDS = ("machine_id", "timestamp", "temperature", "vibration", "rpm")
+FORMATS = {
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "text/csv": "csv",
+    "application/vnd.apache.arrow.stream": "arrow",
+}
+# Raw NDJSON/CSV bytes parsed per chunk
+CHUNK_BYTES = 8 * 1024 * 1024
+MACHINE_ID_BYTES = codec.MACHINE_ID_BYTES
+
+class TooManyRows(ValueError):
+    pass
+
+class BodyTooLarge(ValueError):
+    pass
+
+def body_format(content_type):
+    return FORMATS.get((content_type or "").split(";")[0].strip().lower())
+
+def schema():
+    return pa.schema([
+        ("machine_id", pa.string()),
+        ("timestamp", pa.timestamp("ms")),
+        ("temperature", pa.float64()),
+        ("vibration", pa.float64()),
+        ("rpm", pa.int64()),
+    ])
+
+# Text formats are parsed with microsecond timestamps, then truncated to ms
+def _parse_types():
+    return {**{field.name: field.type for field in schema()}, "timestamp": pa.timestamp("us")}
+
+def _parse_ndjson(data):
+    options = pa_json.ParseOptions(explicit_schema=pa.schema(_parse_types()), unexpected_field_behavior="ignore")
+    return pa_json.read_json(io.BytesIO(data), parse_options=options)
+
+def _parse_csv(header, data):
+    options = pa_csv.ConvertOptions(column_types=_parse_types(), include_columns=list(FIELDS))
+    return pa_csv.read_csv(io.BytesIO(header + data), convert_options=options)
+
+# Cast a parsed table to schema() and reject rows the rules or the packed
+# wire format cannot take
+def normalize(table):
+    missing = [name for name in FIELDS if name not in table.column_names]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    target = schema()
+    columns = []
+    for field in target:
+        column = table.column(field.name)
+        if pa.types.is_timestamp(column.type) and column.type.tz is not None:
+            raise ValueError("timestamp must be a naive local time, as for /send_data/")
+        try:
+            columns.append(pc.cast(column, field.type, safe=field.name != "timestamp"))
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+            raise ValueError(f"Invalid {field.name} column: {e}") from e
+    table = pa.Table.from_arrays(columns, schema=target)
+
+    for name in FIELDS:
+        nulls = table.column(name).null_count
+        if nulls:
+            raise ValueError(f"{nulls} rows have no {name}")
+    for name in ("temperature", "vibration"):
+        if not pc.all(pc.is_finite(table.column(name)), min_count=0).as_py():
+            raise ValueError(f"{name} must be finite")
+    rpm = table.column("rpm")
+    if len(rpm) and (pc.min(rpm).as_py() < 0 or pc.max(rpm).as_py() > codec.RPM_MAX):
+        raise ValueError("rpm out of range")
+    id_bytes = pc.binary_length(table.column("machine_id"))
+    if len(id_bytes) and (pc.min(id_bytes).as_py() < 1 or pc.max(id_bytes).as_py() > MACHINE_ID_BYTES):
+        raise ValueError(f"machine_id must be 1-{MACHINE_ID_BYTES} bytes")
+    return table
+
+# Read a streamed body (async iterator of bytes) into one validated table.
+# Chunks are collected on the event loop; parsing and validation run in a
+# worker thread. Arrow bodies are buffered whole, so `max_bytes` caps the
+# memory a request can take.
+async def read_table(chunks, fmt, max_rows=1000000, max_bytes=256 * 1024 * 1024, chunk_bytes=CHUNK_BYTES):
+    tables = []
+    rows = 0
+    received = 0
+
+    async def limited():
+        nonlocal received
+        async for chunk in chunks:
+            received += len(chunk)
+            if received > max_bytes:
+                raise BodyTooLarge(f"Request body larger than {max_bytes} bytes")
+            yield chunk
+
+    def add(table):
+        nonlocal rows
+        table = normalize(table)
+        rows += table.num_rows
+        if rows > max_rows:
+            raise TooManyRows(f"More than {max_rows} readings in one request")
+        tables.append(table)
+
+    if fmt == "arrow":
+        body = bytearray()
+        async for chunk in limited():
+            body.extend(chunk)
+
+        # The IPC reader works on the collected body in place (no copy)
+        def read_stream():
+            try:
+                for batch in pa.ipc.open_stream(pa.py_buffer(body)):
+                    add(pa.Table.from_batches([batch]))
+            except pa.ArrowInvalid as e:
+                raise ValueError(f"Invalid Arrow stream: {e}") from e
+
+        if body:
+            await asyncio.to_thread(read_stream)
+    else:
+        buffer = bytearray()
+        header = None
+
+        def parse(data):
+            try:
+                return _parse_ndjson(data) if fmt == "ndjson" else _parse_csv(header, data)
+            except (pa.ArrowInvalid, pa.ArrowKeyError) as e:
+                raise ValueError(f"Invalid {fmt} body: {e}") from e
+
+        def parse_and_add(data):
+            add(parse(data))
+
+        async for chunk in limited():
+            buffer.extend(chunk)
+            if fmt == "csv" and header is None:
+                end = buffer.find(b"\n")
+                if end < 0:
+                    continue
+                header = bytes(buffer[:end + 1])
+                del buffer[:end + 1]
+            if len(buffer) >= chunk_bytes:
+                end = buffer.rfind(b"\n")
+                if end >= 0:
+                    await asyncio.to_thread(parse_and_add, buffer[:end + 1])
+                    del buffer[:end + 1]
+        if fmt == "csv" and header is None and buffer.strip():
+            # Header row only, without a trailing newline: no readings, but
+            # the columns are still checked
+            header = bytes(buffer) + b"\n"
+            await asyncio.to_thread(parse_and_add, b"")
+        elif buffer.strip():
+            await asyncio.to_thread(parse_and_add, buffer)
+
+    if not tables:
+        return schema().empty_table()
+    return pa.concat_tables(tables)
+
+# (machine_ids, columns) as NumPy arrays, the shape RuleEngine.evaluate takes
+def to_columns(table):
+    machine_ids = table.column("machine_id").to_numpy(zero_copy_only=False)
+    columns = {name: table.column(name).to_numpy() for name in FIELDS[1:]}
+    return machine_ids, columns
+
+# Packed wire records for every row
+def to_records(machine_ids, columns):
+    records = np.empty(len(machine_ids), dtype=codec.RECORD_DTYPE)
+    records["machine_id"] = np.char.encode(machine_ids.astype(str), "utf-8")
+    records["timestamp"] = codec.local_epoch(columns["timestamp"])
+    for metric in codec.METRICS:
+        records[metric] = columns[metric]
+    return records
+
+# machine_metrics documents for the selected rows
+def to_documents(machine_ids, columns, indices):
+    timestamps = columns["timestamp"][indices].astype("datetime64[ms]").tolist()
+    temperature = columns["temperature"][indices].tolist()
+    vibration = columns["vibration"][indices].tolist()
+    rpm = columns["rpm"][indices].tolist()
+    return [
+        {"machine_id": str(machine_ids[i]), "timestamp": timestamps[k],
+         "temperature": temperature[k], "vibration": vibration[k], "rpm": rpm[k]}
+        for k, i in enumerate(indices)
+    ]
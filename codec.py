@@ -0,0 +1,143 @@
+import json
+import os
+import struct
+from datetime import datetime, timedelta
+import numpy as np
+
+# Wire formats for the trail_me topic.
+# "json" keeps the original one-object-per-message payload on trail_me.
+# "packed" publishes on trail_me/packed: a small header followed by
+# fixed-layout little-endian records, many readings per message.
+PACKED_SUFFIX = "/packed"
+WIRE_FORMAT = os.environ.get("TRAIL_ME_FORMAT", "json")
+
+MAGIC = b"TM"
+VERSION = 1
+HEADER = struct.Struct("<2sBI")  # magic, version, record count
+RECORD_DTYPE = np.dtype([
+    ("machine_id", "S16"),
+    ("timestamp", "<f8"),  # seconds since the epoch
+    ("temperature", "<f8"),
+    ("vibration", "<f8"),
+    ("rpm", "<u4"),
+])
+METRICS = ("temperature", "vibration", "rpm")
+MACHINE_ID_BYTES = RECORD_DTYPE["machine_id"].itemsize
+RPM_MAX = int(np.iinfo(RECORD_DTYPE["rpm"]).max)
+
+# Topic a publisher should use for the given wire format
+def topic_for(base_topic, fmt=WIRE_FORMAT):
+    return base_topic + PACKED_SUFFIX if fmt == "packed" else base_topic
+
+# Topics a subscriber needs to receive every format
+def subscribe_topics(base_topic):
+    return [base_topic, base_topic + PACKED_SUFFIX]
+
+def is_packed(topic, payload):
+    return topic.endswith(PACKED_SUFFIX) or payload[:2] == MAGIC
+
+# Encode readings for the wire. JSON payloads carry a single object when
+# there is one reading so existing consumers keep working.
+def encode(readings, fmt=WIRE_FORMAT):
+    if fmt == "packed":
+        return pack(readings)
+    if len(readings) == 1:
+        return json.dumps(readings[0])
+    return json.dumps(readings)
+
+# Ids longer than MACHINE_ID_BYTES would be truncated (and could collide
+# with another machine's id), and rpm must fit the unsigned 32-bit field,
+# so readings outside the record layout are rejected with ValueError
+def pack(readings):
+    machine_ids = [r["machine_id"].encode("utf-8") for r in readings]
+    for machine_id in machine_ids:
+        if len(machine_id) > MACHINE_ID_BYTES:
+            raise ValueError(f"machine_id {machine_id.decode('utf-8')!r} is longer than "
+                             f"{MACHINE_ID_BYTES} bytes and cannot be packed")
+    for r in readings:
+        if not 0 <= r["rpm"] <= RPM_MAX:
+            raise ValueError(f"rpm {r['rpm']!r} is outside 0-{RPM_MAX} and cannot be packed")
+    records = np.empty(len(readings), dtype=RECORD_DTYPE)
+    records["machine_id"] = machine_ids
+    records["timestamp"] = [_epoch(r["timestamp"]) for r in readings]
+    for metric in METRICS:
+        records[metric] = [r[metric] for r in readings]
+    return pack_records(records)
+
+# Pack an already-built RECORD_DTYPE array (used by batch producers)
+def pack_records(records):
+    return HEADER.pack(MAGIC, VERSION, len(records)) + records.tobytes()
+
+def unpack(payload):
+    magic, version, count = HEADER.unpack_from(payload)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Unsupported packed payload")
+    return np.frombuffer(payload, dtype=RECORD_DTYPE, count=count, offset=HEADER.size)
+
+# Decode a message into (machine_ids, columns) without building per-reading
+# dicts, so the rule engine can evaluate the batch directly
+def decode_columns(topic, payload):
+    if is_packed(topic, payload):
+        records = unpack(payload)
+        columns = {name: records[name] for name in ("timestamp",) + METRICS}
+        return np.char.decode(records["machine_id"]), columns
+
+    data = json.loads(payload)
+    readings = data if isinstance(data, list) else [data]
+    machine_ids = np.array([r["machine_id"] for r in readings], dtype=object)
+    columns = {name: [r.get(name) for r in readings] for name in ("timestamp",) + METRICS}
+    return machine_ids, columns
+
+# Build reading dicts for the selected rows (all rows by default)
+def to_records(machine_ids, columns, indices=None):
+    if indices is None:
+        indices = range(len(machine_ids))
+    timestamps = columns["timestamp"]
+    records = []
+    for i in indices:
+        ts = timestamps[i]
+        records.append({
+            "machine_id": str(machine_ids[i]),
+            "timestamp": ts if isinstance(ts, str) else datetime.fromtimestamp(float(ts)).isoformat(),
+            "temperature": float(columns["temperature"][i]),
+            "vibration": float(columns["vibration"][i]),
+            "rpm": int(columns["rpm"][i]),
+        })
+    return records
+
+def decode(topic, payload):
+    return to_records(*decode_columns(topic, payload))
+
+# Epoch seconds for an array of naive local datetime64 values. The local
+# UTC offset is looked up once per distinct hour, which is exact across
+# DST changes.
+def local_epoch(values):
+    naive = values.astype("datetime64[ms]").astype(np.int64) / 1000.0
+    if not len(naive):
+        return naive
+    hours, inverse = np.unique(naive // 3600, return_inverse=True)
+    offsets = np.array([_utc_offset(hour * 3600) for hour in hours])
+    return naive - offsets[inverse]
+
+# Epoch seconds for a decoded timestamp column: packed batches already
+# carry floats, JSON readings carry ISO strings. Timestamps that do not
+# parse are NaN.
+def epoch_seconds(timestamps):
+    if isinstance(timestamps, np.ndarray) and timestamps.dtype.kind == "f":
+        return timestamps
+    seconds = np.full(len(timestamps), np.nan)
+    for i, timestamp in enumerate(timestamps):
+        try:
+            seconds[i] = _epoch(timestamp)
+        except (TypeError, ValueError):
+            pass
+    return seconds
+
+def _utc_offset(naive_seconds):
+    local = datetime(1970, 1, 1) + timedelta(seconds=naive_seconds)
+    return local.astimezone().utcoffset().total_seconds()
+
+def _epoch(timestamp):
+    if isinstance(timestamp, datetime):
+        return timestamp.timestamp()
+    return datetime.fromisoformat(timestamp).timestamp()
@@ -0,0 +1,55 @@
+import numpy as np
+
+# Largest-Triangle-Three-Buckets: pick n_out indices that preserve the
+# visual shape of the line y(x). x must be numeric and increasing.
+def lttb_indices(x, y, n_out):
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    out = np.empty(n_out, dtype=int)
+    out[0], out[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo = hi
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+# Min and max of each of n_buckets equal-count buckets (plus the end
+# points), so spikes survive downsampling
+def minmax_indices(y, n_buckets):
+    n = len(y)
+    if n_buckets < 1 or 2 * n_buckets >= n:
+        return np.arange(n)
+
+    y = np.asarray(y, dtype=float)
+    bucket = np.arange(n) * n_buckets // n
+    order = np.lexsort((y, bucket))
+    starts = np.searchsorted(bucket[order], np.arange(n_buckets))
+    ends = np.append(starts[1:], n) - 1
+    return np.unique(np.concatenate((order[starts], order[ends], [0, n - 1])))
+
+# Reduce a time-ordered DataFrame to at most about max_points rows for
+# plotting y_col against x_col ("lttb" or "minmax")
+def downsample(df, x_col, y_col, max_points, method="lttb"):
+    df = df.dropna(subset=[y_col])
+    if len(df) <= max_points:
+        return df
+    if method == "minmax":
+        indices = minmax_indices(df[y_col].to_numpy(), max_points // 2)
+    else:
+        x = df[x_col].to_numpy()
+        if np.issubdtype(x.dtype, np.datetime64):
+            x = x.astype("datetime64[ns]").astype(np.int64)
+        indices = lttb_indices(x, df[y_col].to_numpy(), max_points)
+    return df.iloc[indices]
@@ -0,0 +1,144 @@
+import math
+import time
+import numpy as np
+import codec
+import instrumentation
+
+# Rate multipliers for the supported load profiles
+def profile_factor(profile, t, period=60.0):
+    if profile == "steady":
+        return 1.0
+    if profile == "burst":
+        # 10 s at 4x the target rate every period, a quarter of the rate otherwise
+        return 4.0 if (t % period) < 10.0 else 0.25
+    if profile == "sine":
+        return 1.0 + 0.75 * math.sin(2 * math.pi * t / period)
+    raise ValueError(f"Unknown profile: {profile}")
+
+# Simulated fleet of machines with drifting sensors and injected faults.
+# Each machine has a mean-reverting temperature/vibration/rpm state that
+# random-walks between batches; faults (overheating, vibration spikes and
+# stuck sensors) start at fault_rate per machine per batch and last a few
+# hundred batches. Readings are produced as codec.RECORD_DTYPE arrays so
+# they can be packed without building per-reading dicts.
+class FleetSimulator:
+    OVERHEAT, VIBRATION, STUCK = 1, 2, 3
+
+    def __init__(self, machines=100, fault_rate=0.0005, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.machines = machines
+        self.machine_ids = np.array([f"M{100 + i}".encode() for i in range(machines)], dtype="S16")
+        self.fault_rate = fault_rate
+
+        rng = self.rng
+        self.base_temp = rng.uniform(62.0, 78.0, machines)
+        self.base_vibration = rng.uniform(0.8, 2.2, machines)
+        self.base_rpm = rng.uniform(1100.0, 1900.0, machines)
+        self.temp = self.base_temp.copy()
+        self.vibration = self.base_vibration.copy()
+        self.rpm = self.base_rpm.copy()
+        self.fault = np.zeros(machines, dtype=np.int8)
+        self.fault_left = np.zeros(machines, dtype=np.int32)
+        self.stuck_temp = np.zeros(machines)
+
+    def _drift(self):
+        rng = self.rng
+        n = self.machines
+        self.temp += 0.05 * (self.base_temp - self.temp) + rng.normal(0.0, 0.3, n)
+        self.vibration += 0.05 * (self.base_vibration - self.vibration) + rng.normal(0.0, 0.03, n)
+        self.rpm += 0.05 * (self.base_rpm - self.rpm) + rng.normal(0.0, 5.0, n)
+
+        self.fault_left[self.fault_left > 0] -= 1
+        self.fault[self.fault_left == 0] = 0
+
+        starting = (self.fault == 0) & (rng.random(n) < self.fault_rate)
+        if starting.any():
+            count = int(starting.sum())
+            self.fault[starting] = rng.integers(1, 4, count)
+            self.fault_left[starting] = rng.integers(50, 500, count)
+            self.stuck_temp[starting] = self.temp[starting]
+
+    # Produce n readings spread across the fleet
+    def generate(self, n, now=None):
+        self._drift()
+        rng = self.rng
+        now = time.time() if now is None else now
+        idx = rng.integers(0, self.machines, n)
+        fault = self.fault[idx]
+
+        temperature = self.temp[idx] + rng.normal(0.0, 0.5, n)
+        temperature = np.where(fault == self.OVERHEAT, temperature + 20.0, temperature)
+        temperature = np.where(fault == self.STUCK, self.stuck_temp[idx], temperature)
+        vibration = self.vibration[idx] + rng.normal(0.0, 0.1, n)
+        vibration = np.where(fault == self.VIBRATION, vibration * 2.5, vibration)
+
+        records = np.empty(n, dtype=codec.RECORD_DTYPE)
+        records["machine_id"] = self.machine_ids[idx]
+        records["timestamp"] = now
+        records["temperature"] = np.round(temperature, 1)
+        records["vibration"] = np.round(np.clip(vibration, 0.0, None), 2)
+        records["rpm"] = np.clip(self.rpm[idx] + rng.normal(0.0, 20.0, n), 0, None).astype(np.uint32)
+        return records
+
+PUBLISH_SECONDS = instrumentation.STAGE_SECONDS.labels("mqtt_publish")
+PUBLISHED_MESSAGES = instrumentation.MESSAGES.labels("mqtt_publish")
+PUBLISHED_READINGS = instrumentation.READINGS.labels("mqtt_publish")
+
+# Publish simulated readings at a target rate until duration elapses
+# (forever when duration is None). Packed readings are sent batch_size
+# per message; JSON sends one reading per message. Publishes are queued
+# on the paho network thread without waiting for each one to complete.
+# When publishing falls behind, at most max_backlog seconds of readings
+# (at the current profile rate) are carried over; the rest are skipped.
+def run_simulator(client, base_topic, machines=100, rate=1000.0, profile="steady",
+                  batch_size=100, duration=None, qos=0, fmt=codec.WIRE_FORMAT,
+                  fault_rate=0.0005, tick=0.01, report_interval=1.0, max_backlog=1.0):
+    sim = FleetSimulator(machines, fault_rate)
+    topic = codec.topic_for(base_topic, fmt)
+    client.max_inflight_messages_set(max(20, batch_size * 10))
+    client.max_queued_messages_set(0)
+
+    started = time.monotonic()
+    last = started
+    last_report = started
+    budget = 0.0
+    readings = messages = 0
+    reported = (0, 0)
+
+    print(f"Simulating {machines} machines at {rate:.0f} readings/s ({profile}, {fmt}) on {topic}")
+    while duration is None or last - started < duration:
+        now = time.monotonic()
+        current_rate = rate * profile_factor(profile, now - started)
+        budget = min(budget + current_rate * (now - last), current_rate * max_backlog)
+        last = now
+
+        n = int(budget)
+        if n > 0:
+            budget -= n
+            records = sim.generate(n)
+            sent = messages
+            if fmt == "packed":
+                for i in range(0, n, batch_size):
+                    client.publish(topic, codec.pack_records(records[i:i + batch_size]), qos)
+                    messages += 1
+            else:
+                columns = {name: records[name] for name in ("timestamp",) + codec.METRICS}
+                machine_ids = np.char.decode(records["machine_id"])
+                for reading in codec.to_records(machine_ids, columns):
+                    client.publish(topic, codec.encode([reading], fmt), qos)
+                    messages += 1
+            readings += n
+            PUBLISH_SECONDS.observe(time.monotonic() - now)
+            PUBLISHED_MESSAGES.inc(messages - sent)
+            PUBLISHED_READINGS.inc(n)
+
+        if now - last_report >= report_interval:
+            elapsed = now - last_report
+            print(f"[Simulator] {(readings - reported[0]) / elapsed:.0f} readings/s, "
+                  f"{(messages - reported[1]) / elapsed:.0f} msg/s, total {readings}")
+            reported = (readings, messages)
+            last_report = now
+
+        time.sleep(max(0.0, tick - (time.monotonic() - now)))
+
+    return readings, messages
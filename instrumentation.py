@@ -0,0 +1,293 @@
+import bisect
+import functools
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import codec
+
+# Process-local pipeline metrics in the Prometheus text format.
+# Every service records into the same metric families below, labelled by
+# stage / queue / sink, so one dashboard can line up web_pub, web_sub,
+# web_server, web_api and web_dash. web_api and web_dash serve /metrics on
+# their own HTTP servers, web_server on its snapshot port, and the
+# standalone scripts on a side port (serve(), METRICS_PORT).
+#
+# Hot-path cost is a lock and a few additions per observation: children are
+# resolved once with .labels() at import time, batches are observed with
+# observe_many() in one NumPy pass, and queue depths are gauges sampled
+# only when /metrics is scraped (set_function).
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Stage latencies, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# End-to-end lag from a reading's timestamp, in seconds
+LAG_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _label_text(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name):
+        return [(name, (), self.value)]
+
+class _GaugeChild:
+    def __init__(self):
+        self.value = 0
+        self.function = None
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    # Sample the gauge from function() at scrape time instead of on every change
+    def set_function(self, function):
+        self.function = function
+
+    def samples(self, name):
+        value = self.value
+        if self.function is not None:
+            try:
+                value = self.function()
+            except Exception:
+                value = float("nan")
+        return [(name, (), value)]
+
+class _HistogramChild:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self._edges = np.asarray(bounds, dtype=float)
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    # Record an array of values at once (a decoded batch of readings)
+    def observe_many(self, values):
+        values = np.asarray(values, dtype=float)
+        if not len(values):
+            return
+        counts = np.bincount(np.searchsorted(self._edges, values, side="left"), minlength=len(self.counts))
+        total = float(values.sum())
+        with self._lock:
+            for index in np.flatnonzero(counts):
+                self.counts[index] += int(counts[index])
+            self.sum += total
+
+    # Context manager that observes the elapsed time of its block
+    def time(self):
+        return _Timer(self)
+
+    def samples(self, name):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.bounds + (float("inf"),), counts):
+            cumulative += count
+            samples.append((name + "_bucket", (("le", _format_value(float(bound))),), cumulative))
+        samples.append((name + "_sum", (), total))
+        samples.append((name + "_count", (), cumulative))
+        return samples
+
+# Decorator form of histogram.time()
+def timed(histogram):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with histogram.time():
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+# A named metric with optional labels. Without labels the family records
+# directly (family.inc(), family.observe()); with labels, resolve a child
+# once with family.labels(...) and record into that.
+class _Family:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), **options):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.options = options
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        values = tuple(str(value) for value in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def __getattr__(self, attribute):
+        # Label-less families forward inc/set/observe/... to their only child
+        if attribute.startswith("_") or not self.__dict__.get("_default"):
+            raise AttributeError(attribute)
+        return getattr(self._default, attribute)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            for name, extra, value in child.samples(self.name):
+                lines.append(f"{name}{_label_text(self.labelnames, values, extra)} {_format_value(value)}")
+        return lines
+
+class Counter(_Family):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+class Gauge(_Family):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+class Histogram(_Family):
+    kind = "histogram"
+
+    def _new_child(self):
+        return _HistogramChild(tuple(float(b) for b in self.options.get("buckets", LATENCY_BUCKETS)))
+
+class Registry:
+    def __init__(self):
+        self.families = {}
+        self._lock = threading.Lock()
+
+    # Return the family registered under name, creating it on first use, so
+    # modules can declare the metrics they touch at import time
+    def register(self, cls, name, documentation, labelnames=(), **options):
+        with self._lock:
+            family = self.families.get(name)
+            if family is None:
+                family = self.families[name] = cls(name, documentation, labelnames, **options)
+            elif not isinstance(family, cls) or family.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} is already registered with a different type or labels")
+            return family
+
+    def render(self):
+        lines = []
+        for name in sorted(self.families):
+            lines.extend(self.families[name].render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+def counter(name, documentation, labelnames=()):
+    return REGISTRY.register(Counter, name, documentation, labelnames)
+
+def gauge(name, documentation, labelnames=()):
+    return REGISTRY.register(Gauge, name, documentation, labelnames)
+
+def histogram(name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+    return REGISTRY.register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+def render():
+    return REGISTRY.render()
+
+# --- Pipeline metrics shared by every service ---
+STAGE_SECONDS = histogram("pipeline_stage_seconds", "Time spent processing in a pipeline stage", ["stage"])
+STAGE_WAIT_SECONDS = histogram("pipeline_stage_wait_seconds", "Time an item waited in a stage's queue", ["stage"])
+MESSAGES = counter("pipeline_messages_total", "Messages (MQTT messages, frames, requests) handled by a stage", ["stage"])
+READINGS = counter("pipeline_readings_total", "Readings handled by a stage", ["stage"])
+ERRORS = counter("pipeline_errors_total", "Failures in a stage", ["stage"])
+DROPPED = counter("pipeline_dropped_total", "Items dropped or spilled by a stage", ["stage"])
+QUEUE_DEPTH = gauge("pipeline_queue_depth", "Items waiting in a queue", ["queue"])
+LAG_SECONDS = histogram("pipeline_lag_seconds", "Reading timestamp to arrival at a sink (storage or display)",
+                        ["sink"], buckets=LAG_BUCKETS)
+
+# Lag of readings with the given epoch-second timestamps, as of now
+def observe_lag(sink, timestamps):
+    sink.observe_many(time.time() - np.asarray(timestamps, dtype=float))
+
+# Lag of stored documents / rows, whose timestamps are naive local datetimes
+def observe_datetime_lag(sink, timestamps):
+    if len(timestamps):
+        observe_lag(sink, codec.local_epoch(np.array(timestamps, dtype="datetime64[ms]")))
+
+# --- Side port for the standalone scripts ---
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0].rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+# Serve /metrics on a daemon thread. A port that cannot be bound is
+# reported and skipped: metrics must never stop the pipeline.
+def serve(port, host=""):
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        print(f"Metrics endpoint not started on port {port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"Metrics available on http://{host or '0.0.0.0'}:{server.server_address[1]}/metrics")
+    return server
+
+# Side port from METRICS_PORT (or default); 0 disables it
+def port_from_env(default):
+    return int(os.environ.get("METRICS_PORT", str(default)))
@@ -0,0 +1,130 @@
+import asyncio
+import bisect
+import collections
+import itertools
+import os
+import time
+from email.utils import formatdate
+
+# In-process cache of the newest readings per machine for /metrics/latest/.
+# An entry holds up to `depth` readings, oldest first, and is filled from
+# MongoDB on a miss. Readings stored by this process are merged in with
+# update() as they are written; the `ttl` reload picks up readings written
+# by other processes, so keep it short when they share the collection.
+# Every change bumps the entry's version, which the ETag is derived from.
+class LatestReadingsCache:
+    def __init__(self, fields, depth=100, ttl=2.0, max_machines=10000):
+        self.fields = fields
+        self.depth = depth
+        self.ttl = ttl
+        self.max_machines = max_machines
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._locks = {}
+        # Readings stored while a machine's load is in flight, merged into
+        # the entry once the load returns
+        self._pending = {}
+        self._versions = itertools.count(1)
+        # ETags must not repeat across restarts
+        self._epoch = f"{os.getpid():x}{time.time_ns():x}"
+
+    def _reading(self, doc):
+        return {field: doc[field] for field in self.fields if field in doc}
+
+    def _touch(self, entry, readings):
+        entry["readings"] = readings
+        entry["version"] = next(self._versions)
+        entry["modified"] = time.time()
+
+    def _store(self, machine_id, readings):
+        entry = self._entries.get(machine_id)
+        if entry is None:
+            entry = self._entries[machine_id] = {}
+            self._touch(entry, readings)
+        elif readings != entry["readings"]:
+            self._touch(entry, readings)
+        entry["loaded"] = time.monotonic()
+        self._entries.move_to_end(machine_id)
+        while len(self._entries) > self.max_machines:
+            evicted, _ = self._entries.popitem(last=False)
+            self._locks.pop(evicted, None)
+        return entry
+
+    # (readings, etag, last_modified) for the newest `limit` readings.
+    # load(machine_id, n) returns the newest n readings oldest first.
+    async def get(self, machine_id, limit, load):
+        if limit > self.depth:
+            readings = await load(machine_id, limit)
+            return readings, self.etag(machine_id, limit, None), None
+
+        entry = self._entries.get(machine_id)
+        if entry is None or time.monotonic() - entry["loaded"] > self.ttl:
+            lock = self._locks.setdefault(machine_id, asyncio.Lock())
+            async with lock:
+                entry = self._entries.get(machine_id)
+                if entry is None or time.monotonic() - entry["loaded"] > self.ttl:
+                    self.misses += 1
+                    self._pending[machine_id] = []
+                    try:
+                        loaded = await load(machine_id, self.depth)
+                    finally:
+                        pending = self._pending.pop(machine_id, [])
+                    readings = self._merge([self._reading(doc) for doc in loaded], pending)
+                    entry = self._store(machine_id, readings)
+                else:
+                    self.hits += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(machine_id)
+
+        readings = entry["readings"][-limit:] if limit > 0 else []
+        return readings, self.etag(machine_id, limit, entry), self.last_modified(entry)
+
+    def etag(self, machine_id, limit, entry):
+        if entry is None:
+            return None
+        return f'"{self._epoch}-{entry["version"]}-{limit}"'
+
+    # HTTP dates have 1 s resolution, so Last-Modified is only given once the
+    # second the entry changed in has passed: a later change within the same
+    # second would carry the same date and be answered with a stale 304
+    def last_modified(self, entry):
+        if int(entry["modified"]) >= int(time.time()):
+            return None
+        return formatdate(entry["modified"], usegmt=True)
+
+    # Insert `new` readings into `readings` in timestamp order, skipping any
+    # the load already returned, and keep the newest `depth`
+    def _merge(self, readings, new):
+        readings = list(readings)
+        keys = [reading["timestamp"] for reading in readings]
+        for reading in sorted(new, key=lambda r: r["timestamp"]):
+            start = bisect.bisect_left(keys, reading["timestamp"])
+            position = bisect.bisect_right(keys, reading["timestamp"])
+            if reading in readings[start:position]:
+                continue
+            keys.insert(position, reading["timestamp"])
+            readings.insert(position, reading)
+        return readings[-self.depth:]
+
+    # Merge freshly stored documents into the machines already cached, or
+    # hold them for machines whose load is in flight
+    def update(self, documents):
+        by_machine = collections.defaultdict(list)
+        for doc in documents:
+            machine_id = doc.get("machine_id")
+            if machine_id in self._pending:
+                self._pending[machine_id].append(self._reading(doc))
+            if machine_id in self._entries:
+                by_machine[machine_id].append(self._reading(doc))
+        for machine_id, new in by_machine.items():
+            entry = self._entries[machine_id]
+            readings = self._merge(entry["readings"], new)
+            if readings != entry["readings"]:
+                self._touch(entry, readings)
+
+    def clear(self):
+        self._entries.clear()
+        self._locks.clear()
+        self._pending.clear()
@@ -0,0 +1,199 @@
+import threading
+import time
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from bson import ObjectId
+import metrics_store
+import instrumentation
+
+METRIC_FIELDS = ("temperature", "vibration", "rpm")
+
+QUERY_SECONDS = instrumentation.STAGE_SECONDS.labels("dash_query")
+QUERIED_READINGS = instrumentation.READINGS.labels("dash_query")
+# Reading timestamp to the refresh that makes it displayable
+DISPLAY_LAG = instrumentation.LAG_SECONDS.labels("dash")
+
+# Fixed-capacity ring buffer of one machine's readings, stored as NumPy
+# columns in arrival order (oldest entries are overwritten first)
+class MachineSeries:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.timestamps = np.empty(capacity, dtype="datetime64[ns]")
+        self.values = {field: np.empty(capacity, dtype=float) for field in METRIC_FIELDS}
+        self.start = 0
+        self.count = 0
+
+    def extend(self, timestamps, values):
+        n = len(timestamps)
+        if n >= self.capacity:
+            timestamps = timestamps[-self.capacity:]
+            values = {field: column[-self.capacity:] for field, column in values.items()}
+            n = self.capacity
+
+        end = (self.start + self.count) % self.capacity
+        first = min(n, self.capacity - end)
+        self.timestamps[end:end + first] = timestamps[:first]
+        self.timestamps[:n - first] = timestamps[first:]
+        for field in METRIC_FIELDS:
+            self.values[field][end:end + first] = values[field][:first]
+            self.values[field][:n - first] = values[field][first:]
+
+        overflow = max(0, self.count + n - self.capacity)
+        self.start = (self.start + overflow) % self.capacity
+        self.count = min(self.capacity, self.count + n)
+
+    def _ordered(self, column):
+        end = self.start + self.count
+        if end <= self.capacity:
+            return column[self.start:end]
+        return np.concatenate((column[self.start:], column[:end - self.capacity]))
+
+    # Columns in time order, optionally only readings newer than `since`
+    def arrays(self, since=None):
+        timestamps = self._ordered(self.timestamps)
+        first = 0 if since is None else np.searchsorted(timestamps, np.datetime64(since, "ns"), side="right")
+        columns = {"timestamp": timestamps[first:]}
+        for field in METRIC_FIELDS:
+            columns[field] = self._ordered(self.values[field])[first:]
+        return columns
+
+    # Add readings in time order. Readings older than the newest cached one
+    # (late arrivals) are merged into place, which rebuilds the buffer.
+    def add(self, timestamps, values):
+        latest = self.latest()
+        if latest is None or not len(timestamps) or timestamps[0] >= latest:
+            self.extend(timestamps, values)
+            return
+        current = self.arrays()
+        merged = np.concatenate((current["timestamp"], timestamps))
+        order = np.argsort(merged, kind="stable")[-self.capacity:]
+        columns = {field: np.concatenate((current[field], values[field]))[order] for field in METRIC_FIELDS}
+        self.start = self.count = 0
+        self.extend(merged[order], columns)
+
+    def latest(self):
+        if not self.count:
+            return None
+        return self.timestamps[(self.start + self.count - 1) % self.capacity]
+
+    def oldest(self):
+        if not self.count:
+            return None
+        return self.timestamps[self.start]
+
+# Process-wide cache of per-machine ring buffers fed incrementally from
+# MongoDB. The first refresh loads initial_window of readings; later ones
+# only fetch documents inserted since the previous refresh, so the cost of
+# a dashboard tick does not grow with the size of machine_metrics.
+# "Inserted since" is tracked on _id (ObjectIds start with the time the
+# writer created them), not on the reading timestamp, so late MQTT readings
+# and bulk uploads of older readings are picked up as well. Each refresh
+# looks back late_slack seconds before the newest _id seen, for documents
+# whose insert became visible after a newer one's; documents that take
+# longer than that to appear (e.g. after several writer retries) are only
+# loaded after a restart. Refreshes are shared by all callbacks and
+# throttled to one per min_interval seconds.
+class MetricsCache:
+    def __init__(self, collection, capacity=20000, min_interval=1.0, initial_window=pd.Timedelta(days=7),
+                 late_slack=5.0):
+        self.collection = collection
+        self.capacity = capacity
+        self.min_interval = min_interval
+        self.initial_window = initial_window
+        self.late_slack = timedelta(seconds=late_slack)
+        self.series = {}
+        self.newest_id = None
+        # _ids inside the look-back window, so refetched documents are not added twice
+        self._recent_ids = {}
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def _find_new(self, projection):
+        if self.newest_id is None:
+            since = (pd.Timestamp.now() - self.initial_window).to_pydatetime()
+            return metrics_store.find_window(self.collection, since=since, projection=projection)
+        cutoff = ObjectId.from_datetime(self.newest_id.generation_time - self.late_slack)
+        return self.collection.find({"_id": {"$gte": cutoff}}, projection)
+
+    def _remember(self, docs):
+        newest = max(doc["_id"] for doc in docs)
+        if self.newest_id is None or newest > self.newest_id:
+            self.newest_id = newest
+        cutoff = self.newest_id.generation_time - self.late_slack
+        self._recent_ids.update((doc["_id"], doc["_id"].generation_time) for doc in docs
+                                if doc["_id"].generation_time >= cutoff)
+        self._recent_ids = {_id: created for _id, created in self._recent_ids.items() if created >= cutoff}
+
+    # Pull newly inserted documents into the ring buffers
+    def refresh(self):
+        with self._lock:
+            if time.monotonic() - self._last_refresh < self.min_interval:
+                return
+            self._last_refresh = time.monotonic()
+
+            started = time.perf_counter()
+            projection = {"machine_id": 1, "timestamp": 1, **{field: 1 for field in METRIC_FIELDS}}
+            docs = [doc for doc in self._find_new(projection) if doc["_id"] not in self._recent_ids]
+            QUERY_SECONDS.observe(time.perf_counter() - started)
+            if not docs:
+                return
+            QUERIED_READINGS.inc(len(docs))
+            # The first refresh backfills history; only later ones measure lag
+            if self.newest_id is not None:
+                instrumentation.observe_datetime_lag(DISPLAY_LAG, [doc["timestamp"] for doc in docs])
+            self._remember(docs)
+
+            df = pd.DataFrame(docs)
+            df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+            df = df.dropna(subset=["timestamp", "machine_id"])
+            # Inserts are not in timestamp order
+            df = df.sort_values(by="timestamp", kind="stable")
+            for field in METRIC_FIELDS:
+                if field not in df.columns:
+                    df[field] = np.nan
+            for machine_id, group in df.groupby("machine_id", sort=False):
+                series = self.series.get(machine_id)
+                if series is None:
+                    series = self.series[machine_id] = MachineSeries(self.capacity)
+                series.add(
+                    group["timestamp"].to_numpy(dtype="datetime64[ns]"),
+                    {field: group[field].to_numpy(dtype=float) for field in METRIC_FIELDS}
+                )
+
+    def machine_ids(self):
+        with self._lock:
+            return list(self.series)
+
+    # Newest reading timestamp across all machines
+    def latest_timestamp(self):
+        with self._lock:
+            latest = [s.latest() for s in self.series.values() if s.count]
+        return pd.Timestamp(max(latest)) if latest else None
+
+    # Oldest cached reading for a machine; anything earlier must come from MongoDB
+    def oldest_timestamp(self, machine_id):
+        with self._lock:
+            series = self.series.get(machine_id)
+            oldest = series.oldest() if series else None
+        return pd.Timestamp(oldest) if oldest is not None else None
+
+    # DataFrame of cached readings for one machine (or all machines),
+    # optionally only readings newer than `since`
+    def frame(self, machine_id=None, since=None):
+        frames = []
+        with self._lock:
+            machine_ids = [machine_id] if machine_id is not None else list(self.series)
+            for mid in machine_ids:
+                series = self.series.get(mid)
+                if series is None or not series.count:
+                    continue
+                columns = series.arrays(since)
+                if len(columns["timestamp"]):
+                    frames.append(pd.DataFrame({"machine_id": mid, **columns}))
+        if not frames:
+            return pd.DataFrame(columns=["machine_id", "timestamp", *METRIC_FIELDS])
+        df = pd.concat(frames, ignore_index=True)
+        if len(frames) > 1:
+            df = df.sort_values(by="timestamp", kind="stable", ignore_index=True)
+        return df
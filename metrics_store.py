@@ -0,0 +1,172 @@
+import argparse
+import base64
+import json
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, MongoClient, UpdateOne
+
+MONGO_URI = "mongodb://localhost:27017/"
+METRICS_FIELDS = ("machine_id", "timestamp", "temperature", "vibration", "rpm")
+METRICS_PROJECTION = {"_id": 0, **{field: 1 for field in METRICS_FIELDS}}
+# Total order used for keyset pagination
+KEYSET_SORT = [("timestamp", ASCENDING), ("_id", ASCENDING)]
+
+# Storage conventions for demo.machine_metrics: timestamps are stored as
+# native BSON datetimes and readings are indexed by (machine_id, timestamp, _id)
+# and (timestamp, _id), so windows and keyset pages are index scans.
+# The plain helpers run their queries synchronously and take a pymongo
+# collection. find_window and find_page only build a cursor, so with a
+# motor collection they return an async cursor to iterate with async for;
+# the *_async variants are the motor versions of the helpers that execute
+# queries themselves.
+
+INDEXES = {
+    "machine_id_timestamp_id": [("machine_id", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)],
+    "timestamp_id": [("timestamp", ASCENDING), ("_id", ASCENDING)],
+}
+# Superseded by machine_id_timestamp_id
+OLD_INDEXES = ("machine_id_timestamp",)
+
+def ensure_indexes(collection):
+    for name, keys in INDEXES.items():
+        collection.create_index(keys, name=name)
+    existing = collection.index_information()
+    for name in OLD_INDEXES:
+        if name in existing:
+            collection.drop_index(name)
+
+# Same as ensure_indexes() for a motor collection
+async def ensure_indexes_async(collection):
+    for name, keys in INDEXES.items():
+        await collection.create_index(keys, name=name)
+    existing = await collection.index_information()
+    for name in OLD_INDEXES:
+        if name in existing:
+            await collection.drop_index(name)
+
+# Timestamps are stored as naive local time, like the readings publishers send
+def parse_timestamp(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+# Document to insert for a reading (a copy with a datetime timestamp)
+def to_document(reading):
+    document = dict(reading)
+    document["timestamp"] = parse_timestamp(document["timestamp"])
+    return document
+
+# Filter for one machine (or all) inside an optional [since, until] window
+def window_filter(machine_id=None, since=None, until=None):
+    query = {}
+    if machine_id is not None:
+        query["machine_id"] = machine_id
+    window = {}
+    if since is not None:
+        window["$gte"] = parse_timestamp(since)
+    if until is not None:
+        window["$lte"] = parse_timestamp(until)
+    if window:
+        query["timestamp"] = window
+    return query
+
+# Readings in a window, sorted by timestamp, with the projection applied by MongoDB
+def find_window(collection, machine_id=None, since=None, until=None,
+                projection=METRICS_PROJECTION, ascending=True, limit=0):
+    cursor = collection.find(window_filter(machine_id, since, until), projection)
+    cursor = cursor.sort("timestamp", ASCENDING if ascending else DESCENDING)
+    return cursor.limit(limit) if limit else cursor
+
+# Newest `limit` readings of a machine, oldest first
+async def latest_async(collection, machine_id, limit=10):
+    docs = await find_window(collection, machine_id, ascending=False, limit=limit).to_list(limit or None)
+    return docs[::-1]
+
+# Opaque page token for a (timestamp, _id) position in KEYSET_SORT order
+def encode_cursor(key):
+    timestamp, _id = key
+    key = json.dumps([timestamp.isoformat(), str(_id)])
+    return base64.urlsafe_b64encode(key.encode("utf-8")).decode("ascii").rstrip("=")
+
+# (timestamp, _id) from a page token; ValueError if it is malformed
+def decode_cursor(token):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        timestamp, _id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(timestamp), ObjectId(_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {token!r}") from e
+
+# Window filter restricted to documents after a (timestamp, _id) position
+# and, with upto, at or before another one
+def keyset_filter(machine_id=None, since=None, until=None, after=None, upto=None):
+    query = window_filter(machine_id, since, until)
+    bounds = []
+    if after is not None:
+        timestamp, _id = after
+        bounds.append({"$or": [{"timestamp": {"$gt": timestamp}}, {"timestamp": timestamp, "_id": {"$gt": _id}}]})
+    if upto is not None:
+        timestamp, _id = upto
+        bounds.append({"$or": [{"timestamp": {"$lt": timestamp}}, {"timestamp": timestamp, "_id": {"$lte": _id}}]})
+    if not bounds:
+        return query
+    clauses = ([query] if query else []) + bounds
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+# One keyset page of readings in (timestamp, _id) order
+def find_page(collection, machine_id=None, since=None, until=None, after=None,
+              projection=METRICS_PROJECTION, limit=0, upto=None):
+    cursor = collection.find(keyset_filter(machine_id, since, until, after, upto), projection).sort(KEYSET_SORT)
+    return cursor.limit(limit) if limit else cursor
+
+# (timestamp, _id) of the last reading on a page of `limit` readings, or
+# None if it is the last page. Skips along the index to that key instead
+# of reading the page itself; serve the page with find_page(upto=key) so
+# readings inserted in between are not skipped.
+async def page_end_async(collection, machine_id=None, since=None, until=None, after=None, limit=0):
+    if not limit:
+        return None
+    cursor = find_page(collection, machine_id, since, until, after, {"_id": 1, "timestamp": 1})
+    docs = await cursor.skip(limit - 1).limit(2).to_list(2)
+    return (docs[0]["timestamp"], docs[0]["_id"]) if len(docs) == 2 else None
+
+# Machine ids with readings (since `since`, if given)
+async def machine_ids_async(collection, since=None):
+    return await collection.distinct("machine_id", window_filter(since=since))
+
+# One-off, in-place conversion of string timestamps to BSON datetimes
+def migrate_timestamps(collection, batch_size=1000):
+    converted = skipped = 0
+    ops = []
+    for doc in collection.find({"timestamp": {"$type": "string"}}, {"timestamp": 1}):
+        try:
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"timestamp": parse_timestamp(doc["timestamp"])}}))
+        except ValueError:
+            skipped += 1
+            continue
+        if len(ops) >= batch_size:
+            converted += collection.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        converted += collection.bulk_write(ops, ordered=False).modified_count
+    return converted, skipped
+
+def main():
+    parser = argparse.ArgumentParser(description="machine_metrics storage maintenance")
+    parser.add_argument("command", choices=["migrate", "ensure-indexes"])
+    parser.add_argument("--uri", default=MONGO_URI)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    collection = MongoClient(args.uri)["demo"]["machine_metrics"]
+    ensure_indexes(collection)
+    if args.command == "migrate":
+        converted, skipped = migrate_timestamps(collection, args.batch_size)
+        print(f"Converted {converted} timestamps, skipped {skipped} unparseable documents.")
+    else:
+        print("Indexes ensured.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import asyncio
+import time
+from pymongo.errors import BulkWriteError, ConnectionFailure
+import instrumentation
+
+# Insert latency and volume, and storage lag per reading
+INSERT_SECONDS = instrumentation.STAGE_SECONDS.labels("mongo_insert")
+INSERTED = instrumentation.READINGS.labels("mongo_insert")
+INSERT_ERRORS = instrumentation.ERRORS.labels("mongo_insert")
+STORED_LAG = instrumentation.LAG_SECONDS.labels("mongodb")
+
+DUPLICATE_KEY = 11000
+
+# Insert metrics for a batch written at perf_counter() time `started`.
+# Never raises: a metrics failure must not skip on_flush or stop a writer.
+def record_insert(batch, started):
+    try:
+        INSERT_SECONDS.observe(time.perf_counter() - started)
+        INSERTED.inc(len(batch))
+        instrumentation.observe_datetime_lag(STORED_LAG, [doc["timestamp"] for doc in batch])
+    except Exception as e:
+        print(f"Error recording MongoDB insert metrics: {e}")
+
+# Buffers documents and writes them with insert_many(ordered=False) from a
+# background task, flushing when batch_size documents are queued or
+# max_latency seconds have passed. Writes go through an async driver
+# collection (motor) so the event loop is never blocked. on_flush(batch),
+# a coroutine function, runs after each insert with the documents that were
+# stored (e.g. to maintain rollups and caches). Connection failures are
+# retried up to max_retries times with exponential backoff from retry_delay.
+class AsyncMongoBatchWriter:
+    def __init__(self, collection, batch_size=1000, max_latency=0.5, max_queue=100000, on_flush=None,
+                 max_retries=3, retry_delay=0.5):
+        self.collection = collection
+        self.on_flush = on_flush
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.inserted = 0
+        self.failed = 0
+        self._task = None
+        instrumentation.QUEUE_DEPTH.labels("mongo_writer").set_function(self.queue.qsize)
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    @property
+    def depth(self):
+        return self.queue.qsize()
+
+    async def submit(self, document):
+        await self.queue.put(document)
+
+    async def submit_many(self, documents):
+        for document in documents:
+            await self.queue.put(document)
+
+    async def flush(self):
+        await self.queue.join()
+
+    async def close(self):
+        await self.flush()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _next_batch(self):
+        batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_latency
+        while len(batch) < self.batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    # Insert a batch and return the documents that are stored. insert_many
+    # gives every document its _id before sending, so a retried batch finds
+    # the documents a failed attempt already stored as duplicate keys.
+    async def _insert(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self.collection.insert_many(batch, ordered=False)
+                return batch
+            except BulkWriteError as e:
+                failed = {error["index"] for error in e.details.get("writeErrors", [])
+                          if not (attempt and error.get("code") == DUPLICATE_KEY)}
+                if failed:
+                    INSERT_ERRORS.inc()
+                    print(f"Error inserting {len(failed)} of {len(batch)} documents into MongoDB: {e}")
+                return [doc for index, doc in enumerate(batch) if index not in failed]
+            except ConnectionFailure as e:
+                if attempt == self.max_retries:
+                    INSERT_ERRORS.inc()
+                    print(f"Error inserting data into MongoDB, giving up after {attempt + 1} attempts: {e}")
+                    return []
+                delay = self.retry_delay * 2 ** attempt
+                print(f"Error inserting data into MongoDB ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+            except Exception as e:
+                INSERT_ERRORS.inc()
+                print(f"Error inserting data into MongoDB: {e}")
+                return []
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            started = time.perf_counter()
+            try:
+                stored = await self._insert(batch)
+                self.inserted += len(stored)
+                self.failed += len(batch) - len(stored)
+                if stored:
+                    record_insert(stored, started)
+                    if self.on_flush:
+                        try:
+                            await self.on_flush(stored)
+                        except Exception as e:
+                            print(f"Error in MongoDB flush hook: {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
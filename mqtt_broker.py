@@ -0,0 +1,235 @@
+import argparse
+import asyncio
+import itertools
+import struct
+import threading
+
+# Minimal in-process MQTT 3.1.1 broker for local runs and benchmarks.
+# Supports CONNECT, PUBLISH (QoS 0/1/2 inbound), SUBSCRIBE with + and #
+# wildcards, shared subscriptions ($share/<group>/<filter>, round-robin
+# within a group), UNSUBSCRIBE, PINGREQ and DISCONNECT. Subscriptions are
+# granted QoS 0, so delivery is at most once; retained messages, wills and
+# persistent sessions are not implemented.
+CONNECT, CONNACK, PUBLISH, PUBACK, PUBREC, PUBREL, PUBCOMP = 1, 2, 3, 4, 5, 6, 7
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK, PINGREQ, PINGRESP, DISCONNECT = 8, 9, 10, 11, 12, 13, 14
+
+# Pause a publisher while a subscriber has this much unsent data
+HIGH_WATER = 4 * 1024 * 1024
+
+def _remaining_length(n):
+    out = bytearray()
+    while True:
+        byte = n % 128
+        n //= 128
+        out.append(byte | 0x80 if n else byte)
+        if not n:
+            return bytes(out)
+
+def _packet(first_byte, body=b""):
+    return bytes([first_byte]) + _remaining_length(len(body)) + body
+
+def _string(data, offset):
+    (length,) = struct.unpack_from("!H", data, offset)
+    start = offset + 2
+    return data[start:start + length].decode("utf-8"), start + length
+
+def _encode_string(text):
+    raw = text.encode("utf-8")
+    return struct.pack("!H", len(raw)) + raw
+
+def topic_matches(topic_filter, topic):
+    filter_levels = topic_filter.split("/")
+    topic_levels = topic.split("/")
+    if topic.startswith("$") and filter_levels[0] in ("+", "#"):
+        return False
+    for i, level in enumerate(filter_levels):
+        if level == "#":
+            return True
+        if i >= len(topic_levels):
+            return False
+        if level != "+" and level != topic_levels[i]:
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+class _Session:
+    def __init__(self, writer):
+        self.writer = writer
+        self.client_id = ""
+        self.filters = set()
+
+    def send(self, data):
+        self.writer.write(data)
+
+    @property
+    def backlog(self):
+        transport = self.writer.transport
+        return transport.get_write_buffer_size() if transport else 0
+
+class MqttBroker:
+    def __init__(self, host="127.0.0.1", port=1883):
+        self.host = host
+        self.port = port
+        self.sessions = set()
+        self.shared = {}  # (group, filter) -> [sessions]
+        self.messages_in = 0
+        self.messages_out = 0
+        self._round_robin = itertools.count()
+        self._server = None
+        self._loop = None
+        self._thread = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            for session in list(self.sessions):
+                session.writer.close()
+            await self._server.wait_closed()
+
+    # Run the broker on its own event loop thread; returns once it listens
+    def start_background(self):
+        started = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            started.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self.close())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="mqtt-broker", daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop_background(self):
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(5)
+
+    async def _read_packet(self, reader):
+        header = await reader.readexactly(1)
+        multiplier, length = 1, 0
+        while True:
+            byte = (await reader.readexactly(1))[0]
+            length += (byte & 0x7F) * multiplier
+            if not byte & 0x80:
+                break
+            multiplier *= 128
+        body = await reader.readexactly(length) if length else b""
+        return header[0], body
+
+    async def _handle(self, reader, writer):
+        session = _Session(writer)
+        self.sessions.add(session)
+        try:
+            while True:
+                first_byte, body = await self._read_packet(reader)
+                kind = first_byte >> 4
+                if kind == PUBLISH:
+                    self._on_publish(session, first_byte, body)
+                    slow = [s.writer.drain() for s in list(self.sessions) if s.backlog > HIGH_WATER]
+                    if slow:
+                        await asyncio.gather(*slow, return_exceptions=True)
+                elif kind == CONNECT:
+                    _, offset = _string(body, 0)
+                    session.client_id, _ = _string(body, offset + 4)
+                    session.send(_packet(CONNACK << 4, b"\x00\x00"))
+                elif kind == SUBSCRIBE:
+                    self._on_subscribe(session, body)
+                elif kind == UNSUBSCRIBE:
+                    self._on_unsubscribe(session, body)
+                elif kind == PUBREL:
+                    session.send(_packet(PUBCOMP << 4, body[:2]))
+                elif kind == PINGREQ:
+                    session.send(_packet(PINGRESP << 4))
+                elif kind == DISCONNECT:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._drop(session)
+            writer.close()
+
+    def _on_publish(self, session, first_byte, body):
+        qos = (first_byte >> 1) & 0x03
+        topic, offset = _string(body, 0)
+        if qos:
+            packet_id = body[offset:offset + 2]
+            offset += 2
+            session.send(_packet(PUBACK << 4 if qos == 1 else PUBREC << 4, packet_id))
+        self.messages_in += 1
+
+        message = _packet(PUBLISH << 4, _encode_string(topic) + body[offset:])
+        for target in self.sessions:
+            if any(not f.startswith("$share/") and topic_matches(f, topic) for f in target.filters):
+                target.send(message)
+                self.messages_out += 1
+        for (group, topic_filter), members in self.shared.items():
+            if members and topic_matches(topic_filter, topic):
+                members[next(self._round_robin) % len(members)].send(message)
+                self.messages_out += 1
+
+    def _on_subscribe(self, session, body):
+        packet_id = body[:2]
+        offset = 2
+        granted = bytearray()
+        while offset < len(body):
+            topic_filter, offset = _string(body, offset)
+            offset += 1  # requested QoS; everything is delivered at QoS 0
+            self._add_filter(session, topic_filter)
+            granted.append(0)
+        session.send(_packet(SUBACK << 4, packet_id + bytes(granted)))
+
+    def _on_unsubscribe(self, session, body):
+        packet_id = body[:2]
+        offset = 2
+        while offset < len(body):
+            topic_filter, offset = _string(body, offset)
+            self._remove_filter(session, topic_filter)
+        session.send(_packet(UNSUBACK << 4, packet_id))
+
+    def _add_filter(self, session, topic_filter):
+        if topic_filter in session.filters:
+            return
+        session.filters.add(topic_filter)
+        if topic_filter.startswith("$share/"):
+            _, group, shared_filter = topic_filter.split("/", 2)
+            self.shared.setdefault((group, shared_filter), []).append(session)
+
+    def _remove_filter(self, session, topic_filter):
+        session.filters.discard(topic_filter)
+        if topic_filter.startswith("$share/"):
+            _, group, shared_filter = topic_filter.split("/", 2)
+            members = self.shared.get((group, shared_filter), [])
+            if session in members:
+                members.remove(session)
+
+    def _drop(self, session):
+        for topic_filter in list(session.filters):
+            self._remove_filter(session, topic_filter)
+        self.sessions.discard(session)
+
+def main():
+    parser = argparse.ArgumentParser(description="Local MQTT broker for development and benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1883)
+    args = parser.parse_args()
+
+    async def serve():
+        broker = await MqttBroker(args.host, args.port).start()
+        print(f"MQTT broker listening on {args.host}:{broker.port}")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
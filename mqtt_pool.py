@@ -0,0 +1,135 @@
+import itertools
+import threading
+import time
+import paho.mqtt.client as mqtt
+
+# Pool of long-lived MQTT publisher connections.
+# Each client keeps one connection open for the life of the process and
+# runs its own network loop thread, which also sends keepalive pings and
+# reconnects after a drop. publish_many() queues a whole batch on one
+# client back to back, so the loop thread writes it out in one go, and
+# waits for QoS 1/2 acknowledgements together rather than per message.
+class MqttPublisherPool:
+    def __init__(self, host, port=1883, size=2, keepalive=60, client_id_prefix="",
+                 max_inflight=1000, connect_timeout=5.0, publish_timeout=10.0):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.keepalive = keepalive
+        self.client_id_prefix = client_id_prefix
+        self.max_inflight = max_inflight
+        self.connect_timeout = connect_timeout
+        self.publish_timeout = publish_timeout
+        self.clients = []
+        self.published = 0
+        self.failed = 0
+        self.reconnects = 0
+        self._connected = set()
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._next = itertools.count()
+
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc != 0:
+            print(f"MQTT publisher {userdata} failed to connect: {mqtt.connack_string(rc)}")
+            return
+        with self._lock:
+            if userdata in self._connected:
+                return
+            self._connected.add(userdata)
+            self._ready.set()
+        print(f"MQTT publisher {userdata} connected to {self.host}:{self.port}")
+
+    def _on_disconnect(self, client, userdata, rc):
+        with self._lock:
+            self._connected.discard(userdata)
+            if not self._connected:
+                self._ready.clear()
+            if rc != 0:
+                self.reconnects += 1
+        if rc != 0:
+            print(f"MQTT publisher {userdata} disconnected ({mqtt.error_string(rc)}), reconnecting.")
+
+    # Open all connections; waits up to connect_timeout for the first one
+    def start(self):
+        for index in range(self.size):
+            client_id = f"{self.client_id_prefix}-{index}" if self.client_id_prefix else ""
+            client = mqtt.Client(client_id=client_id, clean_session=True, userdata=index)
+            client.max_inflight_messages_set(self.max_inflight)
+            client.reconnect_delay_set(min_delay=1, max_delay=30)
+            client.on_connect = self._on_connect
+            client.on_disconnect = self._on_disconnect
+            client.connect_async(self.host, self.port, self.keepalive)
+            client.loop_start()
+            self.clients.append(client)
+            self._locks[index] = threading.Lock()
+        if not self._ready.wait(self.connect_timeout):
+            print(f"MQTT publisher pool not connected to {self.host}:{self.port} yet, will keep retrying.")
+        return self
+
+    def healthy(self):
+        with self._lock:
+            return bool(self._connected)
+
+    def health(self):
+        with self._lock:
+            connected = len(self._connected)
+        return {
+            "broker": f"{self.host}:{self.port}",
+            "connections": len(self.clients),
+            "connected": connected,
+            "published": self.published,
+            "failed": self.failed,
+            "reconnects": self.reconnects,
+        }
+
+    # Round-robin over the connected clients
+    def _checkout(self):
+        with self._lock:
+            connected = sorted(self._connected)
+        if not connected:
+            raise ConnectionError(f"No MQTT connection to {self.host}:{self.port}")
+        index = connected[next(self._next) % len(connected)]
+        return index, self.clients[index]
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        return self.publish_many(topic, [payload], qos, retain)
+
+    # Publish a batch of payloads on one connection; returns the number sent.
+    # QoS 0 returns once the messages are queued, QoS 1/2 once every
+    # message has been acknowledged or publish_timeout expires.
+    def publish_many(self, topic, payloads, qos=0, retain=False):
+        index, client = self._checkout()
+        with self._locks[index]:
+            infos = [client.publish(topic, payload, qos, retain) for payload in payloads]
+
+        errors = [info.rc for info in infos if info.rc != mqtt.MQTT_ERR_SUCCESS]
+        if errors:
+            self.failed += len(errors)
+            self.published += len(infos) - len(errors)
+            raise ConnectionError(f"MQTT publish failed for {len(errors)} of {len(infos)} messages: "
+                                  f"{mqtt.error_string(errors[0])}")
+
+        if qos > 0:
+            deadline = time.monotonic() + self.publish_timeout
+            for info in infos:
+                info.wait_for_publish(max(deadline - time.monotonic(), 0))
+            pending = sum(1 for info in infos if not info.is_published())
+            if pending:
+                self.failed += pending
+                self.published += len(infos) - pending
+                raise TimeoutError(f"{pending} of {len(infos)} MQTT messages not acknowledged "
+                                   f"within {self.publish_timeout}s")
+
+        self.published += len(infos)
+        return len(infos)
+
+    def close(self):
+        for client in self.clients:
+            client.disconnect()
+            client.loop_stop()
+        self.clients = []
+        with self._lock:
+            self._connected.clear()
+            self._ready.clear()
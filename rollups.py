@@ -0,0 +1,198 @@
+import argparse
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, MongoClient, UpdateOne
+import metrics_store
+
+# Rollup collections of machine_metrics: per machine and per 1-minute /
+# 1-hour bucket, count plus sum/min/max/last of every metric (mean is
+# sum / count). Ingest keeps them current with batched $inc/$min/$max
+# upserts; `python rollups.py backfill` rebuilds the closed buckets from
+# machine_metrics.
+RESOLUTIONS = {
+    "1m": timedelta(minutes=1),
+    "1h": timedelta(hours=1),
+}
+METRICS = ("temperature", "vibration", "rpm")
+
+# Ranges wider than these are read from rollups instead of raw readings
+MINUTE_ROLLUP_SPAN = timedelta(hours=6)
+HOUR_ROLLUP_SPAN = timedelta(days=7)
+
+def collection_for(db, resolution):
+    return db[f"machine_metrics_{resolution}"]
+
+def ensure_indexes(db):
+    for resolution in RESOLUTIONS:
+        collection_for(db, resolution).create_index(
+            [("machine_id", ASCENDING), ("bucket", ASCENDING)], name="machine_id_bucket"
+        )
+
+# Same as ensure_indexes() for a motor database
+async def ensure_indexes_async(db):
+    for resolution in RESOLUTIONS:
+        await collection_for(db, resolution).create_index(
+            [("machine_id", ASCENDING), ("bucket", ASCENDING)], name="machine_id_bucket"
+        )
+
+def bucket_start(timestamp, resolution):
+    size = RESOLUTIONS[resolution]
+    return datetime.min + ((timestamp - datetime.min) // size) * size
+
+# Bulk update requests folding a batch of documents into one rollup
+# collection. Must be written with ordered=True: the second request of each
+# bucket sets "last" only if this batch holds the bucket's newest reading.
+def rollup_requests(documents, resolution):
+    buckets = {}
+    for doc in documents:
+        timestamp = metrics_store.parse_timestamp(doc["timestamp"])
+        key = (doc["machine_id"], bucket_start(timestamp, resolution))
+        agg = buckets.get(key)
+        if agg is None:
+            agg = buckets[key] = {"count": 0, "sum": {}, "min": {}, "max": {}, "last_ts": None, "last": None}
+        agg["count"] += 1
+        for metric in METRICS:
+            value = doc.get(metric)
+            if value is None:
+                continue
+            agg["sum"][metric] = agg["sum"].get(metric, 0) + value
+            agg["min"][metric] = min(agg["min"].get(metric, value), value)
+            agg["max"][metric] = max(agg["max"].get(metric, value), value)
+        if agg["last_ts"] is None or timestamp >= agg["last_ts"]:
+            agg["last_ts"] = timestamp
+            agg["last"] = {metric: doc.get(metric) for metric in METRICS}
+
+    requests = []
+    for (machine_id, bucket), agg in buckets.items():
+        _id = {"machine_id": machine_id, "bucket": bucket}
+        update = {
+            "$setOnInsert": {"machine_id": machine_id, "bucket": bucket},
+            "$inc": {"count": agg["count"], **{f"sum.{m}": v for m, v in agg["sum"].items()}},
+            "$min": {f"min.{m}": v for m, v in agg["min"].items()},
+            "$max": {**{f"max.{m}": v for m, v in agg["max"].items()}, "last_ts": agg["last_ts"]},
+        }
+        requests.append(UpdateOne({"_id": _id}, update, upsert=True))
+        requests.append(UpdateOne({"_id": _id, "last_ts": agg["last_ts"]}, {"$set": {"last": agg["last"]}}))
+    return requests
+
+# Fold freshly inserted documents into every rollup collection (motor)
+async def apply_async(db, documents):
+    for resolution in RESOLUTIONS:
+        requests = rollup_requests(documents, resolution)
+        if requests:
+            await collection_for(db, resolution).bulk_write(requests, ordered=True)
+
+# Rollup resolution for a time range, or None when raw readings are fine
+def choose_resolution(since, until):
+    if since is None or until is None:
+        return "1h"
+    span = metrics_store.parse_timestamp(until) - metrics_store.parse_timestamp(since)
+    if span > HOUR_ROLLUP_SPAN:
+        return "1h"
+    if span > MINUTE_ROLLUP_SPAN:
+        return "1m"
+    return None
+
+def rollup_filter(machine_id, since=None, until=None, resolution="1h"):
+    query = {"machine_id": machine_id}
+    window = {}
+    if since is not None:
+        window["$gte"] = bucket_start(metrics_store.parse_timestamp(since), resolution)
+    if until is not None:
+        window["$lte"] = metrics_store.parse_timestamp(until)
+    if window:
+        query["bucket"] = window
+    return query
+
+# Rollup document -> flat row with mean/min/max/last per metric
+def to_row(doc):
+    count = doc.get("count", 0)
+    row = {"machine_id": doc["machine_id"], "timestamp": doc["bucket"], "count": count}
+    for metric in METRICS:
+        total = doc.get("sum", {}).get(metric)
+        row[metric] = {
+            "mean": total / count if count and total is not None else None,
+            "min": doc.get("min", {}).get(metric),
+            "max": doc.get("max", {}).get(metric),
+            "last": (doc.get("last") or {}).get(metric),
+        }
+    return row
+
+def read_rollups(db, machine_id, since=None, until=None, resolution="1h"):
+    cursor = collection_for(db, resolution).find(rollup_filter(machine_id, since, until, resolution), {"_id": 0})
+    return [to_row(doc) for doc in cursor.sort("bucket", ASCENDING)]
+
+# Same as read_rollups() for a motor database
+async def read_rollups_async(db, machine_id, since=None, until=None, resolution="1h"):
+    cursor = collection_for(db, resolution).find(rollup_filter(machine_id, since, until, resolution), {"_id": 0})
+    return [to_row(doc) async for doc in cursor.sort("bucket", ASCENDING)]
+
+# Aggregation over machine_metrics producing rollup documents, shaped like
+# the ones rollup_requests() upserts (same _id), for the buckets that
+# closed before until (default: the start of the current bucket).
+def backfill_pipeline(resolution, since=None, until=None):
+    size_ms = int(RESOLUTIONS[resolution].total_seconds() * 1000)
+    if until is None:
+        until = datetime.now()
+    match = {"timestamp": {"$type": "date", "$lt": bucket_start(until, resolution)}}
+    if since is not None:
+        match["timestamp"]["$gte"] = bucket_start(since, resolution)
+
+    # timestamp minus (milliseconds since the epoch mod bucket size), i.e.
+    # bucket_start() on the server
+    since_epoch = {"$subtract": ["$timestamp", datetime(1970, 1, 1)]}
+    group = {
+        "_id": {
+            "machine_id": "$machine_id",
+            "bucket": {"$subtract": ["$timestamp", {"$mod": [since_epoch, size_ms]}]},
+        },
+        "count": {"$sum": 1},
+        "last_ts": {"$last": "$timestamp"},
+    }
+    for metric in METRICS:
+        group[f"sum_{metric}"] = {"$sum": f"${metric}"}
+        group[f"min_{metric}"] = {"$min": f"${metric}"}
+        group[f"max_{metric}"] = {"$max": f"${metric}"}
+        group[f"last_{metric}"] = {"$last": f"${metric}"}
+
+    shape = {
+        "machine_id": "$_id.machine_id",
+        "bucket": "$_id.bucket",
+        "count": 1,
+        "last_ts": 1,
+    }
+    for part in ("sum", "min", "max", "last"):
+        shape[part] = {metric: f"${part}_{metric}" for metric in METRICS}
+
+    return [
+        {"$match": match},
+        {"$sort": {"timestamp": 1}},
+        {"$group": group},
+        {"$project": shape},
+    ]
+
+# Rebuild one rollup collection from machine_metrics on the server.
+# Buckets are recomputed and replaced whole, so only closed buckets are
+# rebuilt; open buckets are left to ingest's $inc upserts, which a replace
+# would otherwise overwrite.
+def backfill(db, resolution, since=None, until=None):
+    merge = {"$merge": {"into": collection_for(db, resolution).name, "whenMatched": "replace", "whenNotMatched": "insert"}}
+    db["machine_metrics"].aggregate(backfill_pipeline(resolution, since, until) + [merge], allowDiskUse=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain machine_metrics rollup collections")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--uri", default=metrics_store.MONGO_URI)
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None,
+                        help="only rebuild buckets from this ISO timestamp on")
+    parser.add_argument("--until", type=datetime.fromisoformat, default=None,
+                        help="only rebuild buckets closed before this ISO timestamp (default: now)")
+    args = parser.parse_args()
+
+    db = MongoClient(args.uri)["demo"]
+    ensure_indexes(db)
+    for resolution in RESOLUTIONS:
+        backfill(db, resolution, args.since, args.until)
+        print(f"Backfilled {collection_for(db, resolution).name}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+
+SEGMENT_SUFFIX = ".tsv"
+ACTIVE_SUFFIX = ".tsv.part"
+
+# Escape a value the way LOAD DATA expects with its default
+# FIELDS ESCAPED BY '\\' / TERMINATED BY '\t' / LINES TERMINATED BY '\n'
+def _escape(value):
+    if value is None:
+        return "\\N"
+    if hasattr(value, "isoformat"):
+        value = value.isoformat(sep=" ")
+    text = str(value)
+    return text.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+def _unescape(text):
+    if text == "\\N":
+        return None
+    if "\\" not in text:
+        return text
+    out = []
+    chars = iter(text)
+    for ch in chars:
+        if ch == "\\":
+            nxt = next(chars, "")
+            out.append({"t": "\t", "n": "\n"}.get(nxt, nxt))
+        else:
+            out.append(ch)
+    return "".join(out)
+
+# Encode a row tuple as one tab-separated line
+def encode_row(row):
+    return "\t".join(_escape(v) for v in row) + "\n"
+
+# Read the rows of a sealed segment back as tuples of strings
+def read_rows(path):
+    with open(path, "r", encoding="utf-8", newline="\n") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if line:
+                yield tuple(_unescape(v) for v in line.split("\t"))
+
+# Append-only, segmented on-disk buffer for rows the database could not take.
+# Writes are fsync'd in groups (every fsync_every rows or fsync_interval
+# seconds) so a crash loses at most one group. Segments are rotated at
+# segment_rows and replayed oldest first.
+class SpillBuffer:
+    def __init__(self, directory, segment_rows=100000, fsync_every=500, fsync_interval=1.0):
+        self.directory = directory
+        self.segment_rows = segment_rows
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._file = None
+        self._path = None
+        self._rows_in_segment = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._seq = 0
+        os.makedirs(directory, exist_ok=True)
+        self._recover()
+        # Sealed segments awaiting replay, kept in memory so pending() is
+        # cheap enough to call on every writer loop iteration
+        self._sealed = len(self.segments())
+
+    # Segments left active by a previous process are complete up to their
+    # last fsync, so treat them as sealed
+    def _recover(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(ACTIVE_SUFFIX):
+                path = os.path.join(self.directory, name)
+                os.replace(path, path[:-len(".part")])
+
+    def _open_segment(self):
+        self._seq += 1
+        name = f"alerts-{time.time_ns()}-{self._seq:06d}{ACTIVE_SUFFIX}"
+        self._path = os.path.join(self.directory, name)
+        self._file = open(self._path, "a", encoding="utf-8", newline="\n")
+        self._rows_in_segment = 0
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _seal_locked(self):
+        if self._file is None:
+            return
+        self._sync()
+        self._file.close()
+        os.replace(self._path, self._path[:-len(".part")])
+        self._file = None
+        self._path = None
+        self._sealed += 1
+
+    # Append rows to the active segment
+    def append(self, rows):
+        with self._lock:
+            for row in rows:
+                if self._file is None:
+                    self._open_segment()
+                self._file.write(encode_row(row))
+                self._rows_in_segment += 1
+                self._unsynced += 1
+                if self._rows_in_segment >= self.segment_rows:
+                    self._seal_locked()
+            if self._file is not None and (
+                self._unsynced >= self.fsync_every
+                or time.monotonic() - self._last_sync >= self.fsync_interval
+            ):
+                self._sync()
+
+    # Close the active segment so it becomes available for replay
+    def seal(self):
+        with self._lock:
+            self._seal_locked()
+
+    def segments(self):
+        names = sorted(n for n in os.listdir(self.directory) if n.endswith(SEGMENT_SUFFIX))
+        return [os.path.join(self.directory, n) for n in names]
+
+    def pending(self):
+        with self._lock:
+            return self._file is not None or self._sealed > 0
+
+    def remove(self, path):
+        os.remove(path)
+        with self._lock:
+            self._sealed = max(self._sealed - 1, 0)
+
+    def close(self):
+        self.seal()
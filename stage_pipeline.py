@@ -0,0 +1,154 @@
+import asyncio
+import collections
+import time
+import instrumentation
+
+# Rolling latency samples and counters for one stage, also exported as the
+# stage's pipeline_* metrics (see instrumentation.py)
+class StageStats:
+    def __init__(self, name, samples=2048):
+        self.name = name
+        self.processed = 0
+        self.errors = 0
+        self.dropped = 0
+        self.service = collections.deque(maxlen=samples)
+        self.wait = collections.deque(maxlen=samples)
+        self._service_seconds = instrumentation.STAGE_SECONDS.labels(name)
+        self._wait_seconds = instrumentation.STAGE_WAIT_SECONDS.labels(name)
+        self._processed = instrumentation.MESSAGES.labels(name)
+        self._errors = instrumentation.ERRORS.labels(name)
+        self._dropped = instrumentation.DROPPED.labels(name)
+
+    def observe(self, wait, service):
+        self.processed += 1
+        self.wait.append(wait)
+        self.service.append(service)
+        self._service_seconds.observe(service)
+        self._wait_seconds.observe(wait)
+        self._processed.inc()
+
+    def error(self):
+        self.errors += 1
+        self._errors.inc()
+
+    def drop(self):
+        self.dropped += 1
+        self._dropped.inc()
+
+    @staticmethod
+    def percentile(samples, p):
+        if not samples:
+            return 0.0
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(p / 100.0 * len(ordered)))]
+
+    def summary(self, depth):
+        ms = 1000.0
+        return (f"{self.name:<8} done={self.processed} err={self.errors} drop={self.dropped} depth={depth} "
+                f"service p50={self.percentile(self.service, 50) * ms:.2f}ms "
+                f"p99={self.percentile(self.service, 99) * ms:.2f}ms "
+                f"wait p50={self.percentile(self.wait, 50) * ms:.2f}ms")
+
+# One pipeline stage: a bounded queue drained by `concurrency` workers that
+# await handler(item). A non-None result is passed to every downstream
+# stage. Lossy stages drop new items when their queue is full instead of
+# applying backpressure upstream.
+class Stage:
+    def __init__(self, name, handler, concurrency=1, queue_size=1000, lossy=False):
+        self.name = name
+        self.handler = handler
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.lossy = lossy
+        self.downstream = []
+        self.stats = StageStats(name)
+        self.queue = None
+        self._workers = []
+        instrumentation.QUEUE_DEPTH.labels(name).set_function(lambda: self.depth)
+
+    def then(self, stage):
+        self.downstream.append(stage)
+        return stage
+
+    @property
+    def depth(self):
+        return self.queue.qsize() if self.queue else 0
+
+    async def put(self, item):
+        entry = (item, time.monotonic())
+        if self.lossy:
+            try:
+                self.queue.put_nowait(entry)
+            except asyncio.QueueFull:
+                self.stats.drop()
+        else:
+            await self.queue.put(entry)
+
+    def start(self):
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+    async def _work(self):
+        while True:
+            item, enqueued = await self.queue.get()
+            started = time.monotonic()
+            try:
+                result = await self.handler(item)
+            except Exception as e:
+                self.stats.error()
+                print(f"Error in {self.name} stage: {e}")
+            else:
+                self.stats.observe(started - enqueued, time.monotonic() - started)
+                if result is not None:
+                    for stage in self.downstream:
+                        await stage.put(result)
+            finally:
+                self.queue.task_done()
+
+# Fans every item from a source out to the root stages and periodically
+# prints per-stage throughput, queue depth and latency percentiles
+class Pipeline:
+    def __init__(self, roots, report_interval=10.0):
+        self.roots = roots
+        self.report_interval = report_interval
+
+    def stages(self):
+        seen = []
+        pending = list(self.roots)
+        while pending:
+            stage = pending.pop(0)
+            if stage not in seen:
+                seen.append(stage)
+                pending.extend(stage.downstream)
+        return seen
+
+    def report(self):
+        for stage in self.stages():
+            print(f"[Pipeline] {stage.stats.summary(stage.depth)}")
+
+    async def _reporter(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            self.report()
+
+    async def run(self, source):
+        stages = self.stages()
+        for stage in stages:
+            stage.start()
+        reporter = asyncio.create_task(self._reporter())
+        try:
+            async for item in source:
+                for stage in self.roots:
+                    await stage.put(item)
+            for stage in stages:
+                await stage.queue.join()
+        finally:
+            reporter.cancel()
+            for stage in stages:
+                await stage.stop()
+            self.report()
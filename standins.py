@@ -0,0 +1,153 @@
+import sqlite3
+from datetime import datetime
+import mongomock
+
+# Local stand-ins for the databases, used by bench.py.
+# MongoDB: mongomock (in-memory) behind a thin async facade with the parts
+# of the motor API the services use, so the same data can be shared by the
+# sync (web_dash.py) and async (web_api.py, web_pub.py) code paths.
+# MySQL: SQLite behind the parts of the mysql.connector API AlertWriter uses.
+
+class AsyncMockCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def skip(self, n):
+        self._cursor = self._cursor.skip(n)
+        return self
+
+    def limit(self, n):
+        self._cursor = self._cursor.limit(n)
+        return self
+
+    def batch_size(self, n):
+        return self
+
+    async def to_list(self, length=None):
+        docs = list(self._cursor)
+        return docs[:length] if length else docs
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._cursor:
+            yield doc
+
+class AsyncMockCollection:
+    def __init__(self, collection, database):
+        self._collection = collection
+        self.database = database
+        self.name = collection.name
+
+    def find(self, *args, **kwargs):
+        return AsyncMockCursor(self._collection.find(*args, **kwargs))
+
+    async def insert_many(self, documents, ordered=True):
+        return self._collection.insert_many(documents, ordered=ordered)
+
+    async def insert_one(self, document):
+        return self._collection.insert_one(document)
+
+    async def create_index(self, keys, **kwargs):
+        return self._collection.create_index(keys, **kwargs)
+
+    async def index_information(self):
+        return self._collection.index_information()
+
+    async def drop_index(self, name):
+        return self._collection.drop_index(name)
+
+    async def distinct(self, key, query=None):
+        return self._collection.distinct(key, query)
+
+    async def count_documents(self, query):
+        return self._collection.count_documents(query)
+
+    # mongomock's bulk_write does not accept current pymongo request
+    # objects, so apply update requests one by one
+    async def bulk_write(self, requests, ordered=True):
+        for request in requests:
+            self._collection.update_one(request._filter, request._doc, upsert=request._upsert)
+
+class AsyncMockDatabase:
+    def __init__(self, database):
+        self._database = database
+        self.name = database.name
+
+    def __getitem__(self, name):
+        return AsyncMockCollection(self._database[name], self)
+
+class AsyncMockClient:
+    def __init__(self, client=None):
+        self.sync_client = client or mongomock.MongoClient()
+
+    def __getitem__(self, name):
+        return AsyncMockDatabase(self.sync_client[name])
+
+    def close(self):
+        pass
+
+# Placeholder-compatible SQLite cursor (mysql.connector uses %s)
+class SqliteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    @staticmethod
+    def _convert(query, params):
+        params = tuple(v.isoformat(sep=" ") if isinstance(v, datetime) else v for v in params or ())
+        return query.replace("%s", "?"), params
+
+    def execute(self, query, params=None):
+        self._cursor.execute(*self._convert(query, params))
+
+    def executemany(self, query, rows):
+        rows = list(rows)
+        if rows:
+            query, _ = self._convert(query, rows[0])
+            self._cursor.executemany(query, [self._convert("", row)[1] for row in rows])
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+class SqliteConnection:
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS machine_alerts (
+                machine_id TEXT, timestamp TEXT, temperature REAL, vibration REAL, rpm INTEGER
+            )
+        """)
+        self._conn.commit()
+
+    def cursor(self):
+        return SqliteCursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+def connect_sqlite(path):
+    return SqliteConnection(path)
+
+def count_alerts(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM machine_alerts").fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0
+    finally:
+        conn.close()
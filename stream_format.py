@@ -0,0 +1,88 @@
+import io
+import json
+from datetime import datetime
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow output is optional
+    pa = None
+
+# Streamed response bodies for reading queries. Each encoder consumes an
+# async iterator of documents (e.g. a motor cursor) and yields byte chunks
+# of up to batch_size documents, so memory stays bounded by one batch.
+MEDIA_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def _dumps(doc):
+    return json.dumps(doc, default=_json_default, separators=(",", ":"))
+
+async def _batches(docs, batch_size):
+    batch = []
+    async for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# One JSON document per line
+async def ndjson_stream(docs, batch_size=1000):
+    async for batch in _batches(docs, batch_size):
+        yield "".join(_dumps(doc) + "\n" for doc in batch).encode("utf-8")
+
+# A single JSON array, written element by element
+async def json_array_stream(docs, batch_size=1000):
+    yield b"["
+    first = True
+    async for batch in _batches(docs, batch_size):
+        chunk = ",".join(_dumps(doc) for doc in batch)
+        yield (chunk if first else "," + chunk).encode("utf-8")
+        first = False
+    yield b"]"
+
+def arrow_schema():
+    return pa.schema([
+        ("machine_id", pa.string()),
+        ("timestamp", pa.timestamp("ms")),
+        ("temperature", pa.float64()),
+        ("vibration", pa.float64()),
+        ("rpm", pa.int64()),
+    ])
+
+# Arrow IPC stream: the schema, then one record batch per document batch.
+# The writer's sink is drained after every batch.
+async def arrow_stream(docs, batch_size=10000):
+    schema = arrow_schema()
+    sink = io.BytesIO()
+    writer = pa.ipc.new_stream(sink, schema)
+
+    def drain():
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    yield drain()
+    async for batch in _batches(docs, batch_size):
+        columns = {name: [doc.get(name) for doc in batch] for name in schema.names}
+        writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=schema))
+        yield drain()
+    writer.close()
+    yield drain()
+
+STREAMS = {"json": json_array_stream, "ndjson": ndjson_stream, "arrow": arrow_stream}
+
+# Body chunks for docs in the given format
+def stream(docs, fmt="json"):
+    if fmt == "arrow" and pa is None:
+        raise ValueError("Arrow output requires pyarrow")
+    return STREAMS[fmt](docs)
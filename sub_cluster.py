@@ -0,0 +1,149 @@
+import argparse
+import multiprocessing as mp
+import os
+import queue
+import time
+import instrumentation
+import web_sub
+
+# Supervisor for a pool of web_sub workers.
+# Every worker is a separate process with its own paho client and MySQL
+# connection, joined to the shared subscription $share/<group>/trail_me so
+# the broker spreads readings across workers. Dead workers are restarted and
+# per-worker throughput is printed every report_interval seconds.
+# Worker i serves /metrics on metrics_port + i.
+
+# Entry point of a worker process
+def worker_main(index, group, stats_queue, stop_event, host, port, metrics_port=None):
+    def report(received, alerts):
+        stats_queue.put((index, os.getpid(), received, alerts, time.monotonic()))
+
+    try:
+        web_sub.run_subscriber(
+            group=group,
+            spill_dir=os.path.join("spill", f"worker-{index}"),
+            stop_event=stop_event,
+            report=report,
+            host=host,
+            port=port,
+            metrics_port=metrics_port + index if metrics_port else None
+        )
+    except KeyboardInterrupt:
+        pass
+
+class Supervisor:
+    def __init__(self, workers, group="alerts", report_interval=5.0, host=None, port=None,
+                 restart_delay=1.0, metrics_port=None):
+        self.workers = workers
+        self.group = group
+        self.report_interval = report_interval
+        self.host = host
+        self.port = port
+        self.restart_delay = restart_delay
+        self.metrics_port = metrics_port
+        self.stats_queue = mp.Queue()
+        self.stop_event = mp.Event()
+        self.processes = {}
+        # index -> when check_workers first saw the worker dead
+        self.died_at = {}
+        self.restarts = {i: 0 for i in range(workers)}
+        # index -> (pid, received, alerts, time) from the latest report
+        self.latest = {}
+        self._reported = {}
+
+    def _spawn(self, index):
+        proc = mp.Process(
+            target=worker_main,
+            args=(index, self.group, self.stats_queue, self.stop_event, self.host, self.port, self.metrics_port),
+            name=f"sub-worker-{index}",
+            daemon=True
+        )
+        proc.start()
+        self.processes[index] = proc
+        self.died_at.pop(index, None)
+        self.latest.pop(index, None)
+        self._reported.pop(index, None)
+
+    def start(self):
+        for index in range(self.workers):
+            self._spawn(index)
+        print(f"Started {self.workers} subscriber workers in shared group '{self.group}'.")
+
+    # Restart any worker process that has exited, restart_delay after it was
+    # seen dead, so a worker that fails on startup does not spin
+    def check_workers(self):
+        now = time.monotonic()
+        for index, proc in list(self.processes.items()):
+            if self.stop_event.is_set() or proc.is_alive():
+                continue
+            died_at = self.died_at.setdefault(index, now)
+            if now - died_at >= self.restart_delay:
+                self.restarts[index] += 1
+                print(f"Worker {index} (pid {proc.pid}) exited with code {proc.exitcode}, restarting.")
+                self._spawn(index)
+
+    def drain_stats(self):
+        while True:
+            try:
+                index, pid, received, alerts, at = self.stats_queue.get_nowait()
+            except queue.Empty:
+                return
+            if index in self.processes and self.processes[index].pid == pid:
+                self.latest[index] = (pid, received, alerts, at)
+
+    # Per-worker readings/s and alerts/s since the previous report
+    def throughput(self):
+        rates = {}
+        for index, (pid, received, alerts, at) in self.latest.items():
+            prev = self._reported.get(index)
+            if prev and at > prev[3]:
+                elapsed = at - prev[3]
+                rates[index] = ((received - prev[1]) / elapsed, (alerts - prev[2]) / elapsed)
+            self._reported[index] = (pid, received, alerts, at)
+        return rates
+
+    def report(self):
+        rates = self.throughput()
+        total = sum(r[0] for r in rates.values())
+        parts = [f"w{i}: {r[0]:.0f} msg/s, {r[1]:.0f} alerts/s" for i, r in sorted(rates.items())]
+        print(f"[Supervisor] total {total:.0f} msg/s | " + " | ".join(parts))
+
+    def run(self):
+        self.start()
+        next_report = time.monotonic() + self.report_interval
+        try:
+            while True:
+                time.sleep(0.5)
+                self.drain_stats()
+                self.check_workers()
+                if time.monotonic() >= next_report:
+                    self.report()
+                    next_report += self.report_interval
+        except KeyboardInterrupt:
+            print("\nStopping workers...")
+        finally:
+            self.stop()
+
+    def stop(self, timeout=15):
+        self.stop_event.set()
+        for proc in self.processes.values():
+            proc.join(timeout)
+            if proc.is_alive():
+                proc.terminate()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run web_sub workers on an MQTT shared subscription")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--group", default="alerts")
+    parser.add_argument("--broker", default=None, help="MQTT broker host (default: web_sub.broker)")
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--report-interval", type=float, default=5.0)
+    parser.add_argument("--metrics-port", type=int, default=instrumentation.port_from_env(web_sub.METRICS_PORT),
+                        help="first worker's /metrics port, one port per worker (0 disables)")
+    args = parser.parse_args()
+
+    Supervisor(args.workers, args.group, args.report_interval, args.broker, args.port,
+               metrics_port=args.metrics_port).run()
+
+if __name__ == "__main__":
+    main()
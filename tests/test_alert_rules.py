@@ -0,0 +1,45 @@
+import json
+import numpy as np
+from alert_rules import RuleEngine, load_rules
+
+def reading(machine_id="M101", temperature=70.0, vibration=1.0, rpm=1500):
+    return {"machine_id": machine_id, "temperature": temperature, "vibration": vibration, "rpm": rpm}
+
+def test_shipped_defaults_match_the_original_thresholds():
+    rules = load_rules()
+    # temperature > 80 or vibration > 3.0, as the subscriber always checked
+    assert not rules.is_alert(reading(temperature=80.0, vibration=3.0))
+    assert rules.is_alert(reading(temperature=80.01))
+    assert rules.is_alert(reading(vibration=3.01))
+    assert not rules.is_alert(reading(temperature=-40.0, vibration=0.0, rpm=0))
+
+def test_min_and_max_bounds_are_exclusive():
+    rules = RuleEngine({"rpm": {"min": 100, "max": 2000}})
+    mask = rules.evaluate(["M1"] * 5, {"rpm": [99, 100, 1000, 2000, 2001]})
+    assert mask.tolist() == [True, False, False, False, True]
+
+def test_machine_overrides_inherit_the_default_bounds():
+    rules = RuleEngine({"temperature": {"min": 10, "max": 80}},
+                       {"M105": {"temperature": {"max": 90}}})
+    machine_ids = np.array(["M101", "M105", "M105", "M101"], dtype=object)
+    mask = rules.evaluate(machine_ids, {"temperature": [85.0, 85.0, 5.0, 75.0]})
+    assert mask.tolist() == [True, False, True, False]
+
+def test_columns_and_records_agree():
+    rules = load_rules()
+    records = [reading(temperature=t, vibration=v) for t, v in [(70, 1), (81, 1), (70, 4), (90, 5)]]
+    columns = {metric: [r[metric] for r in records] for metric in ("temperature", "vibration", "rpm")}
+    assert (rules.evaluate_records(records) == rules.evaluate([r["machine_id"] for r in records], columns)).all()
+
+def test_missing_metrics_never_alert():
+    rules = load_rules()
+    assert not rules.is_alert({"machine_id": "M101", "temperature": None})
+    assert rules.evaluate(["M1"], {}).tolist() == [False]
+
+def test_rules_load_from_a_config_file(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"default": {"vibration": {"max": 1.5}},
+                                "machines": {"M7": {"vibration": {"max": 2.5}}}}))
+    rules = load_rules(str(path))
+    assert rules.is_alert(reading(vibration=2.0))
+    assert not rules.is_alert(reading("M7", vibration=2.0))
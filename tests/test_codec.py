@@ -0,0 +1,67 @@
+import json
+from datetime import datetime
+import numpy as np
+import pytest
+import codec
+
+READINGS = [
+    {"machine_id": "M101", "timestamp": datetime(2026, 3, 1, 8, 30, 15, 250000).isoformat(),
+     "temperature": 71.5, "vibration": 0.42, "rpm": 1520},
+    {"machine_id": "M102", "timestamp": datetime(2026, 3, 1, 8, 30, 16).isoformat(),
+     "temperature": 88.0, "vibration": 1.5, "rpm": 0},
+]
+
+def test_packed_round_trip():
+    payload = codec.encode(READINGS, "packed")
+    topic = codec.topic_for("trail_me", "packed")
+    assert topic == "trail_me/packed"
+    assert codec.decode(topic, payload) == READINGS
+
+def test_packed_payload_is_recognised_on_the_json_topic():
+    payload = codec.encode(READINGS, "packed")
+    assert codec.decode("trail_me", payload) == READINGS
+
+def test_json_round_trip_keeps_single_object_payloads():
+    payload = codec.encode(READINGS[:1], "json")
+    assert json.loads(payload) == READINGS[0]
+    assert codec.decode("trail_me", payload) == READINGS[:1]
+    assert codec.decode("trail_me", codec.encode(READINGS, "json")) == READINGS
+
+def test_decode_columns_matches_across_formats():
+    packed_ids, packed = codec.decode_columns("trail_me/packed", codec.encode(READINGS, "packed"))
+    json_ids, plain = codec.decode_columns("trail_me", codec.encode(READINGS, "json"))
+    assert list(packed_ids) == list(json_ids)
+    np.testing.assert_allclose(packed["timestamp"], codec.epoch_seconds(plain["timestamp"]))
+    for metric in codec.METRICS:
+        np.testing.assert_allclose(packed[metric], plain[metric])
+
+def test_machine_ids_that_do_not_fit_are_rejected_not_truncated():
+    reading = dict(READINGS[0], machine_id="M" * (codec.MACHINE_ID_BYTES + 1))
+    with pytest.raises(ValueError):
+        codec.encode([reading], "packed")
+    exact = dict(READINGS[0], machine_id="M" * codec.MACHINE_ID_BYTES)
+    assert codec.decode("trail_me/packed", codec.encode([exact], "packed")) == [exact]
+
+def test_unpack_rejects_other_payloads():
+    with pytest.raises(ValueError):
+        codec.unpack(b"XX" + bytes(20))
+
+def test_local_epoch_matches_datetime_timestamp():
+    values = [datetime(2026, 1, 15, 3, 0), datetime(2026, 7, 15, 23, 59, 59, 500000)]
+    expected = [v.timestamp() for v in values]
+    np.testing.assert_allclose(codec.local_epoch(np.array(values, dtype="datetime64[ms]")), expected)
+
+def test_epoch_seconds_leaves_unparseable_timestamps_out():
+    good = datetime(2026, 3, 1, 8, 30)
+    seconds = codec.epoch_seconds([good.isoformat(), "not a time", None])
+    assert seconds[0] == good.timestamp()
+    assert np.isnan(seconds[1:]).all()
+
+@pytest.mark.parametrize("rpm", [-5, codec.RPM_MAX + 1, 2 ** 40])
+def test_rpm_outside_the_packed_field_is_rejected(rpm):
+    with pytest.raises(ValueError):
+        codec.encode([dict(READINGS[0], rpm=rpm)], "packed")
+
+def test_rpm_at_the_field_limits_round_trips():
+    readings = [dict(READINGS[0], rpm=0), dict(READINGS[1], rpm=codec.RPM_MAX)]
+    assert codec.decode("trail_me/packed", codec.encode(readings, "packed")) == readings
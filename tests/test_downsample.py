@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+from downsample import downsample, lttb_indices, minmax_indices
+
+def signal(n=10000, seed=7):
+    rng = np.random.default_rng(seed)
+    y = np.sin(np.linspace(0, 20, n)) + rng.normal(0, 0.05, n)
+    y[1234] = 25.0   # spike
+    y[8765] = -25.0  # dip
+    return np.arange(n, dtype=float), y
+
+def test_lttb_keeps_endpoints_order_and_spikes():
+    x, y = signal()
+    indices = lttb_indices(x, y, 500)
+    assert len(indices) == 500
+    assert indices[0] == 0 and indices[-1] == len(x) - 1
+    assert (np.diff(indices) > 0).all()
+    assert 1234 in indices and 8765 in indices
+
+def test_minmax_keeps_every_bucket_extreme():
+    x, y = signal()
+    indices = minmax_indices(y, 100)
+    assert indices[0] == 0 and indices[-1] == len(y) - 1
+    assert (np.diff(indices) > 0).all()
+    assert len(indices) <= 2 * 100 + 2
+    for bucket in np.array_split(np.arange(len(y)), 100):
+        assert bucket[np.argmax(y[bucket])] in indices
+        assert bucket[np.argmin(y[bucket])] in indices
+
+def test_small_inputs_are_returned_whole():
+    x, y = np.arange(50.0), np.sin(np.arange(50.0))
+    assert lttb_indices(x, y, 50).tolist() == list(range(50))
+    assert lttb_indices(x, y, 2).tolist() == list(range(50))
+    assert minmax_indices(y, 25).tolist() == list(range(50))
+
+def test_downsample_frame_with_datetime_x():
+    x, y = signal()
+    df = pd.DataFrame({"timestamp": pd.date_range("2026-03-01", periods=len(x), freq="s"), "temperature": y})
+    df.loc[5, "temperature"] = np.nan
+    for method in ("lttb", "minmax"):
+        out = downsample(df, "timestamp", "temperature", 400, method)
+        assert len(out) <= 402
+        assert out["timestamp"].is_monotonic_increasing
+        assert out["temperature"].max() == 25.0 and out["temperature"].min() == -25.0
+        assert out["temperature"].notna().all()
+        assert out["timestamp"].iloc[-1] == df["timestamp"].iloc[-1]
+    assert len(downsample(df.iloc[:100], "timestamp", "temperature", 400)) == 99
@@ -0,0 +1,124 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from starlette.requests import Request
+import latest_cache
+import metrics_store
+import web_api
+from latest_cache import LatestReadingsCache
+
+START = datetime(2026, 3, 1, 8, 0)
+
+def reading(seconds, machine_id="M101"):
+    return {"machine_id": machine_id, "timestamp": START + timedelta(seconds=seconds),
+            "temperature": 70.0 + seconds, "vibration": 0.1, "rpm": 1500}
+
+def request(**headers):
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "headers": raw})
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(1_800_000_000.25)
+    monkeypatch.setattr(latest_cache.time, "time", clock.time)
+    return clock
+
+@pytest.fixture
+def cache():
+    return LatestReadingsCache(metrics_store.METRICS_FIELDS, depth=5)
+
+def get(cache, limit=3, stored=()):
+    loads = []
+
+    async def load(machine_id, n):
+        loads.append(n)
+        return [doc for doc in stored if doc["machine_id"] == machine_id][-n:]
+
+    return asyncio.run(cache.get("M101", limit, load)), loads
+
+def test_update_merges_readings_and_changes_the_etag(cache, clock):
+    (readings, etag, _), loads = get(cache, stored=[reading(i) for i in range(4)])
+    assert [r["temperature"] for r in readings] == [71.0, 72.0, 73.0]
+    assert loads == [5]
+
+    (_, same_etag, _), loads = get(cache)
+    assert same_etag == etag and loads == []
+
+    cache.update([reading(10), reading(4.5), reading(0, "M102")])
+    (readings, new_etag, _), loads = get(cache)
+    assert [r["temperature"] for r in readings] == [73.0, 74.5, 80.0]
+    assert new_etag != etag and loads == []
+
+def test_etag_depends_on_limit(cache, clock):
+    (_, three, _), _ = get(cache, 3, [reading(i) for i in range(4)])
+    (_, two, _), _ = get(cache, 2)
+    assert three != two
+
+def test_entries_are_not_reloaded_before_the_ttl(cache, clock):
+    get(cache, stored=[reading(0)])
+    _, loads = get(cache, stored=[reading(0), reading(1)])
+    assert loads == []
+
+def test_if_none_match_answers_304_only_for_the_current_etag(cache, clock):
+    (_, etag, _), _ = get(cache, stored=[reading(0)])
+    assert web_api.not_modified(request(if_none_match=etag), etag, None)
+    assert web_api.not_modified(request(if_none_match=f'"other", {etag}'), etag, None)
+    assert web_api.not_modified(request(if_none_match="*"), etag, None)
+    assert not web_api.not_modified(request(if_none_match='"other"'), etag, None)
+
+def test_last_modified_waits_for_the_second_to_pass(cache, clock):
+    (_, _, last_modified), _ = get(cache, stored=[reading(0)])
+    assert last_modified is None
+
+    clock.now += 1
+    (_, etag, last_modified), _ = get(cache)
+    assert last_modified is not None
+    assert web_api.not_modified(request(if_modified_since=last_modified), None, last_modified)
+
+def test_change_in_the_same_second_is_not_answered_304(cache, clock):
+    get(cache, stored=[reading(0)])
+    clock.now += 1
+    (_, _, seen), _ = get(cache)
+
+    # Changed within the second the client's Last-Modified names
+    clock.now += 0.5
+    cache.update([reading(1)])
+    (_, _, last_modified), _ = get(cache)
+    assert not web_api.not_modified(request(if_modified_since=seen), None, last_modified)
+
+    clock.now += 1
+    (_, _, last_modified), _ = get(cache)
+    assert last_modified != seen
+    assert not web_api.not_modified(request(if_modified_since=seen), None, last_modified)
+
+def test_entries_are_reloaded_after_the_ttl(clock, monkeypatch):
+    cache = LatestReadingsCache(metrics_store.METRICS_FIELDS, depth=5, ttl=2.0)
+    now = [100.0]
+    monkeypatch.setattr(latest_cache.time, "monotonic", lambda: now[0])
+    get(cache, stored=[reading(0)])
+
+    # Written by another process, so update() never sees it
+    now[0] += 3
+    (readings, _, _), loads = get(cache, stored=[reading(0), reading(1)])
+    assert loads == [5]
+    assert [r["temperature"] for r in readings] == [70.0, 71.0]
+
+def test_readings_stored_during_a_load_are_kept(cache, clock):
+    async def load(machine_id, n):
+        # Flushed while the query runs: reading(1) is already in the result,
+        # reading(2) was stored after it
+        cache.update([reading(1), reading(2)])
+        return [reading(0), reading(1)]
+
+    readings, _, _ = asyncio.run(cache.get("M101", 5, load))
+    assert [r["temperature"] for r in readings] == [70.0, 71.0, 72.0]
+
+    (readings, _, _), loads = get(cache, limit=5)
+    assert loads == [] and len(readings) == 3
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+import mongomock
+import numpy as np
+import pandas as pd
+from metrics_cache import METRIC_FIELDS, MachineSeries, MetricsCache
+
+def columns(values):
+    return {field: np.asarray(values, dtype=float) for field in METRIC_FIELDS}
+
+def stamps(seconds):
+    return np.datetime64("2026-03-01T08:00:00", "ns") + np.asarray(seconds) * np.timedelta64(1, "s")
+
+def test_ring_buffer_keeps_the_newest_readings_in_order():
+    series = MachineSeries(4)
+    series.add(stamps([0, 1, 2]), columns([0, 1, 2]))
+    series.add(stamps([3, 4, 5]), columns([3, 4, 5]))
+    arrays = series.arrays()
+    assert arrays["temperature"].tolist() == [2, 3, 4, 5]
+    assert series.oldest() == stamps(2) and series.latest() == stamps(5)
+    assert series.arrays(since=stamps(3))["rpm"].tolist() == [4, 5]
+
+def test_batch_larger_than_the_buffer_keeps_its_tail():
+    series = MachineSeries(3)
+    series.add(stamps(range(10)), columns(range(10)))
+    assert series.arrays()["vibration"].tolist() == [7, 8, 9]
+
+def test_late_readings_are_merged_into_place():
+    series = MachineSeries(5)
+    series.add(stamps([0, 2, 4, 6]), columns([0, 2, 4, 6]))
+    series.add(stamps([1, 5]), columns([1, 5]))
+    assert series.arrays()["temperature"].tolist() == [1, 2, 4, 5, 6]
+
+def reading(seconds, machine_id="M101"):
+    return {"machine_id": machine_id, "timestamp": datetime.now().replace(microsecond=0) + timedelta(seconds=seconds),
+            "temperature": float(seconds), "vibration": 0.1, "rpm": 1500}
+
+def temperatures(cache, machine_id="M101"):
+    return cache.frame(machine_id)["temperature"].tolist()
+
+def test_refresh_adds_new_and_late_readings_once():
+    collection = mongomock.MongoClient().demo.machine_metrics
+    collection.insert_many([reading(-30), reading(-20), reading(-10, "M102")])
+    cache = MetricsCache(collection, min_interval=0)
+    cache.refresh()
+    assert temperatures(cache) == [-30, -20]
+
+    # A newer reading and one older than everything cached (e.g. a bulk upload)
+    collection.insert_many([reading(-5), reading(-25)])
+    cache.refresh()
+    cache.refresh()
+    assert temperatures(cache) == [-30, -25, -20, -5]
+    assert temperatures(cache, "M102") == [-10]
+    assert cache.oldest_timestamp("M101") == pd.Timestamp(reading(-30)["timestamp"])
+
+def test_first_refresh_only_loads_the_initial_window():
+    collection = mongomock.MongoClient().demo.machine_metrics
+    collection.insert_many([reading(-3600), reading(-60)])
+    cache = MetricsCache(collection, min_interval=0, initial_window=pd.Timedelta(minutes=10))
+    cache.refresh()
+    assert temperatures(cache) == [-60]
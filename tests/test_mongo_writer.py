@@ -0,0 +1,77 @@
+import asyncio
+from datetime import datetime, timedelta
+import mongomock
+from pymongo.errors import AutoReconnect
+import standins
+from mongo_writer import AsyncMongoBatchWriter
+
+START = datetime(2026, 3, 1, 8, 0)
+
+def documents(n, first=0):
+    return [{"machine_id": "M101", "timestamp": START + timedelta(seconds=i), "rpm": i}
+            for i in range(first, first + n)]
+
+# Stores the first `stored` documents of the next insert, then loses the connection
+class FlakyCollection(standins.AsyncMockCollection):
+    def __init__(self, collection, failures=1, stored=0):
+        super().__init__(collection, None)
+        self.failures = failures
+        self.stored = stored
+        self.calls = 0
+
+    async def insert_many(self, documents, ordered=True):
+        self.calls += 1
+        if self.failures:
+            self.failures -= 1
+            if self.stored:
+                await super().insert_many(documents[:self.stored], ordered)
+            raise AutoReconnect("connection reset")
+        return await super().insert_many(documents, ordered)
+
+def write(collection, docs, **options):
+    flushed = []
+
+    async def on_flush(batch):
+        flushed.extend(batch)
+
+    async def run():
+        writer = AsyncMongoBatchWriter(collection, max_latency=0.01, on_flush=on_flush,
+                                       retry_delay=0.001, **options).start()
+        await writer.submit_many(docs)
+        await writer.close()
+        return writer
+
+    return asyncio.run(run()), flushed
+
+def test_connection_failures_are_retried():
+    sync = mongomock.MongoClient().demo.machine_metrics
+    collection = FlakyCollection(sync, failures=2)
+    writer, flushed = write(collection, documents(10))
+    assert collection.calls == 3
+    assert sync.count_documents({}) == 10
+    assert (writer.inserted, writer.failed) == (10, 0)
+    assert [doc["rpm"] for doc in flushed] == list(range(10))
+
+def test_documents_stored_before_a_failure_are_not_lost_or_duplicated():
+    sync = mongomock.MongoClient().demo.machine_metrics
+    writer, flushed = write(FlakyCollection(sync, failures=1, stored=4), documents(10))
+    assert sync.count_documents({}) == 10
+    assert (writer.inserted, writer.failed) == (10, 0)
+    assert sorted(doc["rpm"] for doc in flushed) == list(range(10))
+
+def test_partial_failure_flushes_only_the_stored_documents():
+    sync = mongomock.MongoClient().demo.machine_metrics
+    docs = documents(5)
+    sync.insert_one({"_id": "taken"})
+    docs[2]["_id"] = "taken"
+    writer, flushed = write(FlakyCollection(sync, failures=0), docs)
+    assert (writer.inserted, writer.failed) == (4, 1)
+    assert [doc["rpm"] for doc in flushed] == [0, 1, 3, 4]
+
+def test_batch_is_dropped_after_the_last_retry():
+    sync = mongomock.MongoClient().demo.machine_metrics
+    collection = FlakyCollection(sync, failures=10)
+    writer, flushed = write(collection, documents(3), max_retries=2)
+    assert collection.calls == 3
+    assert (writer.inserted, writer.failed) == (0, 3)
+    assert flushed == []
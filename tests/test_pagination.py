@@ -0,0 +1,57 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+import metrics_store
+import standins
+
+START = datetime(2026, 3, 1, 8, 0)
+
+@pytest.fixture
+def collection():
+    collection = standins.AsyncMockClient()["demo"]["machine_metrics"]
+    # Pairs of readings share a timestamp, so pages must break ties on _id
+    asyncio.run(collection.insert_many([{"machine_id": "M101", "timestamp": START + timedelta(seconds=i // 2),
+                                         "temperature": float(i), "vibration": 0.1, "rpm": i} for i in range(25)]))
+    return collection
+
+# Follow X-Next-Cursor the way stream_readings serves pages
+def read_pages(collection, limit, between_queries=None):
+    async def read():
+        pages, after = [], None
+        while True:
+            upto = await metrics_store.page_end_async(collection, "M101", after=after, limit=limit)
+            if between_queries:
+                await between_queries()
+            pages.append([doc["rpm"] async for doc in metrics_store.find_page(collection, "M101", after=after, upto=upto)])
+            if upto is None:
+                return pages
+            after = metrics_store.decode_cursor(metrics_store.encode_cursor(upto))
+
+    return asyncio.run(read())
+
+def test_pages_cover_every_reading_once(collection):
+    pages = read_pages(collection, 10)
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert sum(pages, []) == list(range(25))
+
+def test_page_that_ends_the_window_has_no_cursor(collection):
+    assert asyncio.run(metrics_store.page_end_async(collection, "M101", limit=25)) is None
+    assert asyncio.run(metrics_store.page_end_async(collection, "M101", limit=24)) is not None
+
+def test_reading_inserted_between_queries_is_not_skipped(collection):
+    inserted = []
+
+    async def insert_early_reading():
+        if not inserted:
+            # Sorts inside the first page, pushing its last reading past the token
+            await collection.insert_one({"machine_id": "M101", "timestamp": START, "temperature": 0.0,
+                                   "vibration": 0.1, "rpm": 100})
+            inserted.append(True)
+
+    pages = read_pages(collection, 10, insert_early_reading)
+    assert sorted(sum(pages, [])) == list(range(25)) + [100]
+    assert len(pages[0]) == 11
+
+def test_malformed_cursor_is_rejected():
+    with pytest.raises(ValueError):
+        metrics_store.decode_cursor("not-a-cursor")
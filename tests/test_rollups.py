@@ -0,0 +1,62 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+import standins
+import rollups
+
+START = datetime(2026, 3, 1, 8, 0)
+
+def reading(minutes, machine_id="M101", temperature=None):
+    return {"machine_id": machine_id, "timestamp": START + timedelta(minutes=minutes),
+            "temperature": float(minutes) if temperature is None else temperature,
+            "vibration": 0.5, "rpm": 1000 + int(minutes)}
+
+READINGS = [reading(m) for m in (0, 10.5, 59.9, 61, 125)] + [reading(30, "M102", 99.0)]
+
+def apply(db, batches):
+    for batch in batches:
+        asyncio.run(rollups.apply_async(db, batch))
+
+def test_ingest_upserts_accumulate_across_batches():
+    db = standins.AsyncMockClient()["demo"]
+    # Out of order across batches, so "last" must follow the newest timestamp
+    apply(db, [READINGS[2:4], READINGS[:2], READINGS[4:]])
+    rows = {(row["machine_id"], row["timestamp"]): row for row in rollups.read_rollups(db._database, "M101")}
+    first = rows[("M101", START)]
+    assert first["count"] == 3
+    assert first["temperature"]["mean"] == pytest.approx((0 + 10.5 + 59.9) / 3)
+    assert (first["temperature"]["min"], first["temperature"]["max"]) == (0.0, 59.9)
+    assert first["temperature"]["last"] == 59.9
+    assert [row["count"] for row in rows.values()] == [3, 1, 1]
+
+    minutes = rollups.read_rollups(db._database, "M101", resolution="1m")
+    assert [row["timestamp"] for row in minutes][:2] == [START, START + timedelta(minutes=10)]
+
+@pytest.mark.parametrize("resolution", rollups.RESOLUTIONS)
+def test_backfill_rebuilds_the_documents_ingest_produces(resolution):
+    db = standins.AsyncMockClient()["demo"]
+    apply(db, [READINGS])
+    live = {tuple(doc["_id"].items()): doc for doc in rollups.collection_for(db._database, resolution).find()}
+
+    raw = db._database["machine_metrics"]
+    raw.insert_many([dict(doc) for doc in READINGS])
+    rebuilt = list(raw.aggregate(rollups.backfill_pipeline(resolution, until=START + timedelta(days=1))))
+
+    assert len(rebuilt) == len(live)
+    for doc in rebuilt:
+        # $merge matches on _id, so the key order must be the same as well
+        expected = live[tuple(doc["_id"].items())]
+        assert list(doc["_id"]) == list(expected["_id"])
+        assert doc["count"] == expected["count"]
+        assert doc["last_ts"] == expected["last_ts"]
+        for part in ("min", "max", "last"):
+            assert doc[part] == expected[part]
+        for metric, total in expected["sum"].items():
+            assert doc["sum"][metric] == pytest.approx(total)
+
+def test_backfill_leaves_open_buckets_to_ingest():
+    db = standins.AsyncMockClient()["demo"]
+    raw = db._database["machine_metrics"]
+    raw.insert_many([dict(doc) for doc in READINGS])
+    rebuilt = raw.aggregate(rollups.backfill_pipeline("1h", until=START + timedelta(minutes=90)))
+    assert sorted(doc["bucket"] for doc in rebuilt) == [START, START]
@@ -0,0 +1,79 @@
+import time
+from datetime import datetime
+import standins
+import alert_writer
+from alert_writer import AlertWriter
+from spill_buffer import SpillBuffer, read_rows
+
+def alert(i):
+    return {"machine_id": f"M{i}", "timestamp": datetime(2026, 1, 1, 12, 0, i % 60).isoformat(),
+            "temperature": 90.5, "vibration": 1.25, "rpm": 1500}
+
+def test_rows_round_trip_through_a_segment(tmp_path):
+    spill = SpillBuffer(str(tmp_path))
+    rows = [("M1\tx", datetime(2026, 1, 1, 12, 0), 1.5, None, 10), ("back\\slash\nnew", "t", 2.0, 0.5, 20)]
+    spill.append(rows)
+    spill.seal()
+    [path] = spill.segments()
+    assert list(read_rows(path)) == [
+        ("M1\tx", "2026-01-01 12:00:00", "1.5", None, "10"),
+        ("back\\slash\nnew", "t", "2.0", "0.5", "20"),
+    ]
+
+def test_pending_tracks_append_seal_and_remove(tmp_path):
+    spill = SpillBuffer(str(tmp_path))
+    assert not spill.pending()
+    spill.append([("M1", "t", 1.0, 1.0, 1)])
+    assert spill.pending()
+    spill.seal()
+    assert spill.pending()
+    for path in spill.segments():
+        spill.remove(path)
+    assert not spill.pending()
+
+def test_segments_left_by_a_previous_process_are_pending(tmp_path):
+    spill = SpillBuffer(str(tmp_path))
+    spill.append([("M1", "t", 1.0, 1.0, 1)])
+    spill._file.close()  # simulate a crash with the active segment open
+    assert SpillBuffer(str(tmp_path)).pending()
+
+def test_alerts_spilled_while_mysql_is_down_are_replayed_once(tmp_path):
+    db_path = str(tmp_path / "alerts.db")
+    available = {"up": False}
+
+    def connect():
+        if not available["up"]:
+            raise ConnectionError("MySQL is down")
+        return standins.connect_sqlite(db_path)
+
+    writer = AlertWriter(connect, max_latency=0.05, retry_interval=0.05,
+                         spill_dir=str(tmp_path / "spill")).start()
+    for i in range(20):
+        writer.submit(alert(i))
+    deadline = time.monotonic() + 5
+    while writer.spilled < 20 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert writer.spilled == 20
+
+    available["up"] = True
+    for i in range(20, 25):
+        writer.submit(alert(i))
+    writer.close()
+
+    assert standins.count_alerts(db_path) == 25
+    assert not writer.spill.pending()
+
+def test_failing_metrics_do_not_spill_committed_alerts(tmp_path, monkeypatch):
+    def broken(*args):
+        raise RuntimeError("metrics backend broke")
+    monkeypatch.setattr(alert_writer.STORED_LAG, "observe_many", broken)
+
+    db_path = str(tmp_path / "alerts.db")
+    writer = AlertWriter(lambda: standins.connect_sqlite(db_path), max_latency=0.05,
+                         spill_dir=str(tmp_path / "spill")).start()
+    for i in range(10):
+        writer.submit(alert(i))
+    writer.close()
+
+    assert standins.count_alerts(db_path) == 10
+    assert writer.spilled == 0
@@ -0,0 +1,59 @@
+import pytest
+import token_cache
+from token_cache import VerifiedTokenCache
+
+class Clock:
+    def __init__(self, now=1_800_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(token_cache.time, "time", clock.time)
+    return clock
+
+def test_entries_expire_with_their_token(clock):
+    cache = VerifiedTokenCache()
+    cache.put("token", "user", clock.now + 60)
+    assert cache.get("token") == "user"
+    clock.now += 60
+    assert cache.get("token") is None
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_expired_tokens_are_not_cached(clock):
+    cache = VerifiedTokenCache()
+    cache.put("token", "user", clock.now - 1)
+    assert cache.get("token") is None
+
+def test_tokens_without_exp_use_the_default_ttl(clock):
+    cache = VerifiedTokenCache(default_ttl=30)
+    cache.put("token", "user")
+    clock.now += 29
+    assert cache.get("token") == "user"
+    clock.now += 1
+    assert cache.get("token") is None
+
+def test_least_recently_used_token_is_evicted(clock):
+    cache = VerifiedTokenCache(maxsize=2)
+    cache.put("a", 1, clock.now + 60)
+    cache.put("b", 2, clock.now + 60)
+    cache.get("a")
+    cache.put("c", 3, clock.now + 60)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+def test_api_accepts_and_caches_a_token_without_exp(monkeypatch):
+    import asyncio
+    from jose import jwt
+    import web_api
+
+    # Demo passwords are only hashed when the app starts
+    monkeypatch.setitem(web_api.fake_users_db["testuser"], "hashed_password", "unused")
+    token = jwt.encode({"sub": "testuser"}, web_api.SECRET_KEY, algorithm=web_api.ALGORITHM)
+    user = asyncio.run(web_api.get_current_user(token))
+    assert user.username == "testuser"
+    assert web_api.token_cache.get(token) is user
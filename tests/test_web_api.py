@@ -0,0 +1,133 @@
+from datetime import datetime
+import io
+import json
+import pyarrow as pa
+import pytest
+import codec
+from fastapi.testclient import TestClient
+import standins
+import web_api
+
+class RecordingPublisher:
+    def __init__(self):
+        self.published = []
+
+    def publish_many(self, topic, payloads, qos=0, retain=False):
+        self.published.extend((topic, payload) for payload in payloads)
+
+class RecordingWriter:
+    def __init__(self):
+        self.documents = []
+
+    async def submit(self, document):
+        self.documents.append(document)
+
+    async def submit_many(self, documents):
+        self.documents.extend(documents)
+
+# The app without its lifespan: no broker, MongoDB or password hashing,
+# and every request authenticated as the demo user
+@pytest.fixture
+def api(monkeypatch):
+    publisher, writer = RecordingPublisher(), RecordingWriter()
+    mongo_db = standins.AsyncMockClient()["demo"]
+    monkeypatch.setattr(web_api, "mqtt_publisher", publisher)
+    monkeypatch.setattr(web_api, "metrics_writer", writer)
+    monkeypatch.setattr(web_api, "mongo_db", mongo_db)
+    monkeypatch.setattr(web_api, "mongo_collection", mongo_db["machine_metrics"])
+    monkeypatch.setitem(web_api.app.dependency_overrides, web_api.get_current_user,
+                        lambda: web_api.UserInDB(username="testuser", hashed_password=""))
+    client = TestClient(web_api.app)
+    client.publisher, client.writer, client.mongo_collection = publisher, writer, mongo_db["machine_metrics"]
+    return client
+
+def reading(**changes):
+    return {"machine_id": "M101", "timestamp": datetime(2026, 3, 1, 8, 30).isoformat(),
+            "temperature": 95.0, "vibration": 0.5, "rpm": 1500, **changes}
+
+def test_alerting_reading_is_published_and_stored(api):
+    response = api.post("/send_data/", json=reading())
+    assert response.status_code == 200
+    assert len(api.publisher.published) == 1
+    assert api.writer.documents[0]["timestamp"] == datetime(2026, 3, 1, 8, 30)
+
+@pytest.mark.parametrize("path, body", [("/send_data/", reading(timestamp="not a time")),
+                                        ("/send_data_batch/", [reading(), reading(timestamp="not a time")])])
+def test_unparseable_timestamp_is_rejected_before_publishing(api, path, body):
+    response = api.post(path, json=body)
+    assert response.status_code == 422
+    assert api.publisher.published == []
+    assert api.writer.documents == []
+
+def test_machines_lists_stored_machine_ids(api):
+    api.mongo_collection._collection.insert_many([
+        {"machine_id": "M102", "timestamp": datetime(2026, 3, 1, 8, 0)},
+        {"machine_id": "M101", "timestamp": datetime(2026, 3, 1, 9, 0)},
+    ])
+    assert api.get("/machines/").json() == ["M101", "M102"]
+    assert api.get("/machines/", params={"since": "2026-03-01T08:30:00"}).json() == ["M101"]
+
+# Bulk uploads: one alerting and one normal reading in each format
+BULK_ROWS = [reading(), reading(machine_id="M102", temperature=60.0, vibration=0.1)]
+CSV_HEADER = b"machine_id,timestamp,temperature,vibration,rpm"
+
+def csv_body(rows):
+    lines = [",".join(str(row[field]) for field in ("machine_id", "timestamp", "temperature", "vibration", "rpm"))
+             for row in rows]
+    return CSV_HEADER + b"\n" + "\n".join(lines).encode()
+
+def arrow_body(rows):
+    table = pa.Table.from_pylist([{**row, "timestamp": datetime.fromisoformat(row["timestamp"])} for row in rows])
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+def post_bulk(api, content_type, body):
+    return api.post("/ingest/bulk/", content=body, headers={"Content-Type": content_type})
+
+@pytest.mark.parametrize("content_type, body", [
+    ("text/csv", csv_body(BULK_ROWS)),
+    ("application/x-ndjson", "\n".join(json.dumps(row) for row in BULK_ROWS).encode()),
+    ("application/vnd.apache.arrow.stream", arrow_body(BULK_ROWS)),
+], ids=["csv", "ndjson", "arrow"])
+def test_bulk_upload_publishes_every_reading_and_stores_alerts(api, content_type, body):
+    response = post_bulk(api, content_type, body)
+    assert response.status_code == 200
+    assert response.json() == {"received": 2, "alerts": 1, "mqtt_messages": 1}
+    records = codec.unpack(api.publisher.published[0][1])
+    assert records["machine_id"].tolist() == [b"M101", b"M102"]
+    stored = list(api.mongo_collection._collection.find({}, {"_id": 0}))
+    assert stored == [{"machine_id": "M101", "timestamp": datetime(2026, 3, 1, 8, 30),
+                       "temperature": 95.0, "vibration": 0.5, "rpm": 1500}]
+
+@pytest.mark.parametrize("body", [CSV_HEADER, CSV_HEADER + b"\n"], ids=["no-newline", "newline"])
+def test_bulk_csv_with_only_a_header_is_empty(api, body):
+    response = post_bulk(api, "text/csv", body)
+    assert response.status_code == 200
+    assert response.json() == {"received": 0, "alerts": 0, "mqtt_messages": 0}
+    assert api.publisher.published == []
+
+@pytest.mark.parametrize("content_type, body", [
+    ("text/csv", b"machine_id,timestamp"),
+    ("text/csv", csv_body([reading(rpm=-5)])),
+    ("application/x-ndjson", json.dumps(reading(timestamp="not a time")).encode()),
+    ("application/vnd.apache.arrow.stream", b"not arrow"),
+], ids=["csv-missing-columns", "csv-negative-rpm", "ndjson-bad-timestamp", "arrow-garbage"])
+def test_bulk_upload_rejects_invalid_bodies(api, content_type, body):
+    response = post_bulk(api, content_type, body)
+    assert response.status_code == 422
+    assert api.publisher.published == []
+
+def test_bulk_upload_over_the_row_cap_is_rejected(api, monkeypatch):
+    monkeypatch.setattr(web_api, "BULK_MAX_ROWS", 1)
+    response = post_bulk(api, "text/csv", csv_body(BULK_ROWS))
+    assert response.status_code == 413
+    assert api.publisher.published == []
+
+def test_bulk_upload_over_the_byte_cap_is_rejected(api, monkeypatch):
+    body = arrow_body(BULK_ROWS)
+    monkeypatch.setattr(web_api, "BULK_MAX_BYTES", len(body) - 1)
+    response = post_bulk(api, "application/vnd.apache.arrow.stream", body)
+    assert response.status_code == 413
+    assert api.publisher.published == []
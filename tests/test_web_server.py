@@ -0,0 +1,37 @@
+import asyncio
+import json
+import time
+import web_server
+from ws_channel import encode_frame
+
+class FakePublisher:
+    def __init__(self, messages):
+        self.messages = messages
+        self.sent = []
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for message in self.messages:
+            yield message
+
+    async def send(self, message):
+        self.sent.append(message)
+
+def test_malformed_frames_are_skipped_without_closing_the_connection(monkeypatch):
+    readings = []
+    monkeypatch.setattr(web_server.hub, "publish_reading", lambda machine_id, text: readings.append((machine_id, text)))
+    errors = web_server.RELAY_ERRORS.value
+    reading = json.dumps({"machine_id": "M101", "temperature": 70.0})
+    messages = [
+        b"junk",
+        encode_frame("M101", time.time(), "application/json", b"\xff\xfe not utf-8"),
+        "image:not base64!",
+        encode_frame("M101", time.time(), "application/json", reading.encode("utf-8")),
+    ]
+
+    asyncio.run(web_server.publisher_handler(FakePublisher(messages)))
+
+    assert readings == [("M101", reading)]
+    assert web_server.RELAY_ERRORS.value - errors == 3
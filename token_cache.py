@@ -0,0 +1,49 @@
+import collections
+import threading
+import time
+
+# LRU of bearer tokens that already passed signature and user checks.
+# Each entry expires together with its token ("exp", epoch seconds), so a
+# cached token is never honoured for longer than jwt.decode would. Tokens
+# without an "exp" claim are kept for default_ttl seconds.
+class VerifiedTokenCache:
+    def __init__(self, maxsize=10000, default_ttl=300.0):
+        self.maxsize = maxsize
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return value
+
+    def put(self, token, value, expires_at=None):
+        if expires_at is None:
+            expires_at = time.time() + self.default_ttl
+        if expires_at <= time.time():
+            return
+        with self._lock:
+            self._entries[token] = (value, expires_at)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,17 +1,93 @@
-from fastapi import FastAPI, HTTPException, Depends, Security
+from fastapi import FastAPI, HTTPException, Depends, Security, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel
-from pymongo import MongoClient
-import paho.mqtt.publish as publish
-import json
-from typing import List, Optional
+from motor.motor_asyncio import AsyncIOMotorClient
+from typing import List, Literal, Optional
 from collections import defaultdict
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+import time
+import numpy as np
+from alert_rules import load_rules
+import codec
+import bulk_ingest
+from mongo_writer import AsyncMongoBatchWriter, record_insert
+from mqtt_pool import MqttPublisherPool
+import metrics_store
+import rollups
+import stream_format
+import instrumentation
+from token_cache import VerifiedTokenCache
+from latest_cache import LatestReadingsCache
 
 # --- FastAPI App and Config ---
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    global mongo_client, mongo_db, mongo_collection, metrics_writer, auth_executor
+    # Created per lifespan so the app can be started again after a shutdown
+    auth_executor = ThreadPoolExecutor(max_workers=AUTH_WORKERS, thread_name_prefix="bcrypt")
+    await hash_demo_passwords()
+
+    # The async driver binds to the running loop, so connect here, not at import
+    mongo_client = AsyncIOMotorClient(MONGO_URI, **MONGO_POOL_OPTIONS)
+    mongo_db = mongo_client["demo"]
+    mongo_collection = mongo_db["machine_metrics"]
+    await metrics_store.ensure_indexes_async(mongo_collection)
+    await rollups.ensure_indexes_async(mongo_db)
+
+    # Buffered bulk writer for machine_metrics inserts; every flushed batch is
+    # also merged into latest_cache and folded into the rollup collections
+    metrics_writer = AsyncMongoBatchWriter(mongo_collection, on_flush=on_metrics_flush).start()
+    await asyncio.to_thread(mqtt_publisher.start)
+    yield
+    await asyncio.to_thread(mqtt_publisher.close)
+    await metrics_writer.close()
+    mongo_client.close()
+    auth_executor.shutdown(wait=False)
+
+app = FastAPI(lifespan=lifespan)
+
+# --- Metrics (served at /metrics) ---
+HTTP_SECONDS = instrumentation.histogram("http_request_seconds", "Request latency by route", ["route"])
+HTTP_RESPONSES = instrumentation.counter("http_responses_total", "Responses by route and status", ["route", "status"])
+PUBLISH_SECONDS = instrumentation.STAGE_SECONDS.labels("mqtt_publish")
+PUBLISHED_MESSAGES = instrumentation.MESSAGES.labels("mqtt_publish")
+INGESTED_READINGS = instrumentation.READINGS.labels("api_ingest")
+
+# Plain ASGI middleware (no per-request Request object) timing every
+# response to its last byte, labelled with the matched route template
+class RequestMetrics:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_SECONDS.labels(route).observe(time.perf_counter() - started)
+            HTTP_RESPONSES.labels(route, status).inc()
+
+app.add_middleware(RequestMetrics)
 
 # --- OAuth2 & Security Setup ---
 SECRET_KEY = "key"
@@ -20,26 +96,130 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt is deliberately slow, so it runs on a few dedicated threads and a
+# login burst queues there instead of stalling the event loop
+# (auth_executor, created in lifespan)
+AUTH_WORKERS = int(os.environ.get("AUTH_WORKERS", "4"))
+auth_executor = None
+# Tokens that already passed verification, until they expire
+token_cache = VerifiedTokenCache(maxsize=int(os.environ.get("TOKEN_CACHE_SIZE", "10000")))
 
 # --- Fake User DB for demo (can be replaced with a real DB) ---
+# Passwords are hashed once at startup (see hash_demo_passwords)
+DEMO_PASSWORDS = {"testuser": os.environ.get("DEMO_PASSWORD", "password123")}
 fake_users_db = {
     "testuser": {
         "username": "testuser",
         "full_name": "Test User",
         "email": "test@example.com",
-        "hashed_password": pwd_context.hash("password123"),  # Hash the password once!
+        "hashed_password": None,
         "disabled": False
     }
 }
 
-# --- MongoDB setup ---
-mongo_client = MongoClient("mongodb://localhost:27017/")
-mongo_db = mongo_client["demo"]
-mongo_collection = mongo_db["machine_metrics"]
+# --- MongoDB setup (connected in lifespan) ---
+MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017/")
+# Enough pooled connections for many concurrent requests on one worker;
+# requests wait up to 5s for a free connection instead of failing at once
+MONGO_POOL_OPTIONS = {
+    "maxPoolSize": int(os.environ.get("MONGO_MAX_POOL_SIZE", "200")),
+    "minPoolSize": int(os.environ.get("MONGO_MIN_POOL_SIZE", "10")),
+    "maxIdleTimeMS": 60000,
+    "waitQueueTimeoutMS": 5000,
+    "serverSelectionTimeoutMS": 5000,
+}
+mongo_client = None
+mongo_db = None
+mongo_collection = None
+metrics_writer = None
+
+# Newest readings per machine for /metrics/latest/, kept current by
+# on_metrics_flush. web_pub.py writes the MQTT stream to the same collection
+# from its own process, so entries are also reloaded every LATEST_CACHE_TTL
+# seconds to keep those readings from going stale.
+LATEST_CACHE_DEPTH = 100
+LATEST_CACHE_TTL = float(os.environ.get("LATEST_CACHE_TTL", "2"))
+latest_cache = LatestReadingsCache(metrics_store.METRICS_FIELDS, depth=LATEST_CACHE_DEPTH, ttl=LATEST_CACHE_TTL)
+
+async def load_latest(machine_id, limit):
+    return await metrics_store.latest_async(mongo_collection, machine_id, limit)
+
+async def on_metrics_flush(batch):
+    latest_cache.update(batch)
+    await rollups.apply_async(mongo_db, batch)
 
 # MQTT Setup
-mqtt_broker = "test.mosquitto.org"
+mqtt_broker = os.environ.get("MQTT_BROKER", "test.mosquitto.org")
+mqtt_port = int(os.environ.get("MQTT_PORT", "1883"))
 data_topic = "trail_me"
+publish_topic = codec.topic_for(data_topic)
+# Bulk uploads are always published packed; web_sub.py subscribes to both topics
+packed_topic = codec.topic_for(data_topic, "packed")
+# Readings per MQTT message when publishing packed batches
+PACKED_BATCH_SIZE = 1000
+MQTT_QOS = int(os.environ.get("MQTT_QOS", "0"))
+# Persistent publisher connections, opened in lifespan and shared by all requests
+mqtt_publisher = MqttPublisherPool(mqtt_broker, mqtt_port, size=int(os.environ.get("MQTT_POOL_SIZE", "2")),
+                                   client_id_prefix="web-api")
+
+# Streamed query responses: documents per cursor batch / encoded chunk, and
+# the largest page a client may ask for
+STREAM_BATCH_SIZE = 1000
+MAX_PAGE_SIZE = 100000
+
+# Largest bulk upload accepted in one request
+BULK_MAX_ROWS = int(os.environ.get("BULK_MAX_ROWS", "1000000"))
+BULK_MAX_BYTES = int(os.environ.get("BULK_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Alert thresholds shared with web_sub.py (see alert_rules.json)
+rules = load_rules()
+
+# QoS 0 publishes only queue packets on the pooled connection; acknowledged
+# QoS waits for the broker, so it runs off the event loop
+async def publish_payloads(payloads, topic=publish_topic):
+    started = time.perf_counter()
+    if MQTT_QOS == 0:
+        mqtt_publisher.publish_many(topic, payloads)
+    else:
+        await asyncio.to_thread(mqtt_publisher.publish_many, topic, payloads, MQTT_QOS)
+    PUBLISH_SECONDS.observe(time.perf_counter() - started)
+    PUBLISHED_MESSAGES.inc(len(payloads))
+
+# Streamed response for a reading query. Documents are encoded straight
+# from the cursor in batches. With a limit the response is one keyset page
+# in (timestamp, _id) order, and X-Next-Cursor carries the token for the
+# next page (absent on the last one).
+async def stream_readings(machine_id, since, until, limit, cursor, fmt):
+    if fmt == "arrow" and stream_format.pa is None:
+        raise HTTPException(status_code=406, detail="Arrow output requires pyarrow")
+    try:
+        after = metrics_store.decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    headers = {}
+    upto = await metrics_store.page_end_async(mongo_collection, machine_id, since, until, after, limit)
+    if upto is not None:
+        headers["X-Next-Cursor"] = metrics_store.encode_cursor(upto)
+    # The page is bounded by key, not count: readings inserted between the
+    # two queries are returned on this page instead of being skipped
+    docs = metrics_store.find_page(mongo_collection, machine_id, since, until, after, upto=upto)
+    return StreamingResponse(stream_format.stream(docs.batch_size(STREAM_BATCH_SIZE), fmt),
+                             media_type=stream_format.MEDIA_TYPES[fmt], headers=headers)
+
+# Conditional GET check; If-None-Match wins over If-Modified-Since
+def not_modified(request, etag, last_modified):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        return bool(etag) and (if_none_match.strip() == "*" or
+                               etag in (tag.strip() for tag in if_none_match.split(",")))
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
 
 # --- Models ---
 class Token(BaseModel):
@@ -66,13 +246,22 @@ class MachineData(BaseModel):
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
+async def verify_password_async(plain_password, hashed_password):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(auth_executor, verify_password, plain_password, hashed_password)
+
+async def hash_demo_passwords():
+    loop = asyncio.get_running_loop()
+    for username, password in DEMO_PASSWORDS.items():
+        fake_users_db[username]["hashed_password"] = await loop.run_in_executor(auth_executor, pwd_context.hash, password)
+
 def get_user(db, username: str) -> Optional[UserInDB]:
     if username in db:
         return UserInDB(**db[username])
 
-def authenticate_user(username: str, password: str):
+async def authenticate_user(username: str, password: str):
     user = get_user(fake_users_db, username)
-    if not user or not verify_password(password, user.hashed_password):
+    if not user or not await verify_password_async(password, user.hashed_password):
         return None
     return user
 
@@ -82,109 +271,227 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+# Shared dependency of the secured routes: the user behind the bearer token.
+# Verified tokens are served from token_cache, so repeat callers skip
+# jwt.decode and the user lookup until the token expires.
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
+    user = token_cache.get(token)
+    if user is not None:
+        return user
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Invalid token", headers={"WWW-Authenticate": "Bearer"})
+    user = get_user(fake_users_db, payload.get("sub"))
+    if not user or user.disabled:
+        raise HTTPException(status_code=401, detail="Invalid authentication", headers={"WWW-Authenticate": "Bearer"})
+    token_cache.put(token, user, payload.get("exp"))
+    return user
+
 # --- Routes ---
 @app.post("/token", response_model=Token)
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = authenticate_user(form_data.username, form_data.password)
+    user = await authenticate_user(form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=401, detail="Incorrect username or password")
 
     access_token = create_access_token(data={"sub": user.username})
     return {"access_token": access_token, "token_type": "bearer"}
 
+# Liveness of the MQTT publisher pool and the MongoDB writer queue
+@app.get("/health")
+async def get_health():
+    return {
+        "status": "ok" if mqtt_publisher.healthy() else "degraded",
+        "mqtt": mqtt_publisher.health(),
+        "metrics_writer_queue": metrics_writer.depth,
+    }
+
+# Prometheus scrape endpoint, unauthenticated like /health
+@app.get("/metrics")
+async def get_metrics():
+    return Response(instrumentation.render(), media_type=instrumentation.CONTENT_TYPE)
+
 # Secured Endpoint
 @app.get("/protected")
-async def get_protected_data(token: str = Depends(oauth2_scheme)):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        user = get_user(fake_users_db, username)
-        if not user or user.disabled:
-            raise HTTPException(status_code=401, detail="Invalid authentication")
-        return {"message": f"Welcome {user.username}! your are Protected"}
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+async def get_protected_data(user: UserInDB = Depends(get_current_user)):
+    return {"message": f"Welcome {user.username}! your are Protected"}
 
 # --- POST Endpoint to Send Data (Secured) ---
 @app.post("/send_data/")
-def send_data(data: MachineData, token: str = Depends(oauth2_scheme)):
+async def send_data(data: MachineData, user: UserInDB = Depends(get_current_user)):
     try:
-        # Decode the token to get the user information
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        user = get_user(fake_users_db, username)
-
         # Publish to MQTT
-        json_data = json.dumps(data.dict())
-        publish.single(topic=data_topic, payload=json_data, hostname=mqtt_broker)
-
-        # Store in MongoDB if temperature is out of safe range
-        if data.temperature > 90 or data.temperature < 70:
-            mongo_collection.insert_one(data.dict())
+        record = data.dict()
+        # Validate before publishing: an unparseable timestamp, or a reading
+        # that does not fit the packed format, is rejected with nothing sent
+        try:
+            document = metrics_store.to_document(record)
+            payload = codec.encode([record])
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        await publish_payloads([payload])
+        INGESTED_READINGS.inc()
+
+        # Store in MongoDB if the reading breaks an alert rule
+        if rules.is_alert(record):
+            await metrics_writer.submit(document)
 
         return {"message": "Data sent to MQTT broker and stored if alert triggered."}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/send_data_batch/")
-def send_data_batch(data_list: List[MachineData], token: str = Depends(oauth2_scheme)):
+async def send_data_batch(data_list: List[MachineData], user: UserInDB = Depends(get_current_user)):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        user = get_user(fake_users_db, username)
-
-        for data in data_list:
-            json_data = json.dumps(data.dict())
-            publish.single(topic=data_topic, payload=json_data, hostname=mqtt_broker)
-
-            if data.temperature > 90 or data.temperature < 70:
-                mongo_collection.insert_one(data.dict())
+        records = [data.dict() for data in data_list]
+        # Validated up front like /send_data/, so a bad reading rejects the batch before anything is sent
+        try:
+            documents = [metrics_store.to_document(record) for record in records]
+            if codec.WIRE_FORMAT == "packed":
+                payloads = [codec.encode(records[i:i + PACKED_BATCH_SIZE])
+                            for i in range(0, len(records), PACKED_BATCH_SIZE)]
+            else:
+                payloads = [codec.encode([record]) for record in records]
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        # One pipelined flush on a pooled connection instead of a connection per reading
+        await publish_payloads(payloads)
+        INGESTED_READINGS.inc(len(records))
+
+        # Evaluate the whole batch in one pass and store the alerts together
+        if records:
+            alert_mask = rules.evaluate_records(records)
+            alerts = [document for document, alert in zip(documents, alert_mask) if alert]
+            if alerts:
+                await metrics_writer.submit_many(alerts)
 
         return {"message": "All data sent and alerts stored if needed."}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
 
 
-# GET for individual data of machine and all data (Secured)
-@app.get("/alerts/", response_model=List[dict])
-def get_alerts(machine_id: Optional[str] = None, token: str = Depends(oauth2_scheme)):
+# Bulk upload of readings (Secured). The body is NDJSON, CSV with a header
+# row, or an Arrow IPC stream, chosen by Content-Type. It is parsed and
+# validated column-wise, checked against the alert rules in one pass,
+# published as packed MQTT batches, and its alerts are stored with a single
+# bulk insert. A body that fails validation is rejected as a whole.
+@app.post("/ingest/bulk/")
+async def ingest_bulk(request: Request, user: UserInDB = Depends(get_current_user)):
+    if bulk_ingest.pa is None:
+        raise HTTPException(status_code=501, detail="Bulk ingest requires pyarrow")
+    fmt = bulk_ingest.body_format(request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(status_code=415, detail=f"Content-Type must be one of {', '.join(bulk_ingest.FORMATS)}")
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        user = get_user(fake_users_db, username)
+        table = await bulk_ingest.read_table(request.stream(), fmt, max_rows=BULK_MAX_ROWS, max_bytes=BULK_MAX_BYTES)
+    except (bulk_ingest.TooManyRows, bulk_ingest.BodyTooLarge) as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    try:
+        received, payloads, alerts = await asyncio.to_thread(prepare_bulk, table)
+        if payloads:
+            await publish_payloads(payloads, packed_topic)
+        INGESTED_READINGS.inc(received)
+
+        if alerts:
+            started = time.perf_counter()
+            await mongo_collection.insert_many(alerts, ordered=False)
+            record_insert(alerts, started)
+            # The alerts are stored; a failing cache/rollup update must not fail the request
+            try:
+                await on_metrics_flush(alerts)
+            except Exception as e:
+                print(f"Error updating caches after bulk insert: {e}")
+
+        return {"received": received, "alerts": len(alerts), "mqtt_messages": len(payloads)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# CPU-bound part of a bulk upload, run off the event loop: the packed MQTT
+# payloads and the alert documents for a validated table
+def prepare_bulk(table):
+    machine_ids, columns = bulk_ingest.to_columns(table)
+    records = bulk_ingest.to_records(machine_ids, columns)
+    payloads = [codec.pack_records(records[i:i + PACKED_BATCH_SIZE])
+                for i in range(0, len(records), PACKED_BATCH_SIZE)]
+    alert_rows = np.flatnonzero(rules.evaluate(machine_ids, columns))
+    return len(records), payloads, bulk_ingest.to_documents(machine_ids, columns, alert_rows)
 
-        query = {"machine_id": machine_id} if machine_id else {}
-        alerts = list(mongo_collection.find(query, {"_id": 0}))
-        return alerts
+# GET for individual data of machine and all data (Secured)
+# Streamed as a JSON array (default), NDJSON or Arrow IPC; pass limit and
+# then cursor=<X-Next-Cursor> to page through
+@app.get("/alerts/")
+async def get_alerts(machine_id: Optional[str] = None, since: Optional[datetime] = None,
+                     until: Optional[datetime] = None, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+                     cursor: Optional[str] = None,
+                     fmt: Literal["json", "ndjson", "arrow"] = Query("json", alias="format"),
+                     user: UserInDB = Depends(get_current_user)):
+    try:
+        return await stream_readings(machine_id or None, since, until, limit, cursor, fmt)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # --- Additional Protected Routes (as needed) ---
+# Newest readings of a machine, oldest to newest, served from latest_cache.
+# Polls with a matching If-None-Match / If-Modified-Since get a 304.
 @app.get("/metrics/latest/")
-def get_latest_metrics(machine_id: str, limit: int = 10, token: str = Depends(oauth2_scheme)):
+async def get_latest_metrics(request: Request, machine_id: str, limit: int = 10,
+                             user: UserInDB = Depends(get_current_user)):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        user = get_user(fake_users_db, username)
-
-        query = {"machine_id": machine_id}
-        cursor = mongo_collection.find(query, {"_id": 0}).sort("timestamp", -1).limit(limit)
-        data = list(cursor)
-        return data[::-1]  # Return oldest to newest
+        readings, etag, last_modified = await latest_cache.get(machine_id, limit, load_latest)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# GET for all historical metrics for a machine (Secured)
+    headers = {"Cache-Control": "no-cache"}
+    if etag:
+        headers["ETag"] = etag
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    if not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(jsonable_encoder(readings), headers=headers)
+
+# GET for all historical metrics for a machine (Secured), streamed and
+# paginated like /alerts/
 @app.get("/metrics/history/")
-def get_all_metrics(machine_id: str, token: str = Depends(oauth2_scheme)):
+async def get_all_metrics(machine_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                          limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                          fmt: Literal["json", "ndjson", "arrow"] = Query("json", alias="format"),
+                          user: UserInDB = Depends(get_current_user)):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        user = get_user(fake_users_db, username)
+        return await stream_readings(machine_id, since, until, limit, cursor, fmt)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        query = {"machine_id": machine_id}
-        cursor = mongo_collection.find(query, {"_id": 0}).sort("timestamp", 1)
-        return list(cursor)
+# Aggregated metrics (count, mean/min/max/last per bucket) for a machine (Secured).
+# "auto" picks hourly buckets for ranges over a week, minute buckets otherwise.
+@app.get("/metrics/rollup/")
+async def get_metric_rollups(machine_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                             resolution: Literal["auto", "1m", "1h"] = "auto", user: UserInDB = Depends(get_current_user)):
+    try:
+        if resolution == "auto":
+            resolution = rollups.choose_resolution(since, until) or "1m"
+        buckets = await rollups.read_rollups_async(mongo_db, machine_id, since, until, resolution)
+        return {"machine_id": machine_id, "resolution": resolution, "buckets": buckets}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Machine ids seen in machine_metrics, optionally since a timestamp (Secured)
+@app.get("/machines/", response_model=List[str])
+async def get_machines(since: Optional[datetime] = None, user: UserInDB = Depends(get_current_user)):
+    try:
+        return sorted(await metrics_store.machine_ids_async(mongo_collection, since))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -3,19 +3,46 @@ from dash import dcc, html
 import plotly.express as px
 import pandas as pd
 from pymongo import MongoClient
+from flask import Response
 from dash.dependencies import Input, Output, State, ALL
 import os
-import websockets
-import asyncio
+from urllib.parse import quote
 import json
-import threading
+from dash_extensions import WebSocket
+from metrics_cache import MetricsCache
+from downsample import downsample
+import metrics_store
+import rollups
+import instrumentation
 
 # MongoDB connection
-mongo_client = MongoClient("mongodb://localhost:27017/")
-mongo_collection = mongo_client["demo"]["machine_metrics"]
-
-# Static image directory (assume images are stored in this folder)
-IMAGE_FOLDER = "static/images"
+mongo_client = MongoClient(os.environ.get("MONGO_URI", "mongodb://localhost:27017/"))
+mongo_db = mongo_client["demo"]
+mongo_collection = mongo_db["machine_metrics"]
+
+# Per-machine ring buffers shared by all callbacks and browsers; each
+# refresh only pulls documents newer than what is already cached
+metrics_cache = MetricsCache(mongo_collection)
+
+# Historical plots are downsampled to at most this many points per trace,
+# and never to more than one point per HISTORY_RESOLUTION of the window
+HISTORY_MAX_POINTS = 2000
+HISTORY_MIN_POINTS = 200
+HISTORY_RESOLUTION = pd.Timedelta(seconds=1)
+# Without a zoom window, how far back before the cache the hourly rollups go
+HISTORY_DEFAULT_SPAN = pd.Timedelta(days=7)
+
+# Live readings are pushed by web_server.py on /live and appended to the
+# recent graphs with extendData, keeping at most LIVE_MAX_POINTS per trace
+LIVE_WS_URL = os.environ.get("LIVE_WS_URL", "ws://localhost:8765/live")
+LIVE_MAX_POINTS = 600
+# Full refresh period: fast for the 'all' view, slow when live pushes keep a
+# single machine's recent graphs current
+FAST_REFRESH_MS = 10 * 1000
+LIVE_REFRESH_MS = 60 * 1000
+
+# Latest snapshots are served from web_server.py's in-memory frame store
+FRAME_HTTP_URL = os.environ.get("FRAME_HTTP_URL", "http://localhost:8766")
 
 # Dash App
 app = dash.Dash(__name__, suppress_callback_exceptions=True)
@@ -24,10 +51,13 @@ app.config.suppress_callback_exceptions = True
 
 app.layout = html.Div([
     dcc.Store(id='selected-machine', data='all'),
+    dcc.Store(id='hist-window', data=None),
 
     html.H1("Factory Monitoring Dashboard", style={"textAlign": "center"}),
 
-    dcc.Interval(id='interval-component', interval=10 * 1000, n_intervals=0),
+    # Periodic full rebuilds; see update_refresh_interval
+    dcc.Interval(id='interval-component', interval=FAST_REFRESH_MS, n_intervals=0),
+    WebSocket(id='live-ws', url=LIVE_WS_URL),
 
     html.Div(id='graphs'),
 
@@ -38,56 +68,15 @@ app.layout = html.Div([
     })
 ])
 
-# WebSocket client callback
-async def fetch_websocket_data():
-    uri = "ws://localhost:8765"  # WebSocket server URI
-    async with websockets.connect(uri) as websocket:
-        while True:
-            try:
-                # Receive data (machine data and image path)
-                message = await websocket.recv()
-                data = json.loads(message)
-
-                # Handle received data: update the machine data and image
-                if "machine_id" in data:
-                    machine_data = {
-                        "machine_id": data['machine_id'],
-                        "timestamp": data['timestamp'],
-                        "temperature": data['temperature'],
-                        "rpm": data['rpm']
-                    }
-                    image_src = data.get("image")
-
-                    # Trigger an update in the Dash app using dcc.Store
-                    app.layout = html.Div([
-                        html.H1("Factory Monitoring Dashboard", style={"textAlign": "center"}),
-
-                        dcc.Interval(id='interval-component', interval=10 * 1000, n_intervals=0),
-
-                        html.Div([
-                            html.H3(f"Machine: {machine_data['machine_id']}"),
-                            html.P(f"Temperature: {machine_data['temperature']}°C"),
-                            html.P(f"RPM: {machine_data['rpm']}"),
-                        ]),
-
-                        html.Div([
-                            html.H4("Live Image:"),
-                            html.Img(src=f"/{image_src}", style={"width": "80%", "height": "auto", "borderRadius": "8px", "boxShadow": "0 4px 8px rgba(0, 0, 0, 0.2)"})
-                        ])
-                    ])
-
-            except Exception as e:
-                print(f"Error in WebSocket communication: {e}")
-                break
-
-# Start WebSocket client in a separate thread
-def start_websocket_client():
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    loop.run_until_complete(fetch_websocket_data())
+# Callback and history query latencies (cache refreshes are timed in
+# metrics_cache), served at /metrics on the Dash server
+BUTTONS_SECONDS = instrumentation.STAGE_SECONDS.labels("dash_update_buttons")
+GRAPHS_SECONDS = instrumentation.STAGE_SECONDS.labels("dash_update_graphs")
+HISTORY_SECONDS = instrumentation.STAGE_SECONDS.labels("dash_history")
 
-# Start WebSocket client in a background thread
-threading.Thread(target=start_websocket_client, daemon=True).start()
+@app.server.route("/metrics")
+def metrics():
+    return Response(instrumentation.render(), content_type=instrumentation.CONTENT_TYPE)
 
 # Update buttons
 @app.callback(
@@ -95,15 +84,14 @@ threading.Thread(target=start_websocket_client, daemon=True).start()
     Input('interval-component', 'n_intervals'),
     State('selected-machine', 'data')
 )
+@instrumentation.timed(BUTTONS_SECONDS)
 def update_machine_buttons(n, selected):
-    data = list(mongo_collection.find({}, {"_id": 0}).sort("timestamp", -1).limit(200))
-    df = pd.DataFrame(data)
-
-    if df.empty or 'machine_id' not in df.columns:
-        return []
+    metrics_cache.refresh()
 
     # Filter machine_ids starting with 'M'
-    machine_ids = sorted(mid for mid in df['machine_id'].unique() if mid.startswith('M'))
+    machine_ids = sorted(mid for mid in metrics_cache.machine_ids() if mid.startswith('M'))
+    if not machine_ids:
+        return []
 
     buttons = [
         html.Button("Show All", id={'type': 'machine-button', 'index': 'all'},
@@ -120,39 +108,36 @@ def update_machine_buttons(n, selected):
 @app.callback(
     Output('graphs', 'children'),
     [Input('interval-component', 'n_intervals'),
-     Input('selected-machine', 'data')]
+     Input('selected-machine', 'data'),
+     Input('hist-window', 'data')]
 )
-def update_graphs(n, selected_machine):
+@instrumentation.timed(GRAPHS_SECONDS)
+def update_graphs(n, selected_machine, hist_window):
     try:
-        all_data = list(mongo_collection.find({}, {"_id": 0}).sort("timestamp", -1))
-        df = pd.DataFrame(all_data)
+        metrics_cache.refresh()
 
-        required_columns = {'timestamp', 'temperature', 'rpm', 'machine_id'}
-        if df.empty or not required_columns.issubset(df.columns):
+        now = metrics_cache.latest_timestamp()
+        if now is None:
             return html.Div("No valid data available")
 
-        # Filter only machine_ids that start with 'M'
-        df = df[df['machine_id'].str.startswith('M')]
-
         if selected_machine is None:
             selected_machine = 'all'
 
-        df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
-        df = df.dropna(subset=['timestamp'])
-        df = df.sort_values(by="timestamp", ascending=True)
-
-        now = df['timestamp'].max()
-        recent_df = df[df['timestamp'] > now - pd.Timedelta(minutes=5)]
+        since = now - pd.Timedelta(minutes=5)
 
         if selected_machine == 'all':
+            recent_df = metrics_cache.frame(since=since)
+            # Filter only machine_ids that start with 'M'
+            recent_df = recent_df[recent_df['machine_id'].str.startswith('M')]
+
             fig_temp = px.bar(recent_df, x="timestamp", y="temperature", color="machine_id",
                               title="Temperature Over Time")
             fig_rpm = px.bar(recent_df, x="machine_id", y="rpm", title="RPM", color="machine_id")
 
             return html.Div([dcc.Graph(figure=fig_temp), dcc.Graph(figure=fig_rpm)])
         else:
-            machine_recent = recent_df[recent_df['machine_id'] == selected_machine]
-            machine_full = df[df['machine_id'] == selected_machine]
+            machine_full = metrics_cache.frame(selected_machine)
+            machine_recent = machine_full[machine_full['timestamp'] > since]
 
             if machine_recent.empty:
                 return html.Div("No recent data available for this machine.")
@@ -162,20 +147,31 @@ def update_graphs(n, selected_machine):
             fig_recent_rpm = px.line(machine_recent, x="timestamp", y="rpm",
                                      title=f"{selected_machine} Recent RPM")
 
-            fig_hist_temp = px.line(machine_full, x="timestamp", y="temperature",
+            window = None
+            if hist_window and hist_window.get("machine") == selected_machine:
+                window = (pd.Timestamp(hist_window["start"]), pd.Timestamp(hist_window["end"]))
+            history = get_history(selected_machine, machine_full, window)
+            budget = history_budget(history)
+
+            fig_hist_temp = px.line(downsample(history, "timestamp", "temperature", budget, "lttb"),
+                                    x="timestamp", y="temperature",
                                     title=f"{selected_machine} Historical Temperature")
-            fig_hist_rpm = px.line(machine_full, x="timestamp", y="rpm",
+            fig_hist_rpm = px.line(downsample(history, "timestamp", "rpm", budget, "minmax"),
+                                   x="timestamp", y="rpm",
                                    title=f"{selected_machine} Historical RPM")
+            # Keep the user's zoom across refreshes of the same machine
+            fig_hist_temp.update_layout(uirevision=selected_machine)
+            fig_hist_rpm.update_layout(uirevision=selected_machine)
 
             # Fetch the latest image for the selected machine
-            image_src = get_latest_image(selected_machine)
+            image_src = get_latest_image(selected_machine, machine_full['timestamp'].max())
 
             return html.Div(style={"display": "flex", "flexDirection": "column", "gap": "20px"}, children=[
                 # Left side: Present data (graphs)
                 html.Div(style={"display": "flex", "gap": "20px", "alignItems": "center"}, children=[
                     html.Div(style={"flex": "1", "padding": "10px"}, children=[
-                        dcc.Graph(figure=fig_recent_temp),
-                        dcc.Graph(figure=fig_recent_rpm)
+                        dcc.Graph(id='recent-temp', figure=fig_recent_temp),
+                        dcc.Graph(id='recent-rpm', figure=fig_recent_rpm)
                     ]),
                     html.Div(style={"flex": "0.5", "padding": "10px", "textAlign": "center"}, children=[
                         # Image between graphs
@@ -185,13 +181,134 @@ def update_graphs(n, selected_machine):
 
                 # Bottom side: Historical data
                 html.Div(style={"padding": "10px"}, children=[
-                    dcc.Graph(figure=fig_hist_temp),
-                    dcc.Graph(figure=fig_hist_rpm)
+                    dcc.Graph(id='hist-temp', figure=fig_hist_temp),
+                    dcc.Graph(id='hist-rpm', figure=fig_hist_rpm)
                 ])
             ])
     except Exception as e:
         return html.Div(f"An error occurred: {str(e)}")
 
+# Live points are only pushed into the single-machine view, so the 'all'
+# view keeps the fast refresh; a single machine only needs slow full
+# rebuilds (history, machine list)
+@app.callback(
+    Output('interval-component', 'interval'),
+    Input('selected-machine', 'data')
+)
+def update_refresh_interval(selected_machine):
+    if not selected_machine or selected_machine == 'all':
+        return FAST_REFRESH_MS
+    return LIVE_REFRESH_MS
+
+# Only receive live readings for the selected machine
+@app.callback(
+    Output('live-ws', 'url'),
+    Input('selected-machine', 'data')
+)
+def update_live_url(selected_machine):
+    if not selected_machine or selected_machine == 'all':
+        return LIVE_WS_URL
+    return f"{LIVE_WS_URL}?machine_id={quote(selected_machine)}"
+
+# Append pushed readings to the recent graphs instead of rebuilding them
+@app.callback(
+    [Output('recent-temp', 'extendData'),
+     Output('recent-rpm', 'extendData')],
+    Input('live-ws', 'message'),
+    State('selected-machine', 'data'),
+    prevent_initial_call=True
+)
+def extend_live_graphs(message, selected_machine):
+    if not message or not message.get('data') or selected_machine in (None, 'all'):
+        return dash.no_update, dash.no_update
+
+    readings = [r for r in json.loads(message['data']) if r.get('machine_id') == selected_machine]
+    if not readings:
+        return dash.no_update, dash.no_update
+
+    x = [r['timestamp'] for r in readings]
+    return (
+        (dict(x=[x], y=[[r['temperature'] for r in readings]]), [0], LIVE_MAX_POINTS),
+        (dict(x=[x], y=[[r['rpm'] for r in readings]]), [0], LIVE_MAX_POINTS),
+    )
+
+# Readings for the historical plots. Without a zoom window this is the
+# cached series, preceded by up to HISTORY_DEFAULT_SPAN of hourly rollups
+# ending at the hour the cache starts in (that hour is partly in the cache,
+# so its rollup would count those readings twice). Zoom windows inside the cache are sliced from it; wider windows
+# reaching back further read the rollups, narrow ones raw readings.
+@instrumentation.timed(HISTORY_SECONDS)
+def get_history(machine_id, machine_full, window):
+    oldest = metrics_cache.oldest_timestamp(machine_id)
+    if window is None:
+        if oldest is None:
+            return machine_full
+        boundary = oldest.floor("h")
+        older = get_rollup_history(machine_id, boundary - HISTORY_DEFAULT_SPAN, boundary, "1h")
+        return pd.concat([older, machine_full], ignore_index=True) if not older.empty else machine_full
+
+    start, end = window
+    if oldest is not None and start >= oldest:
+        return machine_full[(machine_full['timestamp'] >= start) & (machine_full['timestamp'] <= end)]
+
+    resolution = rollups.choose_resolution(start, end)
+    if resolution:
+        return get_rollup_history(machine_id, start, end, resolution)
+
+    projection = {"_id": 0, "timestamp": 1, "temperature": 1, "rpm": 1}
+    cursor = metrics_store.find_window(mongo_collection, machine_id, start.to_pydatetime(),
+                                       end.to_pydatetime(), projection)
+    df = pd.DataFrame(list(cursor))
+    if df.empty:
+        return machine_full.iloc[0:0]
+    df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
+    return df.dropna(subset=['timestamp'])
+
+# Bucket means from a rollup collection, shaped like raw readings
+def get_rollup_history(machine_id, start, end, resolution):
+    start = start.to_pydatetime() if start is not None else None
+    end = end.to_pydatetime() if end is not None else None
+    rows = rollups.read_rollups(mongo_db, machine_id, start, end, resolution)
+    if end is not None:
+        rows = [row for row in rows if row['timestamp'] < end]
+    return pd.DataFrame({
+        "timestamp": pd.to_datetime([row['timestamp'] for row in rows]),
+        "temperature": [row['temperature']['mean'] for row in rows],
+        "rpm": [row['rpm']['mean'] for row in rows],
+    })
+
+# Point budget for a history frame: up to HISTORY_MAX_POINTS, fewer for
+# short windows where one point per HISTORY_RESOLUTION is enough
+def history_budget(history):
+    if history.empty:
+        return HISTORY_MIN_POINTS
+    span = history['timestamp'].iloc[-1] - history['timestamp'].iloc[0]
+    return int(min(HISTORY_MAX_POINTS, max(HISTORY_MIN_POINTS, span / HISTORY_RESOLUTION)))
+
+# Remember the zoom window of the historical plots so update_graphs can
+# fetch detail for it; autoscale (double click) clears the window
+@app.callback(
+    Output('hist-window', 'data'),
+    [Input('hist-temp', 'relayoutData'),
+     Input('hist-rpm', 'relayoutData')],
+    State('selected-machine', 'data'),
+    prevent_initial_call=True
+)
+def update_hist_window(temp_relayout, rpm_relayout, selected_machine):
+    triggered = dash.callback_context.triggered
+    relayout = triggered[0]['value'] if triggered else None
+    if not relayout:
+        return dash.no_update
+    if relayout.get('xaxis.autorange'):
+        return None
+    if 'xaxis.range[0]' in relayout:
+        start, end = relayout['xaxis.range[0]'], relayout['xaxis.range[1]']
+    elif 'xaxis.range' in relayout:
+        start, end = relayout['xaxis.range']
+    else:
+        return dash.no_update
+    return {"machine": selected_machine, "start": start, "end": end}
+
 # Set machine when button is clicked
 @app.callback(
     Output('selected-machine', 'data'),
@@ -208,15 +325,16 @@ def select_machine(n_clicks, ids, current_selected):
     triggered_id = eval(triggered[0]['prop_id'].split('.')[0])
     return triggered_id['index']
 
-# Function to get the latest image for a machine
-def get_latest_image(machine_id):
-    image_folder = IMAGE_FOLDER
-    # Assuming images are named with the machine_id followed by timestamp
-    machine_images = [img for img in os.listdir(image_folder) if img.startswith(machine_id)]
-    if machine_images:
-        latest_image = sorted(machine_images)[-1]
-        return f"/static/images/{latest_image}"
-    return "/static/images/default.png"
+# Function to get the latest image for a machine. The frame server sends
+# an ETag with Cache-Control: no-cache, so the browser revalidates and only
+# downloads the image again when it has changed.
+# The latest reading's timestamp is added to the URL so the browser fetches
+# a new snapshot when the machine has new data instead of reusing its cached image
+def get_latest_image(machine_id, timestamp=None):
+    url = f"{FRAME_HTTP_URL}/frames/{quote(machine_id)}"
+    if timestamp is not None:
+        url += f"?t={quote(pd.Timestamp(timestamp).isoformat())}"
+    return url
 
 # Helper function to style buttons
 def _button_style(machine_id, selected_machine):
@@ -230,4 +348,5 @@ def _button_style(machine_id, selected_machine):
     }
 
 if __name__ == '__main__':
+    metrics_store.ensure_indexes(mongo_collection)
     app.run(debug=True)
@@ -3,38 +3,56 @@ import random
 import time
 from datetime import datetime
 import json
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
 from PIL import Image, ImageDraw, ImageFont
 import os
-import websockets
 import asyncio
-import base64
+import argparse
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+import codec
+import instrumentation
+from fleet_sim import run_simulator
+from ws_channel import FrameSender
+from mongo_writer import AsyncMongoBatchWriter
+from stage_pipeline import Stage, Pipeline
+import metrics_store
+import rollups
 
 # MQTT & MongoDB setup
-broker = "broker.emqx.io"  # Make sure this is the correct broker address
+broker = os.environ.get("MQTT_BROKER", "broker.emqx.io")  # Make sure this is the correct broker address
+broker_port = int(os.environ.get("MQTT_PORT", "1883"))
 data_topic = "trail_me"
+publish_topic = codec.topic_for(data_topic)
 
-# Image output folder
-image_folder = os.path.join(os.getcwd(), 'static', 'images')
-os.makedirs(image_folder, exist_ok=True)
+# Snapshot encoding: "png" (fast, low compression) or "webp" (lossless, smaller)
+SNAPSHOT_FORMAT = os.environ.get("SNAPSHOT_FORMAT", "png")
+SNAPSHOT_CONTENT_TYPE = f"image/{SNAPSHOT_FORMAT}"
+SNAPSHOT_SIZE = (300, 200)
 
-# MongoDB connection
-mongo_client = MongoClient("mongodb://localhost:27017/")
-mongo_db = mongo_client["demo"]
-mongo_collection = mongo_db["machine_metrics"]
+# MongoDB connection (async driver; the client is created inside the event loop)
+MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017/")
+
+def get_mongo_collection():
+    mongo_client = AsyncIOMotorClient(MONGO_URI)
+    return mongo_client["demo"]["machine_metrics"]
 
 # WebSocket setup
-WS_SERVER = "ws://localhost:8765"
+WS_SERVER = os.environ.get("WS_SERVER", "ws://localhost:8765")
+
+# Side port for /metrics (override with METRICS_PORT; 0 disables it)
+METRICS_PORT = 9101
 
 # MQTT connection callback
 def on_connect(client, userdata, flags, rc):
     print("Publisher connected and started.")
 
+MACHINE_IDS = [f"M{100 + i}" for i in range(11)]
+
 # Generate sample machine data
 def generate_single_machine_data():
-    machine_ids = [f"M{100 + i}" for i in range(11)]
     data = {
-        "machine_id": random.choice(machine_ids),
+        "machine_id": random.choice(MACHINE_IDS),
         "timestamp": datetime.now().isoformat(),
         "temperature": round(random.uniform(60.0, 100.0), 1),
         "vibration": round(random.uniform(0.5, 5.0), 2),
@@ -42,87 +60,180 @@ def generate_single_machine_data():
     }
     return data
 
-# Create snapshot image with raw text data
-def create_image(data):
-    img = Image.new('RGB', (300, 200), color='white')
-    draw = ImageDraw.Draw(img)
-
+# Load the snapshot font once
+def _load_font():
     try:
-        font = ImageFont.truetype("arial.ttf", 16)
+        return ImageFont.truetype("arial.ttf", 16)
     except IOError:
-        font = ImageFont.load_default()
-
-    lines = [
-        f"Machine: {data['machine_id']}",
-        f"Temp: {data['temperature']}°C",
-        f"RPM: {data['rpm']}",
-        f"Vibration: {data['vibration']}",
-        f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-    ]
+        return ImageFont.load_default()
+
+SNAPSHOT_FONT = _load_font()
+SNAPSHOT_LABELS = ["Machine: ", "Temp: ", "RPM: ", "Vibration: ", "Time: "]
 
+# Pre-render the white background with the static labels; each snapshot
+# copies it and only draws the values
+def _build_template():
+    img = Image.new('RGB', SNAPSHOT_SIZE, color='white')
+    draw = ImageDraw.Draw(img)
+    offsets = []
     y = 20
-    for line in lines:
-        draw.text((10, y), line, fill="black", font=font)
+    for label in SNAPSHOT_LABELS:
+        draw.text((10, y), label, fill="black", font=SNAPSHOT_FONT)
+        offsets.append((10 + draw.textlength(label, font=SNAPSHOT_FONT), y))
         y += 30
+    return img, offsets
 
-    img_path = os.path.join(image_folder, f"{data['machine_id']}_{datetime.now().strftime('%Y%m%d%H%M%S')}.png")
-    img.save(img_path)
-    return img_path
+SNAPSHOT_TEMPLATE, SNAPSHOT_OFFSETS = _build_template()
 
-# Convert image to base64 string for WebSocket transmission
-def convert_image_to_base64(img_path):
-    with open(img_path, "rb") as img_file:
-        img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
-    return img_base64
+# Rendering runs on a thread pool; Pillow releases the GIL while encoding
+RENDER_WORKERS = os.cpu_count() or 4
+render_pool = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="render")
 
-# Function to send the image to WebSocket server
-async def send_image_to_ws(image_base64):
-    async with websockets.connect(WS_SERVER) as websocket:
-        # Adding 'image:' prefix to the base64 data
-        await websocket.send("image:" + image_base64)
+# Create snapshot image with raw text data, encoded in memory
+def create_image(data):
+    img = SNAPSHOT_TEMPLATE.copy()
+    draw = ImageDraw.Draw(img)
 
-# Set up and start MQTT client
+    values = [
+        f"{data['machine_id']}",
+        f"{data['temperature']}°C",
+        f"{data['rpm']}",
+        f"{data['vibration']}",
+        f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    ]
+
+    for position, value in zip(SNAPSHOT_OFFSETS, values):
+        draw.text(position, value, fill="black", font=SNAPSHOT_FONT)
+
+    buffer = BytesIO()
+    if SNAPSHOT_FORMAT == "webp":
+        img.save(buffer, format="WEBP", lossless=True, method=0)
+    else:
+        img.save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+# Queue a snapshot on the persistent WebSocket channel as a binary frame
+def send_image_to_ws(sender, data, image_bytes):
+    timestamp = datetime.fromisoformat(data["timestamp"]).timestamp()
+    sender.send(data["machine_id"], timestamp, SNAPSHOT_CONTENT_TYPE, image_bytes)
+
+# Queue a reading for live dashboards as a JSON frame
+def send_reading_to_ws(sender, data):
+    timestamp = datetime.fromisoformat(data["timestamp"]).timestamp()
+    sender.send(data["machine_id"], timestamp, "application/json", json.dumps(data).encode("utf-8"))
+
+# Set up MQTT client (connected in main)
 client = mqtt.Client()
 client.on_connect = on_connect
-client.connect(broker, 1883)
-client.loop_start()
-
-# Asynchronous function to send images continuously
-async def send_images_continuously():
-    while True:
-        data = generate_single_machine_data()
-
-        # Publish data to MQTT
-        try:
-            client.publish(data_topic, json.dumps(data))
-            print()
-        except Exception as e:
-            print(f"Error publishing data: {e}")
-
-        # Insert data into MongoDB
-        try:
-            mongo_collection.insert_one(data)
-        except Exception as e:
-            print(f"Error inserting data into MongoDB: {e}")
-
-        # Create image and send it to WebSocket server
-        try:
-            img_path = create_image(data)
-            img_base64 = convert_image_to_base64(img_path)
-            await send_image_to_ws(img_base64)  # Send the image via WebSocket
-
-            if os.path.exists(img_path):
-                os.remove(img_path)
-                # print(f"Deleted temporary image: {img_path}")
-        except Exception as e:
-            print(f"Error creating or sending image: {e}")
-
-        print(f"Published: {data}")
-        await asyncio.sleep(10)
+
+# Asynchronous function to send images continuously.
+# Readings flow through a staged pipeline: MQTT publish, MongoDB store and
+# snapshot render -> WebSocket send run as independent stages with their
+# own bounded queues and worker counts, so a slow stage only backs up its
+# own queue. Rendering runs on the thread pool; snapshots are best-effort
+# and dropped when the render queue is full.
+async def send_images_continuously(interval=10.0, store_workers=2, render_workers=None,
+                                   queue_size=1000, report_interval=10.0):
+    loop = asyncio.get_running_loop()
+    # One long-lived, auto-reconnecting connection to the WebSocket server
+    ws_sender = FrameSender(WS_SERVER).start()
+    # Readings are buffered and bulk-inserted without blocking the loop
+    mongo_collection = get_mongo_collection()
+    await metrics_store.ensure_indexes_async(mongo_collection)
+    mongo_db = mongo_collection.database
+
+    # Fold every flushed batch into the 1-minute / 1-hour rollups
+    async def update_rollups(batch):
+        await rollups.apply_async(mongo_db, batch)
+
+    metrics_writer = AsyncMongoBatchWriter(mongo_collection, on_flush=update_rollups).start()
+    verbose = interval >= 1.0
+
+    # Publish data to MQTT (paho only queues it; the network thread sends)
+    # and push the reading to live dashboards through the WebSocket server
+    async def publish(data):
+        client.publish(publish_topic, codec.encode([data]))
+        send_reading_to_ws(ws_sender, data)
+        if verbose:
+            print(f"Published: {data}")
+
+    # Insert data into MongoDB as a copy with a BSON datetime timestamp
+    # (the writer also adds _id, which must not leak into the MQTT payload)
+    async def store(data):
+        await metrics_writer.submit(metrics_store.to_document(data))
+
+    # Create image off the event loop
+    async def render(data):
+        image_bytes = await loop.run_in_executor(render_pool, create_image, data)
+        return data, image_bytes
+
+    # Send the image via WebSocket
+    async def send(item):
+        send_image_to_ws(ws_sender, *item)
+
+    # Keep the render queue short: a stale snapshot is worth less than a dropped one
+    render_workers = render_workers or RENDER_WORKERS
+    render_stage = Stage("render", render, concurrency=render_workers,
+                         queue_size=min(queue_size, render_workers * 4), lossy=True)
+    render_stage.then(Stage("send", send, queue_size=queue_size))
+    pipeline = Pipeline([
+        Stage("publish", publish, queue_size=queue_size),
+        Stage("store", store, concurrency=store_workers, queue_size=queue_size),
+        render_stage,
+    ], report_interval=report_interval)
+
+    async def readings():
+        while True:
+            yield generate_single_machine_data()
+            await asyncio.sleep(interval)
+
+    try:
+        await pipeline.run(readings())
+    finally:
+        await metrics_writer.close()
+        await ws_sender.close()
 
 # Main function
 def main():
-    asyncio.run(send_images_continuously())
+    parser = argparse.ArgumentParser(description="Machine data publisher")
+    parser.add_argument("--simulate", action="store_true",
+                        help="run the high-rate fleet simulator instead of the snapshot loop")
+    parser.add_argument("--machines", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=1000.0, help="target readings per second")
+    parser.add_argument("--profile", choices=["steady", "burst", "sine"], default="steady")
+    parser.add_argument("--batch", type=int, default=100, help="readings per packed message")
+    parser.add_argument("--duration", type=float, default=None, help="seconds to run (default: forever)")
+    parser.add_argument("--qos", type=int, choices=[0, 1], default=0)
+    parser.add_argument("--format", choices=["json", "packed"], default=codec.WIRE_FORMAT)
+    parser.add_argument("--fault-rate", type=float, default=0.0005)
+    parser.add_argument("--interval", type=float, default=10.0,
+                        help="seconds between readings in snapshot mode")
+    parser.add_argument("--store-workers", type=int, default=2)
+    parser.add_argument("--render-workers", type=int, default=None)
+    parser.add_argument("--stage-queue", type=int, default=1000, help="queue size per pipeline stage")
+    parser.add_argument("--report-interval", type=float, default=10.0)
+    args = parser.parse_args()
+
+    metrics_port = instrumentation.port_from_env(METRICS_PORT)
+    if metrics_port:
+        instrumentation.serve(metrics_port)
+    client.connect(broker, broker_port)
+    client.loop_start()
+    try:
+        if args.simulate:
+            run_simulator(client, data_topic, machines=args.machines, rate=args.rate,
+                          profile=args.profile, batch_size=args.batch, duration=args.duration,
+                          qos=args.qos, fmt=args.format, fault_rate=args.fault_rate)
+        else:
+            asyncio.run(send_images_continuously(
+                interval=args.interval, store_workers=args.store_workers,
+                render_workers=args.render_workers, queue_size=args.stage_queue,
+                report_interval=args.report_interval))
+    except KeyboardInterrupt:
+        print("\nExiting gracefully...")
+    finally:
+        client.loop_stop()
+        client.disconnect()
 
 if __name__ == "__main__":
     main()
@@ -1,40 +1,320 @@
 import asyncio
 import websockets
 import base64
-from PIL import Image
-from io import BytesIO
+import json
+import os
+import struct
+import time
+from collections import OrderedDict, deque
+from urllib.parse import urlsplit, parse_qs, unquote
+from ws_channel import decode_header, encode_frame
+import instrumentation
+
+WS_HOST = os.environ.get("WS_HOST", "localhost")
+WS_PORT = int(os.environ.get("WS_PORT", "8765"))
+HTTP_PORT = int(os.environ.get("HTTP_PORT", "8766"))
+
+# Relay metrics, served on the snapshot HTTP port at /metrics
+RELAYED_FRAMES = instrumentation.MESSAGES.labels("ws_relay")
+RELAYED_READINGS = instrumentation.READINGS.labels("ws_relay")
+RELAY_ERRORS = instrumentation.ERRORS.labels("ws_relay")
+COALESCED = instrumentation.DROPPED.labels("ws_fanout")
+FANOUT_SECONDS = instrumentation.STAGE_SECONDS.labels("ws_fanout")
+LIVE_DROPPED = instrumentation.DROPPED.labels("ws_live")
+LIVE_FANOUT_SECONDS = instrumentation.STAGE_SECONDS.labels("ws_live")
+LIVE_LAG = instrumentation.LAG_SECONDS.labels("ws_relay_live")
+SNAPSHOT_LAG = instrumentation.LAG_SECONDS.labels("ws_relay_snapshot")
+SUBSCRIBERS = instrumentation.gauge("ws_subscribers", "Connected dashboard WebSockets", ["kind"])
+FRAME_STORE_BYTES = instrumentation.gauge("frame_store_bytes", "Snapshot bytes held in the frame store")
+
+# Per-dashboard mailbox that keeps only the latest frame per machine.
+# A slow browser never accumulates a backlog: a newer frame for the same
+# machine replaces the pending one, and the number of pending machines is
+# capped at max_machines.
+class Subscriber:
+    def __init__(self, websocket, machine_ids=None, max_machines=1024):
+        self.websocket = websocket
+        self.machine_ids = machine_ids
+        self.max_machines = max_machines
+        self.pending = {}
+        self.ready = asyncio.Event()
+        self.sent = 0
+        self.coalesced = 0
+
+    def offer(self, machine_id, frame):
+        if self.machine_ids and machine_id not in self.machine_ids:
+            return
+        if machine_id in self.pending:
+            self.coalesced += 1
+            COALESCED.inc()
+        elif len(self.pending) >= self.max_machines:
+            self.pending.pop(next(iter(self.pending)))
+            self.coalesced += 1
+            COALESCED.inc()
+        self.pending[machine_id] = frame
+        self.ready.set()
+
+    # Send pending frames to the browser as they arrive
+    async def pump(self):
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            frames, self.pending = self.pending, {}
+            started = time.perf_counter()
+            for frame in frames.values():
+                await self.websocket.send(frame)
+                self.sent += 1
+            FANOUT_SECONDS.observe(time.perf_counter() - started)
+
+# Browser connection on /live: readings are forwarded as text, batched
+# into one JSON array per send. Only the newest max_pending readings are
+# kept while the browser is behind.
+class LiveSubscriber:
+    def __init__(self, websocket, machine_ids=None, max_pending=1000):
+        self.websocket = websocket
+        self.machine_ids = machine_ids
+        self.pending = deque(maxlen=max_pending)
+        self.ready = asyncio.Event()
+        self.sent = 0
+
+    def offer(self, machine_id, text):
+        if self.machine_ids and machine_id not in self.machine_ids:
+            return
+        if len(self.pending) == self.pending.maxlen:
+            LIVE_DROPPED.inc()
+        self.pending.append(text)
+        self.ready.set()
+
+    async def pump(self):
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            readings = list(self.pending)
+            self.pending.clear()
+            started = time.perf_counter()
+            await self.websocket.send("[" + ",".join(readings) + "]")
+            self.sent += len(readings)
+            LIVE_FANOUT_SECONDS.observe(time.perf_counter() - started)
+
+# Relays frames from publishers to subscribed dashboards. The frame bytes
+# received from a publisher are handed to every subscriber as-is, so a
+# broadcast never re-encodes or copies the payload.
+class FrameHub:
+    def __init__(self):
+        self.subscribers = set()
+        self.live_subscribers = set()
+        self.received = 0
+
+    def publish(self, machine_id, frame):
+        self.received += 1
+        for subscriber in self.subscribers:
+            subscriber.offer(machine_id, frame)
+
+    # Forward a JSON reading (decoded once) to every /live browser
+    def publish_reading(self, machine_id, text):
+        for subscriber in self.live_subscribers:
+            subscriber.offer(machine_id, text)
+
+# Latest snapshot per machine, kept in memory within a byte budget.
+# Entries are evicted least-recently-used first; every update gets a new
+# ETag so HTTP clients can revalidate with If-None-Match. ETags carry a
+# per-process epoch so a restarted server never reuses an earlier tag.
+class FrameStore:
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.frames = OrderedDict()
+        self.size = 0
+        self.version = 0
+        self._epoch = f"{os.getpid():x}{time.time_ns():x}"
+
+    def put(self, machine_id, timestamp, content_type, payload):
+        self.version += 1
+        old = self.frames.pop(machine_id, None)
+        if old:
+            self.size -= len(old["payload"])
+        self.frames[machine_id] = {
+            "etag": f'"{self._epoch}-{self.version:x}"',
+            "timestamp": timestamp,
+            "content_type": content_type,
+            "payload": payload,
+        }
+        self.size += len(payload)
+        while self.size > self.max_bytes and len(self.frames) > 1:
+            _, evicted = self.frames.popitem(last=False)
+            self.size -= len(evicted["payload"])
+
+    def get(self, machine_id):
+        entry = self.frames.get(machine_id)
+        if entry:
+            self.frames.move_to_end(machine_id)
+        return entry
+
+hub = FrameHub()
+store = FrameStore()
+SUBSCRIBERS.labels("subscribe").set_function(lambda: len(hub.subscribers))
+SUBSCRIBERS.labels("live").set_function(lambda: len(hub.live_subscribers))
+instrumentation.QUEUE_DEPTH.labels("ws_fanout").set_function(
+    lambda: sum(len(s.pending) for s in list(hub.subscribers) + list(hub.live_subscribers)))
+FRAME_STORE_BYTES.set_function(lambda: store.size)
+
+def _request_path(websocket):
+    request = getattr(websocket, "request", None)
+    return request.path if request is not None else getattr(websocket, "path", "/")
+
+# Publisher connection: binary frames from web_pub.py (or legacy text frames)
+# A malformed frame is counted and skipped; it does not close the
+# publisher's connection.
+async def publisher_handler(websocket):
+    async for message in websocket:
+        if isinstance(message, bytes):  # Binary frame from web_pub's persistent channel
+            try:
+                machine_id, timestamp, content_type, offset = decode_header(message)
+                if content_type == "application/json":
+                    reading = bytes(memoryview(message)[offset:]).decode("utf-8")
+            except (struct.error, ValueError) as e:
+                print(f"Skipping malformed frame: {e}")
+                RELAY_ERRORS.inc()
+                continue
+            RELAYED_FRAMES.inc()
+            if content_type == "application/json":
+                RELAYED_READINGS.inc()
+                LIVE_LAG.observe(time.time() - timestamp)
+                hub.publish_reading(machine_id, reading)
+                continue
+            SNAPSHOT_LAG.observe(time.time() - timestamp)
+            hub.publish(machine_id, message)
+            if content_type.startswith("image/"):
+                store.put(machine_id, timestamp, content_type, memoryview(message)[offset:])
+        elif message.startswith("image:"):  # Legacy base64 frame without a machine id
+            try:
+                image_bytes = base64.b64decode(message[6:])
+            except ValueError as e:
+                print(f"Skipping malformed frame: {e}")
+                RELAY_ERRORS.inc()
+                continue
+            hub.publish("", encode_frame("", time.time(), "image/png", image_bytes))
+        else:
+            # Handle non-image messages
+            await websocket.send(f"Echo: {message}")
+
+# Dashboard connection: /subscribe for frames or /live for readings,
+# optionally ?machine_id=M101,M102
+async def subscriber_handler(websocket, query, live=False):
+    machine_ids = None
+    if "machine_id" in query:
+        machine_ids = {m for value in query["machine_id"] for m in value.split(",") if m}
+    if live:
+        subscriber, subscribers = LiveSubscriber(websocket, machine_ids), hub.live_subscribers
+    else:
+        subscriber, subscribers = Subscriber(websocket, machine_ids), hub.subscribers
+    subscribers.add(subscriber)
+    pump = asyncio.create_task(subscriber.pump())
+    try:
+        await websocket.wait_closed()
+    finally:
+        subscribers.discard(subscriber)
+        pump.cancel()
 
 async def websocket_handler(websocket):
-    print(f"New connection from {8765}")
+    url = urlsplit(_request_path(websocket))
+    print(f"New connection on {url.path}")
     try:
-        async for message in websocket:
-            # print("Image sending to dash...")
-            if message.startswith("image:"):  # Check for image data
-                image_data = message[6:]  # Assuming base64-encoded image data
-                # print(f"Image data received: {image_data[:20]}...")  # Only show a snippet for clarity
-                print("Image sent \n")
-                # Decode the image data
-                # image_bytes = base64.b64decode(image_data)
-                # image = Image.open(BytesIO(image_bytes))
-
-                # Save or process the image (you can save it or send it to Dash here)
-                # image.save("received_image.jpg")
-                # print("Image saved.")
-                # You can send the image to Dash here (or any other part of your app)
-                # await websocket.send("Image received and saved.")
-            else:
-                # Handle non-image messages
-                print("image Sent to dash\n")
-                await websocket.send(f"Echo: {message}")
+        if url.path.rstrip("/") == "/subscribe":
+            await subscriber_handler(websocket, parse_qs(url.query))
+        elif url.path.rstrip("/") == "/live":
+            await subscriber_handler(websocket, parse_qs(url.query), live=True)
+        else:
+            await publisher_handler(websocket)
+    except websockets.ConnectionClosed:
+        pass
     except Exception as e:
         print(f"Connection error: {e}")
-        await websocket.send("Error: Something went wrong!")
+        RELAY_ERRORS.inc()
+
+def _http_response(writer, status, headers, body=b"", head_only=False):
+    lines = [f"HTTP/1.1 {status}"]
+    headers = dict(headers)
+    headers["Content-Length"] = str(len(body))
+    headers.setdefault("Cache-Control", "no-cache")
+    headers["Access-Control-Allow-Origin"] = "*"
+    lines.extend(f"{name}: {value}" for name, value in headers.items())
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+    if body and not head_only:
+        writer.write(body)
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    return header.strip() == "*" or etag in (tag.strip() for tag in header.split(","))
+
+# Serve one HTTP request from the frame store:
+#   GET /frames/            -> JSON index of machine_id -> {etag, timestamp}
+#   GET /frames/<machine_id> -> latest image, 304 when If-None-Match matches
+#   GET /metrics            -> relay metrics in the Prometheus text format
+def _serve_frame_request(writer, method, path, headers):
+    head_only = method == "HEAD"
+    if method not in ("GET", "HEAD"):
+        _http_response(writer, "405 Method Not Allowed", {"Allow": "GET, HEAD"})
+        return
+
+    path = urlsplit(path).path
+    if path.rstrip("/") == "/metrics":
+        body = instrumentation.render().encode("utf-8")
+        _http_response(writer, "200 OK", {"Content-Type": instrumentation.CONTENT_TYPE}, body, head_only)
+        return
+    if path.rstrip("/") == "/frames":
+        index = {mid: {"etag": e["etag"], "timestamp": e["timestamp"]} for mid, e in store.frames.items()}
+        body = json.dumps(index).encode()
+        _http_response(writer, "200 OK", {"Content-Type": "application/json"}, body, head_only)
+        return
+
+    if not path.startswith("/frames/"):
+        _http_response(writer, "404 Not Found", {})
+        return
+
+    entry = store.get(unquote(path[len("/frames/"):]))
+    if entry is None:
+        _http_response(writer, "404 Not Found", {})
+    elif _etag_matches(headers.get("if-none-match"), entry["etag"]):
+        _http_response(writer, "304 Not Modified", {"ETag": entry["etag"]})
+    else:
+        _http_response(writer, "200 OK", {"Content-Type": entry["content_type"], "ETag": entry["etag"]},
+                       entry["payload"], head_only)
+
+# Minimal keep-alive HTTP/1.1 server for snapshots, on asyncio streams
+async def http_handler(reader, writer):
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line.strip():
+                break
+            method, path, version = request_line.decode("latin-1").split()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            _serve_frame_request(writer, method, path, headers)
+            await writer.drain()
+            if version == "HTTP/1.0" or headers.get("connection", "").lower() == "close":
+                break
+    except (ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
 
-# WebSocket server setup
+# WebSocket server setup (plus the snapshot HTTP endpoint)
 async def start_server():
-    server = await websockets.serve(websocket_handler, "localhost", 8765)
-    print("WebSocket server running on ws://localhost:8765")
-    await server.wait_closed()
+    server = await websockets.serve(websocket_handler, WS_HOST, WS_PORT, max_size=None)
+    http_server = await asyncio.start_server(http_handler, WS_HOST, HTTP_PORT)
+    print(f"WebSocket server running on ws://{WS_HOST}:{WS_PORT}")
+    print(f"Snapshot HTTP server running on http://{WS_HOST}:{HTTP_PORT}/frames/ (metrics at /metrics)")
+    async with http_server:
+        await server.wait_closed()
 
 # Start the WebSocket server
-asyncio.run(start_server())
+if __name__ == "__main__":
+    asyncio.run(start_server())
@@ -1,69 +1,134 @@
 import paho.mqtt.client as mqtt
-import json
+import numpy as np
 import mysql.connector
-from datetime import datetime
+import os
+import threading
 import time
-broker = "broker.emqx.io"
+from alert_writer import AlertWriter
+from alert_rules import load_rules
+import codec
+import instrumentation
+broker = os.environ.get("MQTT_BROKER", "broker.emqx.io")
+broker_port = int(os.environ.get("MQTT_PORT", "1883"))
 data_topic = "trail_me"
+# Side port for /metrics (override with METRICS_PORT; 0 disables it)
+METRICS_PORT = 9102
+
+# Alert thresholds shared with web_api.py (see alert_rules.json)
+rules = load_rules()
 
 # MySQL connection
-mysql_conn = mysql.connector.connect(
-    host="localhost",
-    user="root",
-    password="root",
-    database="practice"
-)
-mysql_cursor = mysql_conn.cursor()
-
-# Insert data into MySQL
-def insert_to_mysql(data):
-    query = """
-        INSERT INTO machine_alerts (machine_id, timestamp, temperature, vibration, rpm)
-        VALUES (%s, %s, %s, %s, %s)
-    """
-    values = (
-        data["machine_id"],
-        datetime.fromisoformat(data["timestamp"]),
-        data["temperature"],
-        data["vibration"],
-        data["rpm"]
+def connect_mysql():
+    return mysql.connector.connect(
+        host=os.environ.get("MYSQL_HOST", "localhost"),
+        user=os.environ.get("MYSQL_USER", "root"),
+        password=os.environ.get("MYSQL_PASSWORD", "root"),
+        database=os.environ.get("MYSQL_DATABASE", "practice"),
+        allow_local_infile=True,
+        connection_timeout=5
     )
-    mysql_cursor.execute(query, values)
-    mysql_conn.commit()
-    print("Data inserted into MySQL.")
+
+# Alerts are written in batches by a dedicated thread so a slow commit
+# never blocks the MQTT network loop; if MySQL is down or falls behind,
+# alerts are spilled to disk and bulk-replayed on recovery.
+# Created by run_subscriber() so every worker process owns its connection.
+alert_writer = None
+
+# Queue data for insertion into MySQL
+def insert_to_mysql(data):
+    alert_writer.submit(data)
+
+# Topics for a subscriber; with a group name the worker joins an MQTT
+# shared subscription and the broker load-balances messages across the group
+def subscription_topics(group=None):
+    topics = codec.subscribe_topics(data_topic)
+    if group:
+        topics = [f"$share/{group}/{topic}" for topic in topics]
+    return topics
+
+# Per-message cost of decode + rules + queueing alerts, and the lag of
+# every reading on arrival
+CONSUME_SECONDS = instrumentation.STAGE_SECONDS.labels("mqtt_consume")
+CONSUMED_MESSAGES = instrumentation.MESSAGES.labels("mqtt_consume")
+CONSUMED_READINGS = instrumentation.READINGS.labels("mqtt_consume")
+CONSUME_ERRORS = instrumentation.ERRORS.labels("mqtt_consume")
+RECEIVED_LAG = instrumentation.LAG_SECONDS.labels("web_sub")
 
 # MQTT connection callback
 def on_connect(client, userdata, flags, rc):
     print(f"Connected with result code {rc}")
-    client.subscribe(data_topic)
+    # JSON readings arrive on trail_me, packed batches on trail_me/packed
+    client.subscribe([(topic, 0) for topic in userdata["topics"]])
     print("Subscriber connected and subscribed to data topic.")
 
 # MQTT message callback
 def on_message(client, userdata, msg):
-    print(f"\n[Subscriber] Received message: {msg.payload.decode()}")
-    json_str = msg.payload.decode()
-    data = json.loads(json_str)      
-    print("Received JSON data:", data)
-
-    if data["temperature"] > 80 or data["vibration"] > 3.0:
-        insert_to_mysql(data)
-
-# Create MQTT client
-client = mqtt.Client(clean_session=True)  # clean_session ensures no retained session data
-client.on_connect = on_connect
-client.on_message = on_message
-
-# Connect to the MQTT broker
-client.connect(broker, 1883, 60)
-
-# Start MQTT loop in the background
-client.loop_start()
-
-# Keep the script running
-try:
-    print("Press Ctrl+C to exit")
-    while True:
-        time.sleep(1)
-except KeyboardInterrupt:
-    print("\nExiting gracefully...")
-    client.disconnect()
+    started = time.perf_counter()
+    try:
+        machine_ids, columns = codec.decode_columns(msg.topic, msg.payload)
+    except Exception as e:
+        print(f"Error decoding message on {msg.topic}: {e}")
+        CONSUME_ERRORS.inc()
+        return
+    # Packed batches carry epoch floats; only JSON readings (one or a few per
+    # message) are parsed here. Readings whose timestamp does not parse are
+    # still processed, just left out of the lag histogram.
+    timestamps = codec.epoch_seconds(columns["timestamp"])
+    instrumentation.observe_lag(RECEIVED_LAG, timestamps[~np.isnan(timestamps)])
+
+    alert_mask = rules.evaluate(machine_ids, columns)
+    for data in codec.to_records(machine_ids, columns, np.flatnonzero(alert_mask)):
+        try:
+            insert_to_mysql(data)
+        except (TypeError, ValueError) as e:  # e.g. a timestamp that does not parse
+            print(f"Skipping alert for {data.get('machine_id')}: {e}")
+            CONSUME_ERRORS.inc()
+
+    userdata["received"] += len(machine_ids)
+    userdata["alerts"] += int(alert_mask.sum())
+    CONSUMED_MESSAGES.inc()
+    CONSUMED_READINGS.inc(len(machine_ids))
+    CONSUME_SECONDS.observe(time.perf_counter() - started)
+
+# Create MQTT client; userdata carries the topics and message counters
+def create_client(userdata, client_id=""):
+    client = mqtt.Client(client_id=client_id, clean_session=True, userdata=userdata)  # clean_session ensures no retained session data
+    client.on_connect = on_connect
+    client.on_message = on_message
+    return client
+
+# Run a subscriber until stop_event is set. report(received, alerts) is
+# called every report_interval seconds with cumulative reading counts.
+# With metrics_port, /metrics is served on that port.
+def run_subscriber(group=None, spill_dir="spill", stop_event=None, report=None,
+                   report_interval=1.0, host=None, port=None, metrics_port=None):
+    global alert_writer
+    stop_event = stop_event or threading.Event()
+    if metrics_port:
+        instrumentation.serve(metrics_port)
+    alert_writer = AlertWriter(connect_mysql, spill_dir=spill_dir).start()
+
+    stats = {"topics": subscription_topics(group), "received": 0, "alerts": 0}
+    client = create_client(stats)
+    client.connect(host or broker, port or broker_port, 60)
+    client.loop_start()
+
+    try:
+        while not stop_event.wait(report_interval):
+            if report:
+                report(stats["received"], stats["alerts"])
+    finally:
+        client.disconnect()
+        client.loop_stop()
+        alert_writer.close()
+
+def main():
+    # Keep the script running
+    try:
+        print("Press Ctrl+C to exit")
+        run_subscriber(metrics_port=instrumentation.port_from_env(METRICS_PORT))
+    except KeyboardInterrupt:
+        print("\nExiting gracefully...")
+
+if __name__ == "__main__":
+    main()
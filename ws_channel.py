@@ -0,0 +1,112 @@
+import asyncio
+import collections
+import struct
+import websockets
+import instrumentation
+
+# Binary frame layout shared by web_pub.py and web_server.py:
+#   magic "WF" | version | content type | machine_id length | timestamp (f64, epoch s)
+#   | machine_id (utf-8) | payload
+MAGIC = b"WF"
+VERSION = 1
+HEADER = struct.Struct("!2sBBBd")
+
+CONTENT_TYPES = {
+    1: "image/png",
+    2: "image/webp",
+    3: "application/json",
+}
+CONTENT_TYPE_CODES = {name: code for code, name in CONTENT_TYPES.items()}
+
+def encode_frame(machine_id, timestamp, content_type, payload):
+    machine = machine_id.encode("utf-8")
+    header = HEADER.pack(MAGIC, VERSION, CONTENT_TYPE_CODES[content_type], len(machine), timestamp)
+    return b"".join((header, machine, payload))
+
+# Parse the header; returns (machine_id, timestamp, content_type, payload_offset)
+def decode_header(frame):
+    magic, version, code, id_len, timestamp = HEADER.unpack_from(frame)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a frame")
+    start = HEADER.size
+    machine_id = bytes(frame[start:start + id_len]).decode("utf-8")
+    return machine_id, timestamp, CONTENT_TYPES.get(code, "application/octet-stream"), start + id_len
+
+# Parse a frame; the payload is a memoryview into the frame, not a copy
+def decode_frame(frame):
+    machine_id, timestamp, content_type, offset = decode_header(frame)
+    return machine_id, timestamp, content_type, memoryview(frame)[offset:]
+
+WS_SENT = instrumentation.MESSAGES.labels("ws_send")
+WS_SEND_DROPPED = instrumentation.DROPPED.labels("ws_send")
+
+# Long-lived, auto-reconnecting sender of binary frames.
+# send() never blocks: frames go into a bounded deque and the oldest frame
+# is dropped when it is full, so a slow or unreachable server can only cost
+# stale snapshots, never stall the caller's loop.
+class FrameSender:
+    def __init__(self, uri, max_queue=256, reconnect_delay=0.5, max_reconnect_delay=10.0):
+        self.uri = uri
+        self.queue = collections.deque(maxlen=max_queue)
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.sent = 0
+        self.dropped = 0
+        instrumentation.QUEUE_DEPTH.labels("ws_send").set_function(lambda: len(self.queue))
+        self._ready = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def send(self, machine_id, timestamp, content_type, payload):
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+            WS_SEND_DROPPED.inc()
+        self.queue.append(encode_frame(machine_id, timestamp, content_type, payload))
+        self._ready.set()
+
+    async def _send_pending(self, websocket):
+        while True:
+            if not self.queue:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            frame = self.queue.popleft()
+            try:
+                await websocket.send(frame)
+            except Exception:
+                # Put the frame back unless newer frames have filled the queue
+                if len(self.queue) < self.queue.maxlen:
+                    self.queue.appendleft(frame)
+                raise
+            self.sent += 1
+            WS_SENT.inc()
+
+    async def _run(self):
+        delay = self.reconnect_delay
+        while True:
+            try:
+                async with websockets.connect(self.uri, max_size=None) as websocket:
+                    print(f"Frame channel connected to {self.uri}")
+                    delay = self.reconnect_delay
+                    await self._send_pending(websocket)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Frame channel error: {e}; reconnecting in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+    # Give queued frames up to timeout seconds to go out, then stop
+    async def close(self, timeout=2.0):
+        deadline = asyncio.get_running_loop().time() + timeout
+        while self.queue and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(0.05)
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass